@@ -0,0 +1,84 @@
+"""
+Document.to_mongo + BSON encoding: previous asdict + recursive normalize
+against the shallow mapping with the NumPy fallback encoder.
+
+Usage (from apps/documents):
+    python -m benchmarks.bson_encoding_benchmark [runs]
+
+Runs on layout-based sample results of the cédula (1) and SOAT (5), both as
+full pipeline results (what the debug trace and the old schema hold) and
+as compact metadata.
+"""
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime
+
+import bson
+import numpy as np
+from bson.codec_options import CodecOptions
+
+from src.models.bson_codecs import TYPE_REGISTRY
+from src.models.document import Document
+from src.services.document_metadata import compact_metadata
+
+from .sample_results import load_layout, sample_enriched_results
+
+
+CODEC_OPTIONS = CodecOptions(type_registry=TYPE_REGISTRY)
+
+
+def legacy_to_mongo(document: Document) -> dict:
+    def normalize(value):
+        if isinstance(value, np.generic):
+            return value.item()
+
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+
+        return value
+
+    data = asdict(document)
+    data.pop("id", None)
+
+    return normalize(data)
+
+
+def timed(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        encoded = fn()
+    return 1000 * (time.perf_counter() - start) / runs, encoded
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    for doc_type_id in (1, 5):
+        results = sample_enriched_results(doc_type_id)
+
+        for label, metadata in (("full", results), ("compact", compact_metadata(results))):
+            document = Document(
+                id=None,
+                user_id="user-1",
+                doc_type_id=str(doc_type_id),
+                metadata=metadata,
+                file_hash="0" * 64,
+                is_valid=True,
+                validated_at=datetime(2024, 1, 1),
+            )
+
+            legacy_ms, legacy = timed(lambda: bson.encode(legacy_to_mongo(document)), runs)
+            new_ms, new = timed(lambda: bson.encode(document.to_mongo(), codec_options=CODEC_OPTIONS), runs)
+            assert bson.decode(legacy) == bson.decode(new)
+
+            name = f"{load_layout(doc_type_id)['document_type']} ({label})"
+            print(f"{name:26s} {len(new) / 1024:6.1f} KB   asdict+normalize {legacy_ms:6.2f} ms"
+                  f"   type registry {new_ms:6.2f} ms   {legacy_ms / new_ms:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
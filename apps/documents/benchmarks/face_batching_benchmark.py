@@ -0,0 +1,84 @@
+"""
+Throughput and latency of face embedding with and without micro-batching.
+
+Usage (from apps/documents):
+    python -m benchmarks.face_batching_benchmark <image> [requests_per_worker]
+
+The first face of the image is aligned once; every simulated request then
+embeds that crop, either with its own recognition call or through the
+shared FaceEmbeddingBatcher, at increasing concurrency levels.
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from src.services.face_batcher import FaceEmbeddingBatcher
+from src.services.face_engine import FaceEngine, FaceEngineConfig
+
+
+CONCURRENCY = (1, 2, 4, 8, 16, 32)
+BATCH_SETTINGS = ((8, 2.0), (16, 3.0), (32, 5.0))
+
+
+def run(embed, crop, workers, per_worker):
+    def worker(_):
+        latencies = []
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            embed(crop)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = [lat for chunk in pool.map(worker, range(workers)) for lat in chunk]
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / total,
+        "p50": 1000 * statistics.median(latencies),
+        "p95": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def report(label, workers, result):
+    print(f"{label:22s} c={workers:<3d} {result['throughput']:8.1f} faces/s"
+          f"   p50 {result['p50']:6.1f} ms   p95 {result['p95']:6.1f} ms")
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+
+    img = cv2.imread(sys.argv[1])
+    if img is None:
+        sys.exit(f"Cannot read image: {sys.argv[1]}")
+
+    per_worker = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    engine = FaceEngine(FaceEngineConfig(batch_max_size=1))
+    faces = engine.detect(img)
+    if not faces:
+        sys.exit("No face found in the image")
+
+    crop = engine.align(img, faces[0])
+    engine.recognizer.get_feat([crop])  # warm up
+
+    for workers in CONCURRENCY:
+        report("unbatched", workers,
+               run(lambda c: engine.recognizer.get_feat([c]), crop, workers, per_worker))
+
+        for max_batch, max_wait_ms in BATCH_SETTINGS:
+            batcher = FaceEmbeddingBatcher(engine.recognizer, max_batch, max_wait_ms)
+            report(f"batch {max_batch}/{max_wait_ms:g}ms", workers,
+                   run(batcher.embed, crop, workers, per_worker))
+            batcher.close()
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Load time, latency and memory of the face engine.
+
+Usage (from apps/documents):
+    FACE_DET_SIZE=320 FACE_ORT_INTRA_THREADS=2 \
+        python -m benchmarks.face_engine_benchmark <image> [runs]
+
+Every FaceEngineConfig env var (see services/face_engine.py) applies,
+so configurations can be compared run by run.
+"""
+import resource
+import sys
+import time
+
+import cv2
+
+from src.services.face_engine import FaceEngine, FaceEngineConfig
+from src.services.metrics import metrics
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+
+    img = cv2.imread(sys.argv[1])
+    if img is None:
+        sys.exit(f"Cannot read image: {sys.argv[1]}")
+
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    engine = FaceEngine(FaceEngineConfig.from_env())
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    engine.get(img)  # warm up
+    metrics.reset()
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        faces = engine.get(img)
+    total = time.perf_counter() - start
+
+    timings = metrics.snapshot()["timings"]
+    print(f"config:        {engine.config}")
+    print(f"load:          {engine.load_seconds:.2f} s")
+    print(f"model memory:  {(rss_after - rss_before) / 1024:.0f} MB (max RSS delta)")
+    print(f"faces found:   {len(faces)}")
+    print(f"get():         {1000 * total / runs:.1f} ms")
+    for name in ("face_detect_seconds", "face_embed_seconds"):
+        if name in timings:
+            print(f"{name:22s} mean {1000 * timings[name]['mean']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Accuracy, latency and memory of the int8 face models against float32.
+
+Usage (from apps/documents):
+    python -m benchmarks.face_quantization_benchmark <pairs.csv> [match_threshold]
+
+pairs.csv lines: document_image,selfie_image[,same_person 0/1], paths
+relative to the csv. Every pair is scored with
+_compare_faces_adjusted_for_documents by both model sets; the report shows
+the score drift, how many match decisions flip at the threshold and, when
+labels are given, the accuracy of each set.
+Run python -m tools.quantize_face_models first.
+"""
+import csv
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+from src.services import biometric_processor
+from src.services.biometric_processor import BiometricProcessor
+from src.services.face_engine import FaceEngineConfig
+from src.services.metrics import metrics
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096 / 2 ** 20
+
+
+def load_pairs(csv_path: Path):
+    pairs = []
+    with open(csv_path) as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            label = int(row[2]) if len(row) > 2 else None
+            pairs.append((csv_path.parent / row[0], csv_path.parent / row[1], label))
+    return pairs
+
+
+def score_pairs(quantized: bool, pairs):
+    metrics.reset()
+    biometric_processor.face_cache.memory.clear()
+
+    before = rss_mb()
+    processor = BiometricProcessor(FaceEngineConfig(quantized=quantized, ctx_id=-1, batch_max_size=1))
+    model_mb = rss_mb() - before
+
+    scores = []
+    start = time.perf_counter()
+    for document, selfie, _ in pairs:
+        doc_face = processor._process_face_sync(cv2.imread(str(document)), "document")
+        selfie_face = processor._process_selfie_sync(selfie.read_bytes())
+
+        if doc_face is None:
+            scores.append(None)
+            continue
+
+        scores.append(processor._compare_faces_adjusted_for_documents(doc_face, selfie_face))
+    total = time.perf_counter() - start
+
+    timings = metrics.snapshot()["timings"]
+    return {
+        "scores": scores,
+        "load": processor.face_model.load_seconds,
+        "model_mb": model_mb,
+        "pair_ms": 1000 * total / len(pairs),
+        "detect_ms": 1000 * timings["face_detect_seconds"]["mean"],
+        "embed_ms": 1000 * timings["face_embed_seconds"]["mean"],
+    }
+
+
+def accuracy(scores, pairs, threshold):
+    labelled = [(s, label) for s, (_, _, label) in zip(scores, pairs) if label is not None and s is not None]
+    if not labelled:
+        return None
+    return sum((s >= threshold) == bool(label) for s, label in labelled) / len(labelled)
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+
+    pairs = load_pairs(Path(sys.argv[1]))
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.6
+
+    results = {"float32": score_pairs(False, pairs), "int8": score_pairs(True, pairs)}
+
+    both = [
+        (f, q) for f, q in zip(results["float32"]["scores"], results["int8"]["scores"])
+        if f is not None and q is not None
+    ]
+    deltas = [abs(f - q) for f, q in both]
+    flips = sum((f >= threshold) != (q >= threshold) for f, q in both)
+
+    print(f"pairs:           {len(pairs)} ({len(both)} with a document face in both runs)")
+    if deltas:
+        print(f"score drift:     mean {statistics.mean(deltas):.4f}   max {max(deltas):.4f}")
+    print(f"decision flips:  {flips} at threshold {threshold}")
+    print()
+
+    for name, result in results.items():
+        acc = accuracy(result["scores"], pairs, threshold)
+        print(f"{name:8s} load {result['load']:5.2f} s   models {result['model_mb']:6.0f} MB   "
+              f"pair {result['pair_ms']:6.1f} ms   detect {result['detect_ms']:6.1f} ms   "
+              f"embed {result['embed_ms']:5.1f} ms"
+              + (f"   accuracy {acc:.3f}" if acc is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Stored size of a document per type: full pipeline trace as metadata
+(the previous schema) against the compact metadata, plus the size of the
+compressed trace kept for sampled documents.
+
+Usage (from apps/documents):
+    python -m benchmarks.metadata_size_report [samples_per_type]
+"""
+import statistics
+import sys
+from datetime import datetime
+
+import bson
+from bson.codec_options import CodecOptions
+
+from src.models.bson_codecs import TYPE_REGISTRY
+from src.models.document import Document
+from src.services.document_metadata import compact_metadata, compress_trace
+
+from .sample_results import LAYOUTS_DIR, load_layout, sample_enriched_results
+
+
+def record_size(metadata) -> int:
+    document = Document(
+        id=None,
+        user_id="user-1",
+        doc_type_id="1",
+        metadata=metadata,
+        file_hash="0" * 64,
+        is_valid=True,
+        validated_at=datetime.utcnow(),
+    )
+    return len(bson.encode(document.to_mongo(), codec_options=CodecOptions(type_registry=TYPE_REGISTRY)))
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    doc_type_ids = sorted(int(p.name.split("_")[0]) for p in LAYOUTS_DIR.glob("*.template.json"))
+
+    print(f"{'document type':28s} {'full KB':>8s} {'compact KB':>11s} {'ratio':>6s} {'trace KB':>9s}")
+    for doc_type_id in doc_type_ids:
+        full, compact, trace = [], [], []
+
+        for seed in range(samples):
+            results = sample_enriched_results(doc_type_id, seed)
+            full.append(record_size(results))
+            compact.append(record_size(compact_metadata(results)))
+            trace.append(len(compress_trace(results)))
+
+        name = load_layout(doc_type_id)["document_type"]
+        print(f"{name:28s} {statistics.mean(full) / 1024:8.1f} {statistics.mean(compact) / 1024:11.1f}"
+              f" {statistics.mean(full) / statistics.mean(compact):5.1f}x {statistics.mean(trace) / 1024:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
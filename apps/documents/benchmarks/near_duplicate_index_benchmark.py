@@ -0,0 +1,74 @@
+"""
+Near duplicate lookup latency, multi-index hashing vs a linear scan.
+
+Usage (from apps/documents):
+    python -m benchmarks.near_duplicate_index_benchmark [stored_hashes] [queries]
+
+Random 64 bit hashes stand for the index keys of the stored documents. Half of the queries
+are re-photographs of a stored card (a few flipped bits), the other half
+are new cards. Both lookups must return the same matches.
+"""
+import random
+import statistics
+import sys
+import time
+
+from src.services.near_duplicates import PHASH_KEY_DISTANCE
+from src.services.perceptual_hash import MultiIndexHash, hamming
+
+
+def linear_search(stored, query, max_distance):
+    matches = [(hamming(query, value), i) for i, value in enumerate(stored)]
+    return sorted(match for match in matches if match[0] <= max_distance)
+
+
+def timed(search, queries):
+    latencies, results = [], []
+
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return results, {
+        "p50": 1000 * statistics.median(latencies),
+        "p99": 1000 * latencies[int(0.99 * (len(latencies) - 1))],
+    }
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = random.Random(0)
+
+    stored = [rng.getrandbits(64) for _ in range(size)]
+
+    start = time.perf_counter()
+    index = MultiIndexHash(PHASH_KEY_DISTANCE)
+    for i, value in enumerate(stored):
+        index.add(value, i)
+    build = time.perf_counter() - start
+
+    queries = []
+    for i in range(n_queries):
+        if i % 2:
+            queries.append(rng.getrandbits(64))
+        else:
+            value = rng.choice(stored)
+            for bit in rng.sample(range(64), rng.randint(0, PHASH_KEY_DISTANCE)):
+                value ^= 1 << bit
+            queries.append(value)
+
+    indexed, indexed_stats = timed(lambda q: sorted(index.search(q)), queries)
+    scanned, scan_stats = timed(lambda q: linear_search(stored, q, PHASH_KEY_DISTANCE), queries)
+
+    assert indexed == scanned, "index and scan disagree"
+
+    print(f"{size} hashes, max distance {PHASH_KEY_DISTANCE}, index built in {build:.2f} s")
+    for name, stats in (("multi-index", indexed_stats), ("linear scan", scan_stats)):
+        print(f"{name:12s} p50 {stats['p50']:8.3f} ms   p99 {stats['p99']:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
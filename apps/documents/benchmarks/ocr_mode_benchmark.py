@@ -0,0 +1,114 @@
+"""
+Compares per-crop OCR against single-pass mosaic OCR.
+
+Usage (from apps/documents):
+    python -m benchmarks.ocr_mode_benchmark <doc_type_id> <folder with the pages> [runs]
+
+The folder holds the pages plus an expected.json with the real value of
+each field ({"nuip": "1234567890", ...}). Accuracy is reported per mode as
+the exact matches and the character similarity against those values.
+"""
+import copy
+import json
+import re
+import sys
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from src.document_impl import DocumentService
+from src.services.normalization import normalize_document
+
+
+def load_files(folder: Path) -> list[bytes]:
+    return [
+        f.read_bytes()
+        for f in sorted(folder.iterdir())
+        if f.suffix.lower() in (".jpg", ".jpeg", ".png", ".pdf")
+    ]
+
+
+def load_expected(folder: Path) -> dict[str, str]:
+    path = folder / "expected.json"
+    if not path.exists():
+        sys.exit(f"Missing {path} with the expected field values")
+    return json.loads(path.read_text())
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().upper()
+
+
+def score(textual_data: dict, expected: dict[str, str]) -> tuple[int, float]:
+    """
+    Exact matches and mean similarity of the fields against the expected values
+    """
+    exact = 0
+    similarities = []
+    for field, value in expected.items():
+        read = normalize_text(textual_data.get(field, ""))
+        value = normalize_text(value)
+        exact += read == value
+        similarities.append(SequenceMatcher(None, read, value).ratio())
+    return exact, sum(similarities) / max(len(similarities), 1)
+
+
+def semantic_results_for(service: DocumentService, doc_type_id: int, files_bytes: list[bytes]):
+    images = service.to_images(files_bytes)
+    normalized = [normalize_document(img) for img in images]
+    regions = service.segmenter.process_documents(normalized)
+    groups = [service.segmenter.group_regions(r) for r in regions]
+
+    results = service.structure_validator.process_document(
+        document_id=doc_type_id,
+        all_groups=groups,
+        all_img_shapes=[img.shape for img in normalized],
+        overlap_threshold=0.3
+    )
+    return results, normalized
+
+
+def run_mode(service, results, images, mode, runs):
+    timings = []
+    textual_data = {}
+
+    for _ in range(runs):
+        data = copy.deepcopy(results)
+        start = time.perf_counter()
+        enriched = service.post_assignment_processor.enrich_semantic_results(
+            data, images, ocr_mode=mode
+        )
+        timings.append(time.perf_counter() - start)
+        textual_data = service.post_assignment_processor.get_textual_data(enriched)
+
+    return textual_data, timings
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+
+    doc_type_id = int(sys.argv[1])
+    folder = Path(sys.argv[2])
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    expected = load_expected(folder)
+
+    service = DocumentService()
+    results, images = semantic_results_for(service, doc_type_id, load_files(folder))
+
+    per_crop, per_crop_times = run_mode(service, results, images, "per_crop", runs)
+    mosaic, mosaic_times = run_mode(service, results, images, "mosaic", runs)
+
+    for mode, textual_data, timings in (("per_crop", per_crop, per_crop_times),
+                                        ("mosaic", mosaic, mosaic_times)):
+        exact, similarity = score(textual_data, expected)
+        print(f"{mode:9s} mean {1000 * sum(timings) / runs:.1f} ms, "
+              f"exact {exact}/{len(expected)}, similarity {similarity:.3f}")
+
+    for field, value in expected.items():
+        print(f"  {field:35s} {value!r} | {per_crop.get(field, '')!r} | {mosaic.get(field, '')!r}")
+
+
+if __name__ == "__main__":
+    main()
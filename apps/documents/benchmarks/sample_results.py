@@ -0,0 +1,117 @@
+"""
+Representative enriched pipeline results built from the layouts, with the
+same nesting and NumPy scalar types the real pipeline produces: every field
+gets a couple of assigned groups of segmenter regions, a merged bbox, OCR
+text and layout scores.
+"""
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+
+LAYOUTS_DIR = Path(__file__).resolve().parent.parent / "src" / "layouts"
+IMG_SHAPE = (1000, 1580, 3)
+
+
+def load_layout(doc_type_id: int) -> Dict[str, Any]:
+    path = next(LAYOUTS_DIR.glob(f"{doc_type_id}_*.template.json"))
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _region(rng, region_id, x1, y1):
+    w, h = rng.randint(20, 200), rng.randint(12, 40)
+    x1, y1 = np.int64(x1), np.int64(y1)
+    return {
+        "region_id": region_id,
+        "bbox": (x1, y1, x1 + w, y1 + h),
+        "width": np.int64(w),
+        "height": np.int64(h),
+        "area": np.int64(w * h),
+        "density": float(rng.random()),
+        "type": "text",
+        "position": "center",
+    }
+
+
+def _field(rng, box, group_id):
+    h, w = IMG_SHAPE[:2]
+    groups = []
+
+    for _ in range(rng.randint(1, 3)):
+        x1 = int(box["x1"] * w) + rng.randint(0, 20)
+        y1 = int(box["y1"] * h) + rng.randint(0, 20)
+        regions = [_region(rng, group_id * 10 + i, x1 + 5 * i, y1) for i in range(rng.randint(2, 8))]
+        group_id += 1
+        groups.append({
+            "group_id": group_id,
+            "type": "text_block",
+            "regions": regions,
+            "bbox": regions[0]["bbox"],
+            "bbox_norm": tuple(np.float64(v) for v in (box["x1"], box["y1"], box["x2"], box["y2"])),
+        })
+
+    merged = tuple(np.float64(v + rng.uniform(-0.01, 0.01)) for v in (box["x1"], box["y1"], box["x2"], box["y2"]))
+    scores = {
+        "iou": np.float64(rng.uniform(0.4, 0.95)),
+        "coverage": np.float64(rng.uniform(0.5, 1.0)),
+        "spill_penalty": np.float64(rng.uniform(0.0, 0.2)),
+        "exists": True,
+    }
+    return groups, merged, scores, group_id
+
+
+def sample_enriched_results(doc_type_id: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    layout = load_layout(doc_type_id)
+    pages = []
+    group_id = 0
+
+    for page_idx, template_info in enumerate(layout["templates"]):
+        assignments, assignated_groups, field_details = {}, {}, {}
+
+        for field_name, box in template_info["template"].items():
+            groups, merged, scores, group_id = _field(rng, box, group_id)
+            assignments[field_name] = groups
+            assignated_groups[field_name] = {
+                "bbox": merged,
+                "text": " ".join(rng.choice(["JUAN", "PEREZ", "1.023.456", "BOGOTA", "2024-05-01"])
+                                 for _ in range(rng.randint(1, 4))),
+            }
+            field_details[field_name] = scores
+
+        final_score = np.float64(rng.uniform(0.5, 0.9))
+        pages.append({
+            "page": page_idx,
+            "side": template_info.get("side", f"page_{page_idx}"),
+            "validation": {
+                "final_score": final_score,
+                "coverage_ratio": np.float64(rng.random()),
+                "average_iou": np.float64(rng.random()),
+                "average_coverage": np.float64(rng.random()),
+                "average_spill": np.float64(rng.random()),
+                "total_fields": len(field_details),
+                "detected_fields": len(field_details),
+                "field_details": field_details,
+                "passes": bool(final_score >= 0.55),
+            },
+            "assignated_groups": assignated_groups,
+            "assignments": assignments,
+            "img_shape": IMG_SHAPE,
+        })
+
+    return {
+        "document_type_id": doc_type_id,
+        "pages": pages,
+        "extracted_data": {
+            (f"page{p['page']}_{k}" if len(pages) > 1 else k): v
+            for p in pages for k, v in p["assignated_groups"].items()
+        },
+        "combined_validation": {
+            "final_score": np.mean([p["validation"]["final_score"] for p in pages]),
+            "page_scores": [p["validation"]["final_score"] for p in pages],
+        },
+    }
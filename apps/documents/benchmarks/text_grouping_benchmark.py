@@ -0,0 +1,81 @@
+"""
+Line and word grouping of TextDetector on dense regions.
+
+Usage (from apps/documents):
+    python -m benchmarks.text_grouping_benchmark [components ...]
+
+Compares the sweep-line grouping against the previous quadratic
+implementation on synthetic regions with thousands of glyph components.
+"""
+import sys
+import time
+
+import numpy as np
+
+from src.services.text_detection import TextDetector
+
+
+def quadratic_lines(components, y_threshold=10):
+    components = sorted(components, key=lambda c: c["centroid"][1])
+    lines = []
+
+    for comp in components:
+        for line in lines:
+            avg_y = np.mean([c["centroid"][1] for c in line])
+            if abs(comp["centroid"][1] - avg_y) < y_threshold:
+                line.append(comp)
+                break
+        else:
+            lines.append([comp])
+
+    return lines
+
+
+def dense_region(n, rng):
+    """Glyph-like components laid out as text rows of a dense page"""
+    per_row = 80
+    components = []
+
+    for i in range(n):
+        row, col = divmod(i, per_row)
+        x = col * 14 + rng.integers(0, 3)
+        y = row * 24 + rng.integers(0, 4)
+        w, h = rng.integers(6, 11), rng.integers(12, 18)
+        components.append({
+            "bbox": (x, y, x + w, y + h),
+            "centroid": np.array([x + w / 2, y + h / 2]),
+        })
+
+    return components
+
+
+def timed(fn, *args, runs=3):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [500, 2000, 5000]
+    rng = np.random.default_rng(0)
+
+    for n in sizes:
+        components = dense_region(n, rng)
+
+        old = timed(quadratic_lines, components)
+        new = timed(TextDetector.group_components_into_lines, components)
+
+        lines = TextDetector.group_components_into_lines(components)
+        words = timed(lambda: [TextDetector.group_line_into_words(l) for l in lines])
+
+        print(
+            f"{n:6d} components | quadratic lines {1000 * old:9.1f} ms | "
+            f"sweep lines {1000 * new:7.1f} ms | words {1000 * words:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x64ocuments.proto\x12\tdocuments\"p\n\x19\x44ocumentValidationRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x64oc_type_id\x18\x02 \x01(\t\x12\r\n\x05\x66iles\x18\x03 \x03(\x0c\x12\x13\n\x06selfie\x18\x04 \x01(\x0cH\x00\x88\x01\x01\x42\t\n\x07_selfie\"Y\n\x1a\x44ocumentValidationResponse\x12\x10\n\x08is_valid\x18\x01 \x01(\x08\x12\x12\n\nerror_code\x18\x02 \x01(\t\x12\x15\n\rerror_message\x18\x03 \x01(\t2r\n\x0f\x44ocumentService\x12_\n\x10ValidateDocument\x12$.documents.DocumentValidationRequest\x1a%.documents.DocumentValidationResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x64ocuments.proto\x12\tdocuments\"p\n\x19\x44ocumentValidationRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x64oc_type_id\x18\x02 \x01(\t\x12\r\n\x05\x66iles\x18\x03 \x03(\x0c\x12\x13\n\x06selfie\x18\x04 \x01(\x0cH\x00\x88\x01\x01\x42\t\n\x07_selfie\"n\n\x1a\x44ocumentValidationResponse\x12\x10\n\x08is_valid\x18\x01 \x01(\x08\x12\x12\n\nerror_code\x18\x02 \x01(\t\x12\x15\n\rerror_message\x18\x03 \x01(\t\x12\x13\n\x0b\x64ocument_id\x18\x04 \x01(\t\"Q\n\x19SelfieVerificationRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x64ocument_id\x18\x02 \x01(\t\x12\x0e\n\x06selfie\x18\x03 \x01(\x0c\"h\n\x1aSelfieVerificationResponse\x12\x10\n\x08is_match\x18\x01 \x01(\x08\x12\r\n\x05score\x18\x02 \x01(\x02\x12\x12\n\nerror_code\x18\x03 \x01(\t\x12\x15\n\rerror_message\x18\x04 \x01(\t\"\xb1\x01\n\x14ListDocumentsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x64oc_type_id\x18\x02 \x01(\t\x12\x15\n\x08is_valid\x18\x03 \x01(\x08H\x00\x88\x01\x01\x12\x16\n\x0evalidated_from\x18\x04 \x01(\t\x12\x14\n\x0cvalidated_to\x18\x05 \x01(\t\x12\r\n\x05limit\x18\x06 \x01(\x05\x12\x12\n\npage_token\x18\x07 \x01(\tB\x0b\n\t_is_valid\"\x9b\x01\n\x0f\x44ocumentSummary\x12\x13\n\x0b\x64ocument_id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x13\n\x0b\x64oc_type_id\x18\x03 \x01(\t\x12\x10\n\x08is_valid\x18\x04 \x01(\x08\x12\x14\n\x0cvalidated_at\x18\x05 \x01(\t\x12\x11\n\tfile_hash\x18\x06 \x01(\t\x12\x12\n\npage_token\x18\x07 \x01(\t\"\x0f\n\rHealthRequest\"d\n\x0eHealthResponse\x12\x0f\n\x07serving\x18\x01 \x01(\x08\x12\x16\n\x0epipeline_ready\x18\x02 \x01(\x08\x12\x14\n\x0cmongo_status\x18\x03 \x01(\t\x12\x13\n\x0bmongo_error\x18\x04 \x01(\t2\xde\x02\n\x0f\x44ocumentService\x12_\n\x10ValidateDocument\x12$.documents.DocumentValidationRequest\x1a%.documents.DocumentValidationResponse\x12[\n\x0cVerifySelfie\x12$.documents.SelfieVerificationRequest\x1a%.documents.SelfieVerificationResponse\x12N\n\rListDocuments\x12\x1f.documents.ListDocumentsRequest\x1a\x1a.documents.DocumentSummary0\x01\x12=\n\x06Health\x12\x18.documents.HealthRequest\x1a\x19.documents.HealthResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,7 +34,19 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_DOCUMENTVALIDATIONREQUEST']._serialized_start=30
   _globals['_DOCUMENTVALIDATIONREQUEST']._serialized_end=142
   _globals['_DOCUMENTVALIDATIONRESPONSE']._serialized_start=144
-  _globals['_DOCUMENTVALIDATIONRESPONSE']._serialized_end=233
-  _globals['_DOCUMENTSERVICE']._serialized_start=235
-  _globals['_DOCUMENTSERVICE']._serialized_end=349
+  _globals['_DOCUMENTVALIDATIONRESPONSE']._serialized_end=254
+  _globals['_SELFIEVERIFICATIONREQUEST']._serialized_start=256
+  _globals['_SELFIEVERIFICATIONREQUEST']._serialized_end=337
+  _globals['_SELFIEVERIFICATIONRESPONSE']._serialized_start=339
+  _globals['_SELFIEVERIFICATIONRESPONSE']._serialized_end=443
+  _globals['_LISTDOCUMENTSREQUEST']._serialized_start=446
+  _globals['_LISTDOCUMENTSREQUEST']._serialized_end=623
+  _globals['_DOCUMENTSUMMARY']._serialized_start=626
+  _globals['_DOCUMENTSUMMARY']._serialized_end=781
+  _globals['_HEALTHREQUEST']._serialized_start=783
+  _globals['_HEALTHREQUEST']._serialized_end=798
+  _globals['_HEALTHRESPONSE']._serialized_start=800
+  _globals['_HEALTHRESPONSE']._serialized_end=900
+  _globals['_DOCUMENTSERVICE']._serialized_start=903
+  _globals['_DOCUMENTSERVICE']._serialized_end=1253
 # @@protoc_insertion_point(module_scope)
@@ -39,6 +39,21 @@ class DocumentServiceStub(object):
                 request_serializer=documents__pb2.DocumentValidationRequest.SerializeToString,
                 response_deserializer=documents__pb2.DocumentValidationResponse.FromString,
                 _registered_method=True)
+        self.VerifySelfie = channel.unary_unary(
+                '/documents.DocumentService/VerifySelfie',
+                request_serializer=documents__pb2.SelfieVerificationRequest.SerializeToString,
+                response_deserializer=documents__pb2.SelfieVerificationResponse.FromString,
+                _registered_method=True)
+        self.ListDocuments = channel.unary_stream(
+                '/documents.DocumentService/ListDocuments',
+                request_serializer=documents__pb2.ListDocumentsRequest.SerializeToString,
+                response_deserializer=documents__pb2.DocumentSummary.FromString,
+                _registered_method=True)
+        self.Health = channel.unary_unary(
+                '/documents.DocumentService/Health',
+                request_serializer=documents__pb2.HealthRequest.SerializeToString,
+                response_deserializer=documents__pb2.HealthResponse.FromString,
+                _registered_method=True)
 
 
 class DocumentServiceServicer(object):
@@ -50,6 +65,24 @@ class DocumentServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def VerifySelfie(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListDocuments(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Health(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DocumentServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +91,21 @@ def add_DocumentServiceServicer_to_server(servicer, server):
                     request_deserializer=documents__pb2.DocumentValidationRequest.FromString,
                     response_serializer=documents__pb2.DocumentValidationResponse.SerializeToString,
             ),
+            'VerifySelfie': grpc.unary_unary_rpc_method_handler(
+                    servicer.VerifySelfie,
+                    request_deserializer=documents__pb2.SelfieVerificationRequest.FromString,
+                    response_serializer=documents__pb2.SelfieVerificationResponse.SerializeToString,
+            ),
+            'ListDocuments': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListDocuments,
+                    request_deserializer=documents__pb2.ListDocumentsRequest.FromString,
+                    response_serializer=documents__pb2.DocumentSummary.SerializeToString,
+            ),
+            'Health': grpc.unary_unary_rpc_method_handler(
+                    servicer.Health,
+                    request_deserializer=documents__pb2.HealthRequest.FromString,
+                    response_serializer=documents__pb2.HealthResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'documents.DocumentService', rpc_method_handlers)
@@ -95,3 +143,84 @@ class DocumentService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def VerifySelfie(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/documents.DocumentService/VerifySelfie',
+            documents__pb2.SelfieVerificationRequest.SerializeToString,
+            documents__pb2.SelfieVerificationResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListDocuments(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/documents.DocumentService/ListDocuments',
+            documents__pb2.ListDocumentsRequest.SerializeToString,
+            documents__pb2.DocumentSummary.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Health(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/documents.DocumentService/Health',
+            documents__pb2.HealthRequest.SerializeToString,
+            documents__pb2.HealthResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
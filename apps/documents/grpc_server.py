@@ -1,4 +1,11 @@
+import asyncio
+from datetime import timezone
+
+import grpc
+
 from src.document_impl import DocumentService
+from src.document_repo import DocumentsRepository, InvalidPageTokenError, page_token, parse_timestamp
+from src.mongo_client import mongo
 from generated import documents_pb2_grpc
 from generated import documents_pb2
 
@@ -6,9 +13,46 @@ class DocumentGrpcServer(
     documents_pb2_grpc.DocumentServiceServicer
 ):
 
+    def __init__(self):
+        self.pipeline_ready = False
+        # shared by every request, built once by warm_up
+        self.service = None
+
+    async def warm_up(self):
+        """
+        Load face models and layouts on a worker thread, independently
+        of Mongo being reachable
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            self.service = await loop.run_in_executor(None, DocumentService)
+        except Exception as e:
+            print(f"Pipeline warm up failed: {e}")
+            return
+
+        self.pipeline_ready = True
+        print("Document pipeline warmed up")
+
+    async def ready_service(self, context) -> DocumentService:
+        # building the service here would load the models on the event loop
+        if not self.pipeline_ready:
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "Document pipeline is warming up")
+        return self.service
+
+    async def Health(self, request, context):
+
+        mongo_health = mongo.health()
+
+        return documents_pb2.HealthResponse(
+            serving=self.pipeline_ready and mongo.ready,
+            pipeline_ready=self.pipeline_ready,
+            mongo_status=mongo_health["status"],
+            mongo_error=mongo_health["error"]
+        )
+
     async def ValidateDocument(self, request, context):
 
-        service = DocumentService()
+        service = await self.ready_service(context)
 
         result = await service.process_document(
             user_id=request.user_id,
@@ -20,5 +64,59 @@ class DocumentGrpcServer(
         return documents_pb2.DocumentValidationResponse(
             is_valid=result.get("is_valid", False),
             error_code=result.get("error_code", ""),
+            error_message=result.get("error_message", ""),
+            document_id=result.get("document_id", "")
+        )
+
+    async def VerifySelfie(self, request, context):
+
+        service = await self.ready_service(context)
+
+        result = await service.verify_selfie(
+            user_id=request.user_id,
+            document_id=request.document_id,
+            selfie_bytes=request.selfie
+        )
+
+        return documents_pb2.SelfieVerificationResponse(
+            is_match=result.get("is_match", False),
+            score=result.get("score", 0.0),
+            error_code=result.get("error_code", ""),
             error_message=result.get("error_message", "")
         )
+
+    async def ListDocuments(self, request, context):
+
+        try:
+            validated_from = parse_timestamp(request.validated_from) if request.validated_from else None
+            validated_to = parse_timestamp(request.validated_to) if request.validated_to else None
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Invalid timestamp: {e}")
+
+        repo = DocumentsRepository()
+
+        documents = repo.find_documents(
+            user_id=request.user_id or None,
+            doc_type_id=request.doc_type_id or None,
+            is_valid=request.is_valid if request.HasField("is_valid") else None,
+            validated_from=validated_from,
+            validated_to=validated_to,
+            after=request.page_token or None,
+            limit=request.limit
+        )
+
+        try:
+            async for doc in documents:
+                yield documents_pb2.DocumentSummary(
+                    document_id=str(doc["_id"]),
+                    user_id=doc.get("user_id", ""),
+                    doc_type_id=doc.get("doc_type_id", ""),
+                    is_valid=doc.get("is_valid", False),
+                    # stored as naive UTC
+                    validated_at=doc["validated_at"].replace(tzinfo=timezone.utc).isoformat(),
+                    file_hash=doc.get("file_hash", ""),
+                    page_token=page_token(doc)
+                )
+
+        except InvalidPageTokenError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
@@ -1,5 +1,6 @@
 import asyncio
 import grpc
+import signal
 import sys
 import os
 
@@ -7,13 +8,29 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "generated"))
 
 from grpc_server import DocumentGrpcServer
 from generated import documents_pb2_grpc
+from src.document_repo import DocumentsRepository, close_write_buffer
+from src.mongo_client import mongo
+from src.services.near_duplicates import near_duplicates
+
+SHUTDOWN_GRACE_SECONDS = 10
+
+
+async def on_mongo_ready():
+    repo = DocumentsRepository()
+    await repo.ensure_indexes()
+    near_duplicates.start_sync(repo)
 
 
 async def serve():
+    # Mongo readiness and pipeline warm up run in the background,
+    # the port opens right away and Health reports both
+    mongo.start_readiness_check(on_ready=on_mongo_ready)
+
     server = grpc.aio.server()
+    servicer = DocumentGrpcServer()
 
     documents_pb2_grpc.add_DocumentServiceServicer_to_server(
-        DocumentGrpcServer(),
+        servicer,
         server
     )
 
@@ -22,7 +39,23 @@ async def serve():
     print("Document gRPC service running on port 8000")
 
     await server.start()
-    await server.wait_for_termination()
+    warm_up = asyncio.create_task(servicer.warm_up())
+
+    # stop accepting requests on SIGTERM/SIGINT and let in-flight ones finish
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: asyncio.create_task(server.stop(SHUTDOWN_GRACE_SECONDS)))
+
+    try:
+        await server.wait_for_termination()
+    finally:
+        # Health already gates on the warm up, a shutdown during it drops it
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+        # documents still buffered by the write-behind buffer
+        await close_write_buffer()
+        await near_duplicates.close()
+        await mongo.close()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
+import asyncio
 from datetime import datetime
+import hashlib
+import json
 import os
+import threading
 from typing import Optional
 import uuid
 import time
@@ -9,142 +13,520 @@ import numpy as np
 from pdf2image import convert_from_bytes
 import pytesseract
 from PyPDF2 import PdfReader
-import hashlib
 
 from .services.biometric_processor import BiometricError, BiometricProcessor
+from .services.document_hash import DocumentDeduplicator, hash_files, hash_selfie
+from .services.document_metadata import (
+    METADATA_SCHEMA_VERSION, compact_metadata, compress_trace, should_store_trace
+)
+from .services.face_template import FaceTemplateCodec
 from .services.post_asignment_processor import PostAssignmentProcessor
 from .services.semantic_asignation import SemanticAsignation
 from .services.text_detection import TextDetector
 from .services.structural_segmenter import StructuralSegmenter
+from .services.metrics import metrics
+from .services.near_duplicates import near_duplicates
 from .services.normalization import NormalizationError, normalize_document
-from .document_repo import DocumentsRepository
+from .services.page_cache import file_key, page_cache, page_text_cache, page_text_key
+from .services.perceptual_hash import card_phash_hex, crop_region, phash_hex
+from .document_repo import DocumentsRepository, DocumentTracesRepository
+from .mongo_client import mongo
 from .models.document import Document
 from .models.document_type import DocumentType
-from .services.quality_validation import LowQualityError, ValidationService
+from .services.quality_validation import LowQualityError, SelfieQualityError, ValidationService
+from .services.result_cache import result_cache, result_cache_key
 
 
 class TechnicalValidationError(Exception):
     pass
 
+class PipelineAborted(Exception):
+    pass
+
 class DocumentService:
 
     MAX_FILE_SIZE = 7 * 1024 * 1024   # 7MB
     MAX_FILES = 3
+    # biometric score a selfie needs to match a stored document face
+    SELFIE_MATCH_THRESHOLD = 0.6
+
+    # final score weights, with and without a selfie
+    SCORE_WEIGHTS = {"structural": 0.5, "logic": 0.3, "biometric": 0.2}
+    SCORE_WEIGHTS_NO_BIOMETRIC = {"structural": 0.65, "logic": 0.35}
+    VALID_THRESHOLD = 0.55
+    # bump when a pipeline stage changes its output, cached results are then ignored
+    PIPELINE_VERSION = 3
+
+    # errors that only depend on the submitted bytes, cached like results.
+    # Biometric errors may come from the face models and are always retried
+    CACHEABLE_ERRORS = (
+        "TECHNICAL_VALIDATION_ERROR",
+        "LOW_QUALITY_ERROR",
+        "SELFIE_QUALITY_ERROR",
+        "NORMALIZATION_ERROR",
+    )
 
     def __init__(self):
         self.repo = DocumentsRepository()
+        self.deduplicator = DocumentDeduplicator(self.repo, available=lambda: mongo.ready)
+        self.traces = DocumentTracesRepository()
         self.validator = ValidationService()
         self.segmenter = StructuralSegmenter()
         self.text_detector = TextDetector()
         self.post_assignment_processor = PostAssignmentProcessor()
         self.structure_validator = SemanticAsignation()
         self.biometric = BiometricProcessor()
+        self.face_templates = FaceTemplateCodec(
+            model=self.biometric.face_model.config.recognition_model
+        )
 
     async def process_document(self, user_id, doc_type_id, files_bytes: list[bytes], selfie_bytes: Optional[bytes] = None):
 
+        selfie_task = None
+
+        # gRPC sends the type as a string, layouts are keyed by int
         try:
-            file_hash = self.hash_files(files_bytes)
-            file_images = self.to_images(files_bytes)
-            self.validator.quality_validation(file_images)
-
-            normalized_images = [
-                normalize_document(img)
-                for img in file_images
-            ]
-
-            # structural segmentation
-            structural_regions = self.segmenter.process_documents(normalized_images)
-            
-            # prepare data for semantic assignation
-            all_groups = []
-            all_img_shapes = []
-            
-            for page_idx, (img, regions) in enumerate(zip(normalized_images, structural_regions)):
-                # group each page regions
-                groups = self.segmenter.group_regions(regions)
-                # add to semantic assignation lists
-                all_groups.append(groups)
-                all_img_shapes.append(img.shape)  
-            
-            # semantic validation and assignation for all pages
-            structural_results = self.structure_validator.process_document(
-                document_id=doc_type_id,
-                all_groups=all_groups,
-                all_img_shapes=all_img_shapes,
-                overlap_threshold=0.3
-            )
+            doc_type_id = self.document_type_id(doc_type_id)
+        except TechnicalValidationError as e:
+            return self.error_result("TECHNICAL_VALIDATION_ERROR", e)
 
-            # after ocr processing
-            enriched_results = self.post_assignment_processor.enrich_semantic_results(
-                structural_results,
-                normalized_images
-            )
-            # extract text
-            textual_data = self.post_assignment_processor.get_textual_data(enriched_results)
-            
-            # text logic validation
-            logic_validation_result = self.post_assignment_processor.validate_textual_data(textual_data)
+        file_hash = self.hash_files(files_bytes)
+        selfie_hash = hash_selfie(selfie_bytes)
+
+        # identical recent submission: reuse its verdict before decoding anything
+        verdict = await self.deduplicator.find_verdict(user_id, str(doc_type_id), file_hash, selfie_hash)
+        if verdict is not None:
+            return verdict
+
+        # same bytes already processed (any user): reuse the outcome, no decoding
+        cache_key = self.result_cache_key(doc_type_id, file_hash, selfie_hash)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            if "error_code" in cached:
+                return {"success": False, **cached}
+            return await self.save_result(user_id, doc_type_id, file_hash, selfie_hash, cached)
 
+        document_task = None
+        # tells the document pipeline thread to stop before its next stage
+        abort = threading.Event()
+
+        try:
             if selfie_bytes is not None:
-                # active biometric pipeline
-                doc_face = await self.biometric.get_face_from_full_image(normalized_images)
-                biometric_result = await self.biometric.verify_biometric(doc_face, selfie_bytes)
+                # the selfie branch does not depend on the document:
+                # it runs on its own thread and joins at scoring time
+                selfie_task = self.biometric.start_selfie_processing(selfie_bytes)
+
+            document_task = asyncio.ensure_future(self.run_document_pipeline(
+                user_id, doc_type_id, files_bytes, file_hash, selfie_hash, abort
+            ))
+
+            if selfie_task is not None:
+                # a rejected selfie fails the request as soon as it is known,
+                # without waiting for OCR and the document face
+                await asyncio.wait({document_task, selfie_task}, return_when=asyncio.FIRST_EXCEPTION)
+                selfie_error = self.biometric.selfie_failure(selfie_task)
+                if selfie_error is not None and not document_task.done():
+                    metrics.incr("selfie_early_rejections")
+                    raise selfie_error
+
+            analysis = await document_task
+
+            previous = analysis.get("previous")
+            if previous is not None:
+                return {
+                    "success": True,
+                    "is_valid": previous["is_valid"],
+                    "document_id": previous["document_id"],
+                    "duplicate": True,
+                }
+
+            phash = analysis["phash"]
+            photo_phash = analysis["photo_phash"]
+            structural_results = analysis["structural_results"]
+            enriched_results = analysis["enriched_results"]
+
+            biometric_result = None
+            face_template = None
+            if selfie_task is not None:
+                biometric_result = await self.biometric.score_faces(
+                    analysis["doc_face"], selfie_task
+                )
+                face_template = self.face_templates.encode(analysis["doc_face"])
 
             final_score = self.calculate_final_document_score(
                 structural_results=structural_results,
-                logic_score=logic_validation_result,
-                biometric_score=biometric_result if selfie_bytes else None
+                logic_score=analysis["logic_score"],
+                biometric_score=biometric_result
             )
 
-            is_valid = True if final_score >= 0.55 else False
+            is_valid = True if final_score >= self.VALID_THRESHOLD else False
             print("final score: "+ str(final_score))
 
         except BiometricError as e:
-            return {
-                "success": False,
-                "error_code": "BIOMETRIC_ERROR",
-                "error_message": str(e)
-            }
+            return self.error_result("BIOMETRIC_ERROR", e, cache_key)
         
         except TechnicalValidationError as e:
-            return {
-                "success": False,
-                "error_code": "TECHNICAL_VALIDATION_ERROR",
-                "error_message": str(e)
-            }
+            return self.error_result("TECHNICAL_VALIDATION_ERROR", e, cache_key)
         
         except LowQualityError as e:
-            return {
-                "success": False,
-                "error_code": "LOW_QUALITY_ERROR",
-                "error_message": str(e)
-            }
+            return self.error_result("LOW_QUALITY_ERROR", e, cache_key)
+
+        except SelfieQualityError as e:
+            return self.error_result("SELFIE_QUALITY_ERROR", e, cache_key)
         
         except NormalizationError as e:
-            return {
-                "success": False,
-                "error_code": "NORMALIZATION_ERROR",
-                "error_message": str(e)
-            }
+            return self.error_result("NORMALIZATION_ERROR", e, cache_key)
+
+        finally:
+            if selfie_task is not None:
+                self.biometric.discard_selfie_task(selfie_task)
+            if document_task is not None:
+                if not document_task.done():
+                    # the worker thread stops before its next stage
+                    abort.set()
+                    document_task.cancel()
+                elif not document_task.cancelled():
+                    # mark the error as retrieved so asyncio does not log it
+                    document_task.exception()
+
+        result = {
+            "is_valid": is_valid,
+            "metadata": compact_metadata(enriched_results),
+            "face_template": face_template,
+            "phash": phash,
+            "photo_phash": photo_phash,
+        }
+        if cache_key:
+            result_cache.set(cache_key, result)
+
+        response = await self.save_result(user_id, doc_type_id, file_hash, selfie_hash, result)
+
+        if should_store_trace():
+            trace = await asyncio.get_running_loop().run_in_executor(
+                None, compress_trace, enriched_results
+            )
+            await self.traces.save(response["document_id"], trace)
+
+        return response
+
+    async def run_document_pipeline(self, user_id, doc_type_id, files_bytes: list[bytes], file_hash: str,
+                                    selfie_hash: Optional[str], abort: threading.Event) -> dict:
+        """
+        Document side of the request on worker threads: page stages, near
+        duplicate lookup, then the analysis. Returns the analysis, or
+        {"previous": match} when a near duplicate verdict is reused
+        """
+        loop = asyncio.get_running_loop()
+        pages = await loop.run_in_executor(None, self.load_pages, files_bytes)
+        phash, photo_phash = await loop.run_in_executor(None, self.card_hashes, doc_type_id, pages)
+
+        # same card and photo sent again by the same user: reuse its verdict
+        matches = near_duplicates.find(phash, str(doc_type_id))
+        previous = near_duplicates.reusable(matches, user_id, selfie_hash, photo_phash)
+        if previous is not None:
+            return {"previous": previous, "phash": phash, "photo_phash": photo_phash}
+
+        analysis = await loop.run_in_executor(
+            None,
+            self.analyze_document,
+            doc_type_id,
+            files_bytes,
+            selfie_hash is not None,
+            file_hash,
+            pages,
+            abort
+        )
+        return {**analysis, "phash": phash, "photo_phash": photo_phash}
+
+    async def save_result(self, user_id, doc_type_id, file_hash: str, selfie_hash: Optional[str],
+                          result: dict) -> dict:
+        """
+        Persist a computed or cached result as this user's document,
+        flagging the other users who uploaded the same card
+        """
+        matches = near_duplicates.find(result["phash"], str(doc_type_id))
 
         document = Document(
             id=None,
             user_id=user_id,
-            doc_type_id=doc_type_id,
-            metadata=enriched_results,
+            # stored as the string of the gRPC contract
+            doc_type_id=str(doc_type_id),
+            metadata=result["metadata"],
             file_hash=file_hash,
-            is_valid=is_valid,
+            is_valid=result["is_valid"],
             validated_at=datetime.utcnow(),
+            face_template=result["face_template"],
+            selfie_hash=selfie_hash,
+            phash=result["phash"],
+            photo_phash=result.get("photo_phash"),
+            cross_user_duplicates=near_duplicates.other_users(matches, user_id) or None,
         )
 
         saved_doc = await self.repo.create(document)
+        near_duplicates.add({**document.to_mongo(), "_id": saved_doc})
 
         return {
             "success": True,
-            "is_valid": is_valid,
+            "is_valid": result["is_valid"],
+            "document_id": saved_doc,
+        }
+
+    def document_type_id(self, doc_type_id) -> int:
+        """
+        Layout id of a requested document type, TechnicalValidationError
+        when it is not a number or has no layout
+        """
+        try:
+            layout_id = int(doc_type_id)
+        except (TypeError, ValueError):
+            raise TechnicalValidationError(f"Invalid document type: {doc_type_id!r}")
+
+        if layout_id not in self.structure_validator.layouts:
+            raise TechnicalValidationError(f"Unknown document type: {layout_id}")
+
+        return layout_id
+
+    def error_result(self, error_code: str, error: Exception, cache_key: Optional[str] = None) -> dict:
+        result = {
+            "error_code": error_code,
+            "error_message": str(error)
+        }
+        if cache_key and error_code in self.CACHEABLE_ERRORS:
+            result_cache.set(cache_key, result)
+
+        return {"success": False, **result}
+
+    @classmethod
+    def pipeline_version(cls) -> str:
+        """
+        Fingerprint of what turns pipeline outputs into a stored result
+        """
+        settings = {
+            "version": cls.PIPELINE_VERSION,
+            "weights": cls.SCORE_WEIGHTS,
+            "weights_no_biometric": cls.SCORE_WEIGHTS_NO_BIOMETRIC,
+            "valid_threshold": cls.VALID_THRESHOLD,
+            "metadata_schema": METADATA_SCHEMA_VERSION,
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+    def result_cache_key(self, doc_type_id, file_hash: str, selfie_hash: Optional[str]) -> Optional[str]:
+        """
+        None when the layout is unknown, such requests are never cached
+        """
+        layout_version = self.structure_validator.layout_fingerprint(doc_type_id)
+        if layout_version is None:
+            return None
+
+        pipeline_version = self.pipeline_version()
+        if selfie_hash is not None:
+            # templates of another recognition model are not comparable
+            pipeline_version += ":" + self.face_templates.model
+
+        return result_cache_key(file_hash, selfie_hash, doc_type_id, layout_version, pipeline_version)
+
+    async def verify_selfie(self, user_id, document_id: str, selfie_bytes: bytes):
+        """
+        Compare a new selfie with the face template stored for a document,
+        the document images are not processed again
+        """
+        document = await self.repo.get_by_id(document_id)
+        if document is None or document.get("user_id") != user_id:
+            return {
+                "success": False,
+                "error_code": "DOCUMENT_NOT_FOUND",
+                "error_message": "Document not found"
+            }
+
+        if not document.get("face_template"):
+            return {
+                "success": False,
+                "error_code": "FACE_TEMPLATE_NOT_FOUND",
+                "error_message": "Document was validated without a selfie"
+            }
+
+        try:
+            doc_face = self.face_templates.decode(document["face_template"])
+            score = await self.biometric.verify_biometric(doc_face, selfie_bytes)
+
+        except BiometricError as e:
+            return {
+                "success": False,
+                "error_code": "BIOMETRIC_ERROR",
+                "error_message": str(e)
+            }
+
+        except SelfieQualityError as e:
+            return {
+                "success": False,
+                "error_code": "SELFIE_QUALITY_ERROR",
+                "error_message": str(e)
+            }
+
+        return {
+            "success": True,
+            "is_match": score >= self.SELFIE_MATCH_THRESHOLD,
+            "score": score,
         }
 
     
+    def analyze_document(self, doc_type_id, files_bytes: list[bytes], find_face: bool = False,
+                         file_hash: Optional[str] = None, pages: Optional[list[dict]] = None,
+                         abort: Optional[threading.Event] = None) -> dict:
+        """
+        CPU bound document pipeline: decoding, quality, normalization,
+        segmentation, semantic assignation, OCR and, when needed,
+        the document face. Runs on a worker thread.
+
+        Pages of files already seen reuse their cached stages and OCR text,
+        only the pages of new files are computed. pages already loaded
+        with load_pages can be passed in. Once abort is set (the request
+        already failed) PipelineAborted is raised before the next stage.
+        """
+        if pages is None:
+            pages = self.load_pages(files_bytes)
+        self.check_aborted(abort)
+        normalized_images = [page["image"] for page in pages]
+
+        # prepare data for semantic assignation
+        all_groups = [page["groups"] for page in pages]
+        all_img_shapes = [img.shape for img in normalized_images]
+        
+        # semantic validation and assignation for all pages
+        structural_results = self.structure_validator.process_document(
+            document_id=doc_type_id,
+            all_groups=all_groups,
+            all_img_shapes=all_img_shapes,
+            overlap_threshold=0.3
+        )
+
+        # after ocr processing, only pages without cached text are read
+        layout = self.structure_validator.layouts[doc_type_id]
+        text_keys = [
+            page_text_key(page["key"], page_idx, layout["fingerprint"], layout["ocr_mode"])
+            for page_idx, page in enumerate(pages)
+        ]
+        cached_texts = [page_text_cache.get(key) for key in text_keys]
+
+        self.check_aborted(abort)
+        enriched_results = self.post_assignment_processor.enrich_semantic_results(
+            structural_results,
+            normalized_images,
+            ocr_mode=layout["ocr_mode"],
+            ocr_profiles=[t["ocr_profiles"] for t in layout["templates"]],
+            pages=[page_idx for page_idx, texts in enumerate(cached_texts) if texts is None]
+        )
+
+        for page_result, key, texts in zip(enriched_results["pages"], text_keys, cached_texts):
+            if texts is None:
+                page_text_cache.set(key, self.post_assignment_processor.page_texts(page_result))
+            else:
+                self.post_assignment_processor.set_page_texts(page_result, texts)
+        # extract text
+        textual_data = self.post_assignment_processor.get_textual_data(enriched_results)
+        
+        # text logic validation
+        logic_validation_result = self.post_assignment_processor.validate_textual_data(textual_data)
+
+        doc_face = None
+        if find_face:
+            self.check_aborted(abort)
+            # document side of the biometric pipeline
+            photo_regions = self.structure_validator.photo_field_regions(
+                doc_type_id, structural_results
+            )
+            doc_face = self.biometric.find_document_face(
+                normalized_images,
+                photo_regions,
+                cache_key=f"{doc_type_id}:{file_hash}" if file_hash else None
+            )
+
+        return {
+            "structural_results": structural_results,
+            "enriched_results": enriched_results,
+            "logic_score": logic_validation_result,
+            "doc_face": doc_face,
+        }
+
+    def check_aborted(self, abort: Optional[threading.Event]):
+        if abort is not None and abort.is_set():
+            raise PipelineAborted("Document pipeline stopped, the request already failed")
+
+    def load_pages(self, files_bytes: list[bytes]) -> list[dict]:
+        """
+        Normalized image, structural regions and groups of every page,
+        cached per file content
+        """
+        if isinstance(files_bytes, bytes):
+            files_bytes = [files_bytes]
+
+        if len(files_bytes) > self.MAX_FILES:
+            raise TechnicalValidationError("Max 3 files allowed per document")
+
+        pages = []
+
+        for file_bytes in files_bytes:
+            key = file_key(file_bytes)
+
+            file_pages = page_cache.get(key)
+            if file_pages is None:
+                file_pages = self.process_file(file_bytes)
+                page_cache.set(key, file_pages)
+
+            # a pdf holds several pages
+            pages.extend(
+                {**page, "key": f"{key}:{page_idx}"}
+                for page_idx, page in enumerate(file_pages)
+            )
+
+        return pages
+
+    def card_hashes(self, doc_type_id, pages: list[dict]) -> tuple[list[str], Optional[str]]:
+        """
+        Card hash of every page over the layout text fields, which tell
+        two holders of the same document type apart, and the perceptual
+        hash of the first holder photo field (None without one)
+        """
+        phash = []
+        photo_phash = None
+
+        for page_idx, page in enumerate(pages):
+            img = page["image"]
+            phash.append(card_phash_hex(img, self.structure_validator.text_field_regions(doc_type_id, page_idx)))
+
+            if photo_phash is None:
+                photo_regions = self.structure_validator.face_photo_template_regions(doc_type_id, page_idx)
+                if photo_regions:
+                    photo_phash = phash_hex(crop_region(img, photo_regions[0]))
+
+        return phash, photo_phash
+
+    def process_file(self, file_bytes: bytes) -> list[dict]:
+        """
+        Page stages of a single file: decoding, quality, normalization,
+        structural segmentation and grouping
+        """
+        file_images = self.to_images([file_bytes])
+        self.validator.quality_validation(file_images)
+
+        normalized_images = [
+            normalize_document(img)
+            for img in file_images
+        ]
+
+        # structural segmentation
+        structural_regions = self.segmenter.process_documents(normalized_images)
+
+        return [
+            {
+                "image": img,
+                "regions": regions,
+                # group each page regions
+                "groups": self.segmenter.group_regions(regions),
+            }
+            for img, regions in zip(normalized_images, structural_regions)
+        ]
+
     # helper methods
     # technical initial validation
 
@@ -260,24 +642,21 @@ class DocumentService:
         if biometric_score is not None:
             print("biometric score: "+ str(biometric_score))
 
+            weights = self.SCORE_WEIGHTS
             final_score = (
-                0.5 * structural_score +
-                0.3 * logic_score +
-                0.2 * biometric_score
+                weights["structural"] * structural_score +
+                weights["logic"] * logic_score +
+                weights["biometric"] * biometric_score
             )
         else:
             # redistribute weights if there is not biometric score
+            weights = self.SCORE_WEIGHTS_NO_BIOMETRIC
             final_score = (
-                0.65 * structural_score +
-                0.35 * logic_score
+                weights["structural"] * structural_score +
+                weights["logic"] * logic_score
             )
 
         return float(np.clip(final_score, 0.0, 1.0))
 
     def hash_files(self, files_bytes: list[bytes]) -> str:
-        hasher = hashlib.sha256()
-
-        for file in files_bytes:
-            hasher.update(file)
-
-        return hasher.hexdigest()
+        return hash_files(files_bytes)
@@ -1,19 +1,330 @@
+import os
+from typing import AsyncIterator, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from .document_write_buffer import WriteBehindBuffer
 from .models.document import Document
-from .mongo_client import db
-from datetime import datetime
+from .mongo_client import mongo
+from datetime import datetime, timezone
+from pymongo import DESCENDING, IndexModel
+
+
+# direct: one insert_one per document
+# ack: buffered bulk insert, create returns once the batch is written
+# async: buffered bulk insert, create returns right away (write errors are only logged)
+DOCUMENT_WRITE_MODE = os.getenv("DOCUMENT_WRITE_MODE", "direct")
+WRITE_BUFFER_MAX_BATCH = int(os.getenv("WRITE_BUFFER_MAX_BATCH", "100"))
+WRITE_BUFFER_FLUSH_MS = float(os.getenv("WRITE_BUFFER_FLUSH_MS", "50"))
+WRITE_BUFFER_MAX_PENDING = int(os.getenv("WRITE_BUFFER_MAX_PENDING", "1000"))
+
+_write_buffer: Optional[WriteBehindBuffer] = None
+
+
+def get_write_buffer(collection) -> WriteBehindBuffer:
+    """
+    One buffer per process, shared by the per-request repositories
+    """
+    global _write_buffer
+
+    if _write_buffer is None:
+        _write_buffer = WriteBehindBuffer(
+            collection,
+            max_batch=WRITE_BUFFER_MAX_BATCH,
+            flush_interval=WRITE_BUFFER_FLUSH_MS / 1000,
+            max_pending=WRITE_BUFFER_MAX_PENDING
+        )
+    return _write_buffer
+
+
+async def close_write_buffer():
+    """
+    Flush pending documents, called on shutdown
+    """
+    global _write_buffer
+
+    if _write_buffer is not None:
+        await _write_buffer.close()
+        _write_buffer = None
+
+
+class InvalidPageTokenError(Exception):
+    pass
+
+
+def page_token(doc: dict) -> str:
+    """
+    Resume point after doc in a newest-first listing
+    """
+    return f"{doc['validated_at'].isoformat()}|{doc['_id']}"
+
+
+def parse_page_token(token: str) -> Tuple[datetime, ObjectId]:
+    try:
+        validated_at, doc_id = token.split("|")
+        return datetime.fromisoformat(validated_at), ObjectId(doc_id)
+    except (ValueError, InvalidId):
+        raise InvalidPageTokenError(f"Invalid page token: {token}")
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    ISO 8601 timestamp of a request as an aware UTC datetime. The Z suffix
+    is accepted (fromisoformat only reads it from Python 3.11) and a
+    timestamp without offset is taken as UTC
+    """
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"
+
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def stored_utc(value: datetime) -> datetime:
+    """
+    validated_at is stored as naive UTC, aware bounds are compared in that form
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class DocumentsRepository:
+    """
+    Documents collection through the pooled async driver, no call blocks
+    the event loop. A collection can be injected (tests use an in-memory one).
+    """
 
-    def __init__(self):
-        self.collection = db["documents"]
+    INDEXES = [
+        # dedup lookup, its file_hash prefix also serves plain file_hash queries
+        IndexModel(
+            [("file_hash", 1), ("doc_type_id", 1), ("selfie_hash", 1), ("validated_at", DESCENDING)],
+            name="dedup_lookup"
+        ),
+        IndexModel([("user_id", 1), ("validated_at", DESCENDING), ("_id", DESCENDING)], name="user_validated_at"),
+        IndexModel(
+            [("doc_type_id", 1), ("is_valid", 1), ("validated_at", DESCENDING), ("_id", DESCENDING)],
+            name="type_validity_validated_at"
+        ),
+        # near duplicate index loads, only documents with page hashes
+        IndexModel(
+            [("validated_at", DESCENDING)],
+            name="phash_validated_at",
+            partialFilterExpression={"phash": {"$type": "array"}}
+        ),
+    ]
+
+    # listings never carry the OCR metadata nor the face template
+    SUMMARY_PROJECTION = {
+        "user_id": 1,
+        "doc_type_id": 1,
+        "is_valid": 1,
+        "validated_at": 1,
+        "file_hash": 1,
+    }
+
+    # what the near duplicate index keeps of a document
+    PHASH_PROJECTION = {
+        "user_id": 1,
+        "doc_type_id": 1,
+        "is_valid": 1,
+        "selfie_hash": 1,
+        "validated_at": 1,
+        "phash": 1,
+        "photo_phash": 1,
+    }
+
+    BATCH_SIZE = 100
+
+    WRITE_MODES = ("direct", "ack", "async")
+
+    def __init__(self, collection=None, write_mode: str = DOCUMENT_WRITE_MODE,
+                 write_buffer: Optional[WriteBehindBuffer] = None):
+        if write_mode not in self.WRITE_MODES:
+            raise ValueError(f"Unknown document write mode: {write_mode}")
+
+        self.collection = collection if collection is not None else mongo.db["documents"]
+        self.write_mode = write_mode
+        self.write_buffer = write_buffer
 
     async def create(self, document: Document) -> str:
-        result = self.collection.insert_one(document.to_mongo())
-        return str(result.inserted_id)
-    
-    def get_by_id(self, doc_id):
-        from bson import ObjectId
-        return self.collection.find_one({"_id": ObjectId(doc_id)})
-
-    def list(self):
-        return list(self.collection.find({}))
\ No newline at end of file
+        if self.write_mode == "direct":
+            result = await self.collection.insert_one(document.to_mongo())
+            return str(result.inserted_id)
+
+        # id assigned here so it is known before the batch is written
+        doc = document.to_mongo()
+        doc["_id"] = ObjectId()
+
+        buffer = self.write_buffer or get_write_buffer(self.collection)
+        written = await buffer.submit(doc)
+
+        if self.write_mode == "ack":
+            await written
+        else:
+            # failures are logged by the buffer, mark them retrieved
+            written.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        return str(doc["_id"])
+
+    async def get_by_id(self, doc_id, projection: Optional[dict] = None) -> Optional[dict]:
+        try:
+            object_id = ObjectId(doc_id)
+        except InvalidId:
+            return None
+
+        return await self.collection.find_one({"_id": object_id}, projection)
+
+    async def ensure_indexes(self):
+        """
+        Create the declared indexes, a no-op when they already exist
+        """
+        names = await self.collection.create_indexes(self.INDEXES)
+        print(f"Documents indexes ready: {', '.join(names)}")
+
+    async def find_recent_verdict(self, file_hash: str, doc_type_id, selfie_hash: Optional[str],
+                                  since: datetime, user_id=None) -> Optional[dict]:
+        """
+        Latest document with the same files, type and selfie validated after since
+        """
+        query = {
+            "file_hash": file_hash,
+            "doc_type_id": doc_type_id,
+            "selfie_hash": selfie_hash,
+            "validated_at": {"$gte": since},
+        }
+        if user_id is not None:
+            query["user_id"] = user_id
+
+        return await self.collection.find_one(
+            query,
+            {"is_valid": 1, "validated_at": 1},
+            sort=[("validated_at", DESCENDING)]
+        )
+
+    async def latest_valid_for_user(self, user_id, doc_type_id=None,
+                                    projection: Optional[dict] = SUMMARY_PROJECTION) -> Optional[dict]:
+        query = {"user_id": user_id, "is_valid": True}
+        if doc_type_id is not None:
+            query["doc_type_id"] = doc_type_id
+
+        return await self.collection.find_one(
+            query,
+            projection,
+            sort=[("validated_at", DESCENDING), ("_id", DESCENDING)]
+        )
+
+    def find_by_type(self, doc_type_id, validated_from: Optional[datetime] = None,
+                     validated_to: Optional[datetime] = None, **kwargs) -> AsyncIterator[dict]:
+        """
+        Documents of a type validated in [validated_from, validated_to)
+        """
+        return self.find_documents(
+            doc_type_id=doc_type_id,
+            validated_from=validated_from,
+            validated_to=validated_to,
+            **kwargs
+        )
+
+    async def find_documents(self, user_id=None, doc_type_id=None, is_valid: Optional[bool] = None,
+                             validated_from: Optional[datetime] = None,
+                             validated_to: Optional[datetime] = None,
+                             after: Optional[str] = None, limit: int = 0,
+                             projection: Optional[dict] = SUMMARY_PROJECTION) -> AsyncIterator[dict]:
+        """
+        Stream documents newest first, BATCH_SIZE per round trip.
+
+        Pagination is keyset based: pass the page_token of the last document
+        received as after, so deep pages cost the same as the first one.
+        """
+        query = {}
+        if user_id is not None:
+            query["user_id"] = user_id
+
+        if doc_type_id is not None:
+            query["doc_type_id"] = doc_type_id
+            # both values of the index middle key keep validated_at as an index bound
+            query["is_valid"] = {"$in": [False, True]} if is_valid is None else is_valid
+        elif is_valid is not None:
+            query["is_valid"] = is_valid
+
+        validated_at = {}
+        if validated_from is not None:
+            validated_at["$gte"] = stored_utc(validated_from)
+        if validated_to is not None:
+            validated_at["$lt"] = stored_utc(validated_to)
+        if validated_at:
+            query["validated_at"] = validated_at
+
+        if after:
+            after_at, after_id = parse_page_token(after)
+            query["$or"] = [
+                {"validated_at": {"$lt": after_at}},
+                {"validated_at": after_at, "_id": {"$lt": after_id}},
+            ]
+
+        cursor = self.collection.find(query, projection).sort(
+            [("validated_at", DESCENDING), ("_id", DESCENDING)]
+        ).batch_size(self.BATCH_SIZE)
+
+        if limit:
+            cursor = cursor.limit(limit)
+
+        async for doc in cursor:
+            yield doc
+
+    async def find_phashes(self, since: Optional[datetime] = None, limit: int = 0) -> AsyncIterator[dict]:
+        """
+        Hashed documents validated from since, newest first and at most
+        limit of them, with only the fields the near duplicate index keeps
+        """
+        # same filter as the partial phash_validated_at index
+        query = {"phash": {"$type": "array"}}
+        if since is not None:
+            query["validated_at"] = {"$gte": since}
+
+        cursor = self.collection.find(query, self.PHASH_PROJECTION).sort(
+            [("validated_at", DESCENDING)]
+        ).batch_size(self.BATCH_SIZE)
+
+        if limit:
+            cursor = cursor.limit(limit)
+
+        async for doc in cursor:
+            yield doc
+
+    def list(self, projection: Optional[dict] = SUMMARY_PROJECTION) -> AsyncIterator[dict]:
+        """
+        Whole collection as a stream, never materialized in memory
+        """
+        return self.find_documents(projection=projection)
+
+
+class DocumentTracesRepository:
+    """
+    Compressed full pipeline results kept for debugging, one per sampled
+    document and keyed by its id, outside the documents collection
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection if collection is not None else mongo.db["document_traces"]
+
+    async def save(self, document_id: str, trace: bytes):
+        await self.collection.insert_one({
+            "_id": ObjectId(document_id),
+            "codec": "zlib+json",
+            "trace": trace,
+            "created_at": datetime.utcnow(),
+        })
+
+    async def get(self, document_id: str) -> Optional[bytes]:
+        try:
+            object_id = ObjectId(document_id)
+        except InvalidId:
+            return None
+
+        stored = await self.collection.find_one({"_id": object_id})
+        return stored["trace"] if stored else None
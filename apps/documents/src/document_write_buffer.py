@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from .services.metrics import metrics
+
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """
+    Groups inserts of concurrent requests into unordered insert_many calls,
+    flushed when max_batch documents are queued or flush_interval seconds
+    after the first one.
+
+    The queue is bounded: when max_pending documents are waiting, submit
+    blocks the caller (back-pressure) instead of growing without limit.
+    """
+
+    def __init__(self, collection, max_batch: int = 100, flush_interval: float = 0.05,
+                 max_pending: int = 1000):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, doc: dict) -> asyncio.Future:
+        """
+        Queue a document (with its _id already set). The future resolves
+        once its batch is written, or holds the write error
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+
+        if self._queue.full():
+            metrics.incr("write_buffer_backpressure_waits")
+        await self._queue.put((doc, future))
+
+        return future
+
+    async def close(self):
+        """
+        Flush everything queued and stop the writer, called on shutdown
+        """
+        if self._task is None:
+            return
+
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _collect(self) -> Tuple[List[tuple], bool]:
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+            if item is _STOP:
+                return batch, True
+
+            batch.append(item)
+
+        return batch, False
+
+    async def _run(self):
+        stop = False
+
+        while not stop:
+            batch, stop = await self._collect()
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: List[tuple]):
+        docs = [doc for doc, _ in batch]
+        futures = [future for _, future in batch]
+        failed = {}
+
+        start = time.perf_counter()
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+
+        except BulkWriteError as e:
+            # unordered: every document without a write error was inserted
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = BulkWriteError({"writeErrors": [error]})
+
+        except Exception as e:
+            failed = {i: e for i in range(len(batch))}
+
+        metrics.observe("write_buffer_flush_seconds", time.perf_counter() - start)
+        metrics.incr("write_buffer_flushes")
+        metrics.incr("write_buffer_documents", len(batch) - len(failed))
+
+        if failed:
+            metrics.incr("write_buffer_failed_documents", len(failed))
+            print(f"Buffered insert failed for {len(failed)}/{len(batch)} documents: "
+                  f"{next(iter(failed.values()))}")
+
+        for i, future in enumerate(futures):
+            if future.done():
+                continue
+            if i in failed:
+                future.set_exception(failed[i])
+            else:
+                future.set_result(docs[i]["_id"])
@@ -0,0 +1,22 @@
+from typing import Any
+
+import numpy as np
+from bson.codec_options import TypeRegistry
+
+
+def encode_numpy(value: Any) -> Any:
+    """
+    BSON fallback encoder, only called for values the C encoder rejects.
+    np.float64 subclasses float and never gets here; np.int64, np.float32,
+    np.bool_ and arrays do. Tuples are encoded natively as arrays.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    return value
+
+
+TYPE_REGISTRY = TypeRegistry(fallback_encoder=encode_numpy)
@@ -1,7 +1,6 @@
-from dataclasses import asdict, dataclass
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, fields
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-import numpy as np
 
 
 @dataclass
@@ -13,21 +12,21 @@ class Document:
     file_hash: str
     is_valid: bool
     validated_at: Optional[datetime]
+    face_template: Optional[Dict[str, Any]] = None  # see services/face_template.py
+    selfie_hash: Optional[str] = None
+    phash: Optional[List[str]] = None  # card hash of every normalized page (perceptual_hash.card_phash)
+    photo_phash: Optional[str] = None  # perceptual hash of the holder photo field
+    # documents of other users with the same card (near duplicate phash)
+    cross_user_duplicates: Optional[List[str]] = None
 
     def to_mongo(self) -> dict:
-        def normalize(value):
-            if isinstance(value, np.generic):
-                return value.item()
-
-            if isinstance(value, dict):
-                return {k: normalize(v) for k, v in value.items()}
-
-            if isinstance(value, (list, tuple)):
-                return [normalize(v) for v in value]
-
-            return value
-
-        data = asdict(self)
-        data.pop("id", None)
-
-        return normalize(data)
+        """
+        Shallow field mapping, no deep copy nor recursive walk: NumPy values
+        in the metadata are converted while encoding by the client type
+        registry (models/bson_codecs.py)
+        """
+        return {
+            field.name: getattr(self, field.name)
+            for field in fields(self)
+            if field.name != "id"
+        }
@@ -1,3 +1,5 @@
+import hashlib
+import os
 from pathlib import Path
 import numpy as np
 import cv2
@@ -6,6 +8,22 @@ import asyncio
 from dataclasses import dataclass
 from enum import Enum
 
+from .cache import LRUCache, TieredCache
+from .face_engine import FaceEngine, FaceEngineConfig, get_face_engine
+from .metrics import metrics
+from .quality_validation import SelfieQualityError, ValidationService
+
+
+FACE_CACHE_SIZE = int(os.getenv("FACE_CACHE_SIZE", "512"))
+FACE_CACHE_TTL = int(os.getenv("FACE_CACHE_TTL", "3600"))
+
+# faces by image hash: a re-uploaded selfie or document skips detection and
+# embedding. Kept in process memory only, embeddings are biometric data.
+face_cache = TieredCache(
+    "face",
+    LRUCache(maxsize=FACE_CACHE_SIZE, ttl=FACE_CACHE_TTL)
+)
+
 class BiometricError(Exception):
     pass
 
@@ -15,54 +33,156 @@ class FaceDetection:
     bbox: Tuple[int, int, int, int]  # x1, y1, x2, y2
     confidence: float
     embedding: np.ndarray
+    image: Optional[np.ndarray] = None  # face crop with margin, used to re-detect
 
 
 class BiometricProcessor:
     """
     Biometric processor for faces comparison
     """
+
+    # below this detector score the document face is detected again on its padded crop
+    MIN_DOC_FACE_CONFIDENCE = 0.6
+    # margin around a layout photo field, as a fraction of the field size
+    PHOTO_FIELD_MARGIN = 0.25
+    # smallest detector input used for photo field windows
+    MIN_DETECTOR_SIZE = 128
     
-    def __init__(self):
+    def __init__(self, engine_config: Optional[FaceEngineConfig] = None):
         
-        self.face_model = self._load_face_model()
+        self.face_model = self._load_face_model(engine_config)
+        self.validator = ValidationService()
+    
+    def _load_face_model(self, engine_config: Optional[FaceEngineConfig] = None) -> FaceEngine:
+        """Load the face detection and embedding models (RetinaFace + ArcFace from buffalo_l)"""
+        return get_face_engine(engine_config)
     
-    def _load_face_model(self):
-        """Load the complete facial analysis model (detection, alignment, and embedding)"""
-        import insightface
+    async def get_face_from_full_image(self, original_images: List[np.ndarray],
+                                       photo_regions: Optional[List[Tuple[int, Tuple]]] = None) -> Optional[FaceDetection]:
+        return self.find_document_face(original_images, photo_regions)
 
-        model = insightface.app.FaceAnalysis(
-            name="buffalo_l"  # RetinaFace + ArcFace
-        )
-        model.prepare(ctx_id=0)  # use gpu if available, if not cpu
+    def _cache_key(self, source: str, content_hash: str) -> str:
+        return f"{self.face_model.config.recognition_model}:{source}:{content_hash}"
 
-        return model
-    
-    async def get_face_from_full_image(self, original_images: List[np.ndarray]) -> Optional[np.ndarray]:
+    def find_document_face(self, original_images: List[np.ndarray],
+                           photo_regions: Optional[List[Tuple[int, Tuple]]] = None,
+                           cache_key: Optional[str] = None) -> Optional[FaceDetection]:
         """
-        Try to detect face directly from full document image (fallback).
-        """        
+        Document face, cached by cache_key (files hash and document type)
+        when given
+        """
+        if cache_key is None:
+            return self._search_document_face(original_images, photo_regions)
+
+        key = self._cache_key("document", cache_key)
+        doc_face = face_cache.get(key)
+        if doc_face is None:
+            doc_face = self._search_document_face(original_images, photo_regions)
+            if doc_face is not None:
+                face_cache.set(key, doc_face)
+
+        return doc_face
+
+    def _search_document_face(self, original_images: List[np.ndarray],
+                              photo_regions: Optional[List[Tuple[int, Tuple]]] = None) -> Optional[FaceDetection]:
+        """
+        Detect the document face.
+
+        When the layout marks photo fields, only those windows (plus a margin)
+        are searched, with a detector input sized to the window. Full pages are
+        scanned only if nothing is found there.
+        Only the main face is embedded, and that embedding is reused for the
+        comparison, so the document side costs a single inference.
+
+        Args:
+            original_images: Normalized pages
+            photo_regions: (page_idx, normalized bbox) of the layout photo fields
+        """
+        for page_idx, norm_bbox in photo_regions or []:
+            if page_idx >= len(original_images):
+                continue
+
+            img = original_images[page_idx]
+            x1, y1, x2, y2 = self._photo_search_window(norm_bbox, img.shape)
+            window = img[y1:y2, x1:x2]
+            if window.size == 0:
+                continue
+
+            face = self._detect_main_face(window, self._detector_size(window.shape))
+            if face:
+                metrics.incr("biometric_face_search", scope="photo_field")
+                fx1, fy1, fx2, fy2 = face.bbox
+                face.bbox = (fx1 + x1, fy1 + y1, fx2 + x1, fy2 + y1)
+                return face
+
+        metrics.incr("biometric_face_search", scope="full_page")
+
         for page_idx, img in enumerate(original_images):
-            
-            faces = self.face_model.get(img)
-            
-            if faces:
-                # select main face
-                main_face = self._select_main_face(faces, img.shape)
-                if main_face:
-                    x1, y1, x2, y2 = map(int, main_face.bbox)
-                    
-                    # add margin
-                    margin_x = int((x2 - x1) * 0.2)
-                    margin_y = int((y2 - y1) * 0.2)
-                    
-                    x1 = max(0, x1 - margin_x)
-                    y1 = max(0, y1 - margin_y)
-                    x2 = min(img.shape[1], x2 + margin_x)
-                    y2 = min(img.shape[0], y2 + margin_y)
-                    
-                    face_region = img[y1:y2, x1:x2]
-                                        
-                    return face_region
+            face = self._detect_main_face(img)
+            if face:
+                return face
+
+        return None
+
+    def _photo_search_window(self, norm_bbox: Tuple, img_shape: tuple) -> Tuple[int, int, int, int]:
+        """
+        Pixel window of a photo field with PHOTO_FIELD_MARGIN around it
+        """
+        h, w = img_shape[:2]
+        nx1, ny1, nx2, ny2 = norm_bbox
+        margin_x = (nx2 - nx1) * self.PHOTO_FIELD_MARGIN
+        margin_y = (ny2 - ny1) * self.PHOTO_FIELD_MARGIN
+
+        return (
+            max(0, int((nx1 - margin_x) * w)),
+            max(0, int((ny1 - margin_y) * h)),
+            min(w, int((nx2 + margin_x) * w)),
+            min(h, int((ny2 + margin_y) * h))
+        )
+
+    def _detector_size(self, shape: tuple) -> int:
+        """
+        Detector input for a window: its size rounded up to the 32px stride,
+        never above the configured detector size
+        """
+        side = max(shape[:2])
+        size = max(self.MIN_DETECTOR_SIZE, 32 * int(np.ceil(side / 32)))
+        return min(size, self.face_model.config.det_size)
+
+    def _detect_main_face(self, img: np.ndarray, input_size: Optional[int] = None) -> Optional[FaceDetection]:
+        """
+        Detect faces, keep the main one and embed only that one
+        """
+        faces = self.face_model.detect(img, input_size=input_size)
+
+        if faces:
+            # select main face
+            main_face = self._select_main_face(faces, img.shape)
+            if main_face:
+                self.face_model.embed(img, main_face)
+
+                x1, y1, x2, y2 = map(int, main_face.bbox)
+                bbox = (x1, y1, x2, y2)
+                
+                # add margin
+                margin_x = int((x2 - x1) * 0.2)
+                margin_y = int((y2 - y1) * 0.2)
+                
+                x1 = max(0, x1 - margin_x)
+                y1 = max(0, y1 - margin_y)
+                x2 = min(img.shape[1], x2 + margin_x)
+                y2 = min(img.shape[0], y2 + margin_y)
+                
+                face_region = img[y1:y2, x1:x2]
+                                    
+                return FaceDetection(
+                    bbox=bbox,
+                    confidence=float(main_face.det_score),
+                    embedding=main_face.normed_embedding,
+                    image=face_region
+                )
+
+        return None
     
     def _extract_bbox(self, data: Any) -> Optional[Tuple]:
         """
@@ -79,32 +199,64 @@ class BiometricProcessor:
         
         return None
     
-    async def verify_biometric(self, doc_face_img: np.ndarray, selfie_bytes: bytes) -> float:
+    async def verify_biometric(self, doc_face: Optional[FaceDetection], selfie_bytes: bytes) -> float:
         """
         Main function for biometric verification
+
+        Args:
+            doc_face: Face found by get_face_from_full_image
+            selfie_bytes: Raw selfie upload
         """
-        try:
-            # Decode selfie
-            selfie_img = await self._bytes_to_image_async(selfie_bytes)
-            if selfie_img is None:
-                raise BiometricError("Selfie cannot be decoded")
+        selfie_task = self.start_selfie_processing(selfie_bytes)
+        return await self.score_faces(doc_face, selfie_task)
 
-            if doc_face_img is None:
-                raise BiometricError("Document face was not found")
+    def start_selfie_processing(self, selfie_bytes: bytes) -> asyncio.Future:
+        """
+        Decode, downscale, detect and embed the selfie on a worker thread.
+        It does not depend on the document, so it can start with the request
+        and run while the document pipeline is busy.
+        """
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(None, self._process_selfie_sync, selfie_bytes)
+
+    def discard_selfie_task(self, selfie_task: asyncio.Future):
+        """
+        Drop a selfie task whose result is not needed anymore (request failed)
+        """
+        if not selfie_task.done():
+            selfie_task.cancel()
+        elif not selfie_task.cancelled():
+            # mark the error as retrieved so asyncio does not log it
+            selfie_task.exception()
 
-            # Process selfie
-            selfie_result = await self._process_face(selfie_img, "selfie")
-            if not selfie_result:
-                raise BiometricError("Selfie face was not detected")
+    def selfie_failure(self, selfie_task: asyncio.Future) -> Optional[Exception]:
+        """
+        Error of a finished selfie task, as score_faces would raise it,
+        None while it runs or when it succeeded
+        """
+        if not selfie_task.done() or selfie_task.cancelled():
+            return None
 
-            # Process document face
-            doc_face_img = self.pad_face_image(doc_face_img)
+        error = selfie_task.exception()
+        if error is None or isinstance(error, (BiometricError, SelfieQualityError)):
+            return error
+        return BiometricError("Face processing failed")
 
-            doc_face_result = await self._process_face(
-                doc_face_img, "document"
+    async def score_faces(self, doc_face: Optional[FaceDetection], selfie_task: asyncio.Future) -> float:
+        """
+        Join the selfie branch and compare it with the document face
+        """
+        try:
+            selfie_result = await selfie_task
+
+            if doc_face is None:
+                raise BiometricError("Document face was not found")
+
+            # Document face comes embedded from the full page pass
+            loop = asyncio.get_running_loop()
+            doc_face_result = await loop.run_in_executor(
+                None, self._redetect_low_confidence, doc_face
             )
-            if not doc_face_result:
-                raise BiometricError("Document face was not detected")
 
             # Compare faces
             similarity_score = self._compare_faces_adjusted_for_documents(
@@ -114,14 +266,64 @@ class BiometricProcessor:
 
             return similarity_score
 
-        except BiometricError:
+        except (BiometricError, SelfieQualityError):
             raise
 
         except Exception as e:
             raise BiometricError("Face processing failed") 
 
+    def _process_selfie_sync(self, selfie_bytes: bytes) -> FaceDetection:
+        """
+        Selfie branch: decode and process the selfie face,
+        a selfie already seen is served from the face cache
+        """
+        key = self._cache_key("selfie", hashlib.sha256(selfie_bytes).hexdigest())
+        cached = face_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Decode selfie
+        try:
+            selfie_img = self._bytes_to_image_sync(selfie_bytes)
+        except Exception as e:
+            raise BiometricError(
+                f"Error converting bytes to image: '{e}'"
+            )
+
+        if selfie_img is None:
+            raise BiometricError("Selfie cannot be decoded")
+
+        # fast quality gate, bad selfies never reach the face model
+        self.validator.selfie_validation(selfie_img)
+
+        # Process selfie
+        selfie_result = self._process_face_sync(selfie_img, "selfie")
+        if not selfie_result:
+            raise BiometricError("Selfie face was not detected")
+
+        face_cache.set(key, selfie_result)
+        return selfie_result
+
     
-    async def _process_face(self, image: np.ndarray, source: str) -> Optional[FaceDetection]:
+    def _redetect_low_confidence(self, doc_face: FaceDetection) -> FaceDetection:
+        """
+        Detect the document face again on its padded crop when the full
+        page detection was not confident, keeping the best of both
+        """
+        if doc_face.confidence >= self.MIN_DOC_FACE_CONFIDENCE or doc_face.image is None:
+            return doc_face
+
+        metrics.incr("biometric_document_redetections")
+
+        redetected = self._process_face_sync(
+            self.pad_face_image(doc_face.image), "document"
+        )
+        if redetected and redetected.confidence > doc_face.confidence:
+            return redetected
+
+        return doc_face
+
+    def _process_face_sync(self, image: np.ndarray, source: str) -> Optional[FaceDetection]:
         """
         Process a face using insight face (with detection, alineation and embedding)
 
@@ -138,11 +340,7 @@ class BiometricProcessor:
             
             if not faces:
                 return None
-                        
-            for i, face in enumerate(faces):                
-                if hasattr(face, 'normed_embedding'):
-                    emb = face.normed_embedding
-            
+
             face = self._select_main_face(faces, image.shape)
             if face is None:
                 return None
@@ -242,22 +440,6 @@ class BiometricProcessor:
                 
         return final_score
     
-    async def _bytes_to_image_async(self, image_bytes: bytes) -> Optional[np.ndarray]:
-        """Converts bytes to images asynchronously"""
-        try:
-            loop = asyncio.get_event_loop()
-            image = await loop.run_in_executor(
-                None,
-                self._bytes_to_image_sync,
-                image_bytes
-            )
-            return image
-        
-        except Exception as e:
-            raise BiometricError(
-                f"Error converting bytes to image: '{e}'"
-            )
-    
     def _bytes_to_image_sync(self, image_bytes: bytes) -> Optional[np.ndarray]:
         """Synchronous version of bytes-to-image conversion"""
         nparr = np.frombuffer(image_bytes, np.uint8)
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import metrics
+
+
+class LRUCache:
+    """
+    Thread safe in-memory LRU with an optional TTL (seconds)
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Shared cache tier stored in Redis with a TTL.
+    Redis errors are logged and treated as misses, the cache never fails a request.
+    """
+
+    def __init__(self, url: str, prefix: str, ttl: Optional[int] = None,
+                 dumps: Callable[[Any], bytes] = lambda v: json.dumps(v).encode(),
+                 loads: Callable[[bytes], Any] = json.loads):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+
+    @classmethod
+    def from_env(cls, env_var: str, prefix: str, ttl: Optional[int] = None, **kwargs) -> Optional["RedisCache"]:
+        """
+        Build the tier only when the env var holds a Redis url
+        """
+        url = os.getenv(env_var)
+        if not url:
+            return None
+
+        try:
+            return cls(url, prefix, ttl, **kwargs)
+        except Exception as e:
+            print(f"Redis cache '{prefix}' disabled: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache '{self.prefix}' get failed: {e}")
+            return None
+
+        return None if raw is None else self.loads(raw)
+
+    def set(self, key: str, value: Any):
+        try:
+            self.client.set(self.prefix + key, self.dumps(value), ex=self.ttl)
+        except Exception as e:
+            print(f"Redis cache '{self.prefix}' set failed: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache '{self.prefix}' delete failed: {e}")
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional shared tier.
+    Hits and misses are recorded in the metrics registry under the cache name.
+    """
+
+    def __init__(self, name: str, memory: LRUCache, remote: Optional[Any] = None):
+        self.name = name
+        self.memory = memory
+        self.remote = remote
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            metrics.incr("cache_hits", cache=self.name, tier="memory")
+            return value
+
+        if self.remote is not None:
+            value = self.remote.get(key)
+            if value is not None:
+                metrics.incr("cache_hits", cache=self.name, tier="remote")
+                self.memory.set(key, value)
+                return value
+
+        metrics.incr("cache_misses", cache=self.name)
+        return None
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.remote is not None:
+            self.remote.set(key, value)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.remote is not None:
+            self.remote.delete(key)
+
+    def stats(self) -> Dict[str, float]:
+        memory_hits = metrics.counter("cache_hits", cache=self.name, tier="memory")
+        remote_hits = metrics.counter("cache_hits", cache=self.name, tier="remote")
+        misses = metrics.counter("cache_misses", cache=self.name)
+        lookups = memory_hits + remote_hits + misses
+
+        return {
+            "memory_hits": memory_hits,
+            "remote_hits": remote_hits,
+            "misses": misses,
+            "hit_rate": (memory_hits + remote_hits) / lookups if lookups else 0.0,
+        }
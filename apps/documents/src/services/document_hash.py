@@ -0,0 +1,86 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import metrics
+
+
+# how long a verdict can be reused, 0 disables deduplication
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", "86400"))
+# "user": only the same user's submissions are reused, "global": any user's
+DEDUP_SCOPE = os.getenv("DEDUP_SCOPE", "user")
+
+
+def hash_files(files_bytes: List[bytes]) -> str:
+    hasher = hashlib.sha256()
+
+    for file in files_bytes:
+        hasher.update(file)
+
+    return hasher.hexdigest()
+
+
+def hash_selfie(selfie_bytes: Optional[bytes]) -> Optional[str]:
+    if selfie_bytes is None:
+        return None
+    return hashlib.sha256(selfie_bytes).hexdigest()
+
+
+class DocumentDeduplicator:
+    """
+    Reuses the verdict of an identical recent submission (same files,
+    document type and selfie) so a resubmission costs one indexed lookup
+    instead of the whole pipeline
+    """
+
+    SCOPES = ("user", "global")
+
+    def __init__(self, repo, ttl_seconds: int = DEDUP_TTL_SECONDS, scope: str = DEDUP_SCOPE,
+                 available: Callable[[], bool] = lambda: True):
+        if scope not in self.SCOPES:
+            raise ValueError(f"Unknown dedup scope: {scope}")
+
+        self.repo = repo
+        self.ttl_seconds = ttl_seconds
+        self.scope = scope
+        # while the store is unreachable the lookup is skipped, not waited for
+        self.available = available
+
+    async def find_verdict(self, user_id, doc_type_id, file_hash: str,
+                           selfie_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Result of the latest matching document validated within the TTL, or None
+        """
+        if self.ttl_seconds <= 0:
+            return None
+
+        if not self.available():
+            metrics.incr("dedup_lookups", result="skipped")
+            return None
+
+        try:
+            previous = await self.repo.find_recent_verdict(
+                file_hash=file_hash,
+                doc_type_id=doc_type_id,
+                selfie_hash=selfie_hash,
+                since=datetime.utcnow() - timedelta(seconds=self.ttl_seconds),
+                user_id=user_id if self.scope == "user" else None
+            )
+        except Exception as e:
+            # a failed lookup only costs the full pipeline
+            print(f"Dedup lookup failed: {e}")
+            metrics.incr("dedup_lookups", result="error")
+            return None
+
+        if previous is None:
+            metrics.incr("dedup_lookups", result="miss")
+            return None
+
+        metrics.incr("dedup_lookups", result="hit")
+        return {
+            "success": True,
+            "is_valid": previous["is_valid"],
+            "document_id": str(previous["_id"]),
+            "duplicate": True,
+        }
@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import zlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+METADATA_SCHEMA_VERSION = 2
+
+# share of documents whose full pipeline trace is kept, 0 disables traces
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_COMPRESSION_LEVEL = 6
+
+FLOAT_DIGITS = 4
+
+
+def _number(value) -> Any:
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return round(float(value), FLOAT_DIGITS)
+
+
+def _bbox(data) -> Optional[list]:
+    if isinstance(data, dict):
+        data = data.get("bbox")
+    if isinstance(data, (tuple, list)) and len(data) == 4:
+        return [_number(v) for v in data]
+    return None
+
+
+def compact_metadata(enriched_results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What is persisted of a pipeline result: per field the OCR text,
+    merged bbox and layout scores, per page and document the scores.
+    Assigned groups, their regions and image shapes stay in the trace.
+    """
+    combined = enriched_results.get("combined_validation", {})
+    pages = []
+
+    for page_result in enriched_results.get("pages", []):
+        validation = page_result.get("validation", {})
+        field_details = validation.get("field_details", {})
+        fields = {}
+
+        for field_name, data in page_result.get("assignated_groups", {}).items():
+            scores = field_details.get(field_name, {})
+            field = {"bbox": _bbox(data)}
+
+            if isinstance(data, dict) and "text" in data:
+                field["text"] = data["text"]
+
+            for key, stored_key in (("iou", "iou"), ("coverage", "coverage"), ("spill_penalty", "spill")):
+                if key in scores:
+                    field[stored_key] = _number(scores[key])
+
+            fields[field_name] = field
+
+        pages.append({
+            "page": page_result.get("page"),
+            "side": page_result.get("side"),
+            "score": _number(validation.get("final_score", 0.0)),
+            "passes": bool(validation.get("passes", False)),
+            "fields": fields,
+        })
+
+    return {
+        "schema": METADATA_SCHEMA_VERSION,
+        "document_type_id": enriched_results.get("document_type_id"),
+        "final_score": _number(combined.get("final_score", 0.0)),
+        "pages": pages,
+    }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def compress_trace(enriched_results: Dict[str, Any]) -> bytes:
+    """
+    Full pipeline result as zlib compressed JSON, for debugging
+    """
+    raw = json.dumps(enriched_results, default=_json_default, separators=(",", ":"))
+    return zlib.compress(raw.encode(), TRACE_COMPRESSION_LEVEL)
+
+
+def decompress_trace(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data))
+
+
+def should_store_trace(sample_rate: float = TRACE_SAMPLE_RATE) -> bool:
+    return sample_rate > 0 and random.random() < sample_rate
@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+import numpy as np
+
+from .metrics import metrics
+
+
+_STOP = object()
+
+
+class FaceEmbeddingBatcher:
+    """
+    Shared embedding service for concurrent requests.
+
+    Aligned 112x112 face crops are queued by the request threads. A single
+    worker waits up to max_wait_ms after the first crop (or until max_batch
+    crops are queued), runs one batched recognition call and resolves the
+    future of every request.
+    """
+
+    def __init__(self, recognizer, max_batch: int = 16, max_wait_ms: float = 3.0):
+        self.recognizer = recognizer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="face-embedding-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, aligned_face: np.ndarray) -> Future:
+        """
+        Queue an aligned face crop, the future resolves to its embedding
+        """
+        future: Future = Future()
+        self._queue.put((aligned_face, future))
+        return future
+
+    def embed(self, aligned_face: np.ndarray) -> np.ndarray:
+        return self.submit(aligned_face).result()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self) -> Tuple[List[Tuple[np.ndarray, Future]], bool]:
+        """
+        Block for the first crop, then gather more until the batch
+        is full or the wait window closes
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if item is _STOP:
+                return batch, True
+
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self):
+        stop = False
+
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future]]):
+        faces = [face for face, _ in batch]
+        futures = [future for _, future in batch]
+
+        start = time.perf_counter()
+        try:
+            embeddings = self.recognizer.get_feat(faces)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        metrics.observe("face_embed_batch_seconds", time.perf_counter() - start)
+        metrics.incr("face_embed_batches")
+        metrics.incr("face_embed_batched_faces", len(batch))
+
+        for future, embedding in zip(futures, embeddings):
+            future.set_result(np.asarray(embedding).flatten())
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .face_batcher import FaceEmbeddingBatcher
+from .metrics import metrics
+
+
+def quantized_name(model_file: str) -> str:
+    """
+    det_10g.onnx -> det_10g.int8.onnx
+    """
+    path = Path(model_file)
+    return f"{path.stem}.int8{path.suffix}"
+
+
+@dataclass(frozen=True)
+class FaceEngineConfig:
+    """
+    Settings of the face models used by the biometric path
+    """
+    model_pack: str = "buffalo_l"
+    det_model: str = "det_10g.onnx"      # RetinaFace
+    rec_model: str = "w600k_r50.onnx"    # ArcFace
+    det_size: int = 640                  # detector input size (square)
+    det_thresh: float = 0.5
+    intra_op_threads: int = 0            # 0 lets onnxruntime decide
+    inter_op_threads: int = 0
+    graph_opt_level: str = "all"         # disable | basic | extended | all
+    ctx_id: int = 0                      # gpu id, negative forces cpu
+    quantized: bool = False              # load the int8 files made by tools.quantize_face_models
+    batch_max_size: int = 16             # recognition micro-batch, 1 disables batching
+    batch_max_wait_ms: float = 3.0       # how long the first crop waits for company
+
+    @property
+    def det_file(self) -> str:
+        return quantized_name(self.det_model) if self.quantized else self.det_model
+
+    @property
+    def rec_file(self) -> str:
+        return quantized_name(self.rec_model) if self.quantized else self.rec_model
+
+    @property
+    def recognition_model(self) -> str:
+        """
+        Identifies the embedding space, embeddings of different models are not comparable
+        """
+        return f"{self.model_pack}/{self.rec_file}"
+
+    @classmethod
+    def from_env(cls) -> "FaceEngineConfig":
+        return cls(
+            model_pack=os.getenv("FACE_MODEL_PACK", cls.model_pack),
+            det_model=os.getenv("FACE_DET_MODEL", cls.det_model),
+            rec_model=os.getenv("FACE_REC_MODEL", cls.rec_model),
+            det_size=int(os.getenv("FACE_DET_SIZE", cls.det_size)),
+            det_thresh=float(os.getenv("FACE_DET_THRESH", cls.det_thresh)),
+            intra_op_threads=int(os.getenv("FACE_ORT_INTRA_THREADS", cls.intra_op_threads)),
+            inter_op_threads=int(os.getenv("FACE_ORT_INTER_THREADS", cls.inter_op_threads)),
+            graph_opt_level=os.getenv("FACE_ORT_OPT_LEVEL", cls.graph_opt_level),
+            ctx_id=int(os.getenv("FACE_CTX_ID", cls.ctx_id)),
+            quantized=os.getenv("FACE_QUANTIZED", "0").lower() in ("1", "true", "yes"),
+            batch_max_size=int(os.getenv("FACE_BATCH_MAX_SIZE", cls.batch_max_size)),
+            batch_max_wait_ms=float(os.getenv("FACE_BATCH_MAX_WAIT_MS", cls.batch_max_wait_ms)),
+        )
+
+
+class FaceEngine:
+    """
+    Detection + recognition only.
+
+    insightface's FaceAnalysis loads every model of the pack (landmarks 2D/3D,
+    gender/age) although the pipeline only reads bbox, det_score and
+    normed_embedding. This engine builds the two ONNX sessions itself so the
+    thread counts and graph optimization level can be tuned per worker.
+
+    Embeddings of concurrent requests go through a shared micro-batcher
+    so recognition runs one batched ONNX call instead of one per face.
+    """
+
+    OPT_LEVELS = ("disable", "basic", "extended", "all")
+
+    def __init__(self, config: Optional[FaceEngineConfig] = None):
+        self.config = config or FaceEngineConfig.from_env()
+
+        start = time.perf_counter()
+        self.detector, self.recognizer = self._load_models()
+        self.load_seconds = time.perf_counter() - start
+
+        self.batcher = None
+        if self.config.batch_max_size > 1:
+            self.batcher = FaceEmbeddingBatcher(
+                self.recognizer,
+                max_batch=self.config.batch_max_size,
+                max_wait_ms=self.config.batch_max_wait_ms
+            )
+
+        metrics.observe("face_model_load_seconds", self.load_seconds)
+        print(f"Face models loaded in {self.load_seconds:.2f}s ({self.config})")
+
+    def _model_dir(self) -> Path:
+        from insightface.utils import ensure_available
+
+        return Path(ensure_available("models", self.config.model_pack, root="~/.insightface"))
+
+    def _providers(self) -> List[str]:
+        import onnxruntime
+
+        available = onnxruntime.get_available_providers()
+        if self.config.ctx_id >= 0 and "CUDAExecutionProvider" in available:
+            return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+        return ["CPUExecutionProvider"]
+
+    def _session(self, model_file: Path):
+        import onnxruntime
+
+        if self.config.graph_opt_level not in self.OPT_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {self.config.graph_opt_level}")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.config.intra_op_threads
+        options.inter_op_num_threads = self.config.inter_op_threads
+        options.graph_optimization_level = {
+            "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.config.graph_opt_level]
+
+        return onnxruntime.InferenceSession(
+            str(model_file),
+            sess_options=options,
+            providers=self._providers()
+        )
+
+    def _load_models(self):
+        from insightface.model_zoo import ArcFaceONNX, RetinaFace
+
+        model_dir = self._model_dir()
+        det_file = model_dir / self.config.det_file
+        rec_file = model_dir / self.config.rec_file
+
+        for model_file in (det_file, rec_file):
+            if not model_file.exists():
+                raise FileNotFoundError(
+                    f"Face model not found: {model_file}"
+                    + (" (run python -m tools.quantize_face_models)" if self.config.quantized else "")
+                )
+
+        detector = RetinaFace(model_file=str(det_file), session=self._session(det_file))
+        detector.prepare(
+            self.config.ctx_id,
+            input_size=(self.config.det_size, self.config.det_size),
+            det_thresh=self.config.det_thresh
+        )
+
+        recognizer = ArcFaceONNX(model_file=str(rec_file), session=self._session(rec_file))
+        recognizer.prepare(self.config.ctx_id)
+
+        return detector, recognizer
+
+    def detect(self, img: np.ndarray, input_size: Optional[int] = None) -> list:
+        """
+        Run the detector only. Faces carry bbox, kps and det_score
+
+        Args:
+            img: BGR image
+            input_size: Square detector input (multiple of 32), defaults to det_size
+        """
+        from insightface.app.common import Face
+
+        size = (input_size, input_size) if input_size else None
+
+        start = time.perf_counter()
+        bboxes, kpss = self.detector.detect(img, input_size=size, max_num=0, metric="default")
+        metrics.observe("face_detect_seconds", time.perf_counter() - start)
+
+        faces = []
+        for i in range(bboxes.shape[0]):
+            faces.append(Face(
+                bbox=bboxes[i, 0:4],
+                kps=kpss[i] if kpss is not None else None,
+                det_score=bboxes[i, 4]
+            ))
+
+        return faces
+
+    def embed(self, img: np.ndarray, face) -> np.ndarray:
+        """
+        Align the face with its keypoints and compute its embedding
+        """
+        start = time.perf_counter()
+
+        if self.batcher is None:
+            embedding = self.recognizer.get(img, face)
+        else:
+            face.embedding = self.batcher.embed(self.align(img, face))
+            embedding = face.embedding
+
+        metrics.observe("face_embed_seconds", time.perf_counter() - start)
+        return embedding
+
+    def align(self, img: np.ndarray, face) -> np.ndarray:
+        """
+        Recognizer input crop of a detected face (same warp as ArcFaceONNX.get)
+        """
+        from insightface.utils import face_align
+
+        return face_align.norm_crop(img, landmark=face.kps, image_size=self.recognizer.input_size[0])
+
+    def get(self, img: np.ndarray) -> list:
+        """
+        Same contract as FaceAnalysis.get: detected faces with their embedding
+        """
+        faces = self.detect(img)
+
+        for face in faces:
+            self.embed(img, face)
+
+        return faces
+
+
+_engines: Dict[FaceEngineConfig, FaceEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_face_engine(config: Optional[FaceEngineConfig] = None) -> FaceEngine:
+    """
+    One engine per config and process, models are loaded only once per worker
+    """
+    config = config or FaceEngineConfig.from_env()
+
+    with _engines_lock:
+        if config not in _engines:
+            _engines[config] = FaceEngine(config)
+        return _engines[config]
@@ -0,0 +1,64 @@
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .biometric_processor import BiometricError, FaceDetection
+
+
+class FaceTemplateCodec:
+    """
+    Stores the document face next to the document record so a later
+    selfie can be verified without processing the document images again.
+
+    The embedding is kept as float32 bytes, encrypted with Fernet when
+    FACE_TEMPLATE_KEY holds a key (cryptography is only needed then).
+    """
+
+    def __init__(self, model: str, key: Optional[str] = None):
+        self.model = model
+
+        key = key if key is not None else os.getenv("FACE_TEMPLATE_KEY")
+        self.fernet = None
+        if key:
+            from cryptography.fernet import Fernet
+
+            self.fernet = Fernet(key)
+
+    def encode(self, face: FaceDetection) -> Dict[str, Any]:
+        raw = np.asarray(face.embedding, dtype=np.float32).tobytes()
+
+        return {
+            "model": self.model,
+            "bbox": [int(v) for v in face.bbox],
+            "confidence": float(face.confidence),
+            "encrypted": self.fernet is not None,
+            "embedding": self.fernet.encrypt(raw) if self.fernet else raw,
+        }
+
+    def decode(self, template: Dict[str, Any]) -> FaceDetection:
+        """
+        Rebuild the stored face. Embeddings of another recognition model
+        are not comparable, so those templates are rejected.
+        """
+        if template.get("model") != self.model:
+            raise BiometricError("Face template was computed with another model")
+
+        raw = bytes(template["embedding"])
+
+        if template.get("encrypted"):
+            if self.fernet is None:
+                raise BiometricError("Face template is encrypted and no key is configured")
+
+            from cryptography.fernet import InvalidToken
+
+            try:
+                raw = self.fernet.decrypt(raw)
+            except InvalidToken:
+                raise BiometricError("Face template cannot be decrypted")
+
+        return FaceDetection(
+            bbox=tuple(template["bbox"]),
+            confidence=float(template["confidence"]),
+            embedding=np.frombuffer(raw, dtype=np.float32)
+        )
@@ -0,0 +1,248 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .document_hash import DEDUP_TTL_SECONDS
+from .metrics import metrics
+from .perceptual_hash import CARD_HASH_HEX, MultiIndexHash, card_key, hamming
+
+
+# card hash distance (bits out of 256) under which two uploads are the same card.
+# Measured on one fixed template: different cards are 56 bits or more apart,
+# re-photographs (2 degree rotation, slight perspective) 40 at most
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "48"))
+# stricter distance to reuse the verdict of the same user's earlier upload, negative disables
+PHASH_REUSE_DISTANCE = int(os.getenv("PHASH_REUSE_DISTANCE", "24"))
+# photo field hash distance (bits out of 64) a reused verdict also needs,
+# re-photographs without rotation measured 4 bits apart at most
+PHASH_PHOTO_REUSE_DISTANCE = int(os.getenv("PHASH_PHOTO_REUSE_DISTANCE", "8"))
+# search radius of the 64 bit index key, re-photographs measured up to 10 bits apart
+PHASH_KEY_DISTANCE = int(os.getenv("PHASH_KEY_DISTANCE", "10"))
+
+# the index holds the documents of the last PHASH_INDEX_DAYS, newest first
+# and at most PHASH_INDEX_MAX_DOCS of them
+PHASH_INDEX_DAYS = int(os.getenv("PHASH_INDEX_DAYS", "180"))
+PHASH_INDEX_MAX_DOCS = int(os.getenv("PHASH_INDEX_MAX_DOCS", "500000"))
+# documents saved by other replicas are read every SYNC seconds,
+# the whole index is rebuilt (old documents evicted) every REBUILD seconds
+PHASH_INDEX_SYNC_SECONDS = float(os.getenv("PHASH_INDEX_SYNC_SECONDS", "60"))
+PHASH_INDEX_REBUILD_SECONDS = float(os.getenv("PHASH_INDEX_REBUILD_SECONDS", "21600"))
+
+
+class NearDuplicateIndex:
+    """
+    Card hashes of the stored documents, searchable by Hamming distance
+    in about a millisecond at 100k documents.
+
+    Documents are indexed by the key of their first page card hash
+    (see perceptual_hash.card_key) and matched on the full hash of every
+    page. The index lives in memory, one per replica:
+
+    - load (startup, then every rebuild_seconds) builds a new index from
+      the documents of the last window_days, at most max_docs of them, and
+      swaps it in. Older documents leave the index there.
+    - sync (every sync_seconds) adds the documents saved since the last
+      read, so uploads handled by other replicas are found within
+      sync_seconds. Documents saved by this process are added right away.
+
+    The collection is the source of truth: a replica that restarts or
+    misses a sync catches up on its next read.
+    """
+
+    # re-read window of a sync: documents become visible after their
+    # validated_at (buffered writes, clocks of other replicas)
+    SYNC_OVERLAP_SECONDS = 60
+
+    def __init__(self, max_distance: int = PHASH_MAX_DISTANCE,
+                 reuse_distance: int = PHASH_REUSE_DISTANCE, ttl_seconds: int = DEDUP_TTL_SECONDS,
+                 window_days: int = PHASH_INDEX_DAYS, max_docs: int = PHASH_INDEX_MAX_DOCS,
+                 key_distance: int = PHASH_KEY_DISTANCE,
+                 photo_reuse_distance: int = PHASH_PHOTO_REUSE_DISTANCE):
+        self.max_distance = max_distance
+        self.reuse_distance = reuse_distance
+        self.key_distance = key_distance
+        self.photo_reuse_distance = photo_reuse_distance
+        self.ttl_seconds = ttl_seconds
+        self.window_days = window_days
+        self.max_docs = max_docs
+
+        self.hashes = MultiIndexHash(key_distance)
+        self.document_ids = set()
+        # validated_at from which the next sync reads
+        self.synced_from: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, doc: Dict[str, Any]):
+        """
+        doc holds the stored fields: _id, user_id, doc_type_id, is_valid,
+        selfie_hash, validated_at, phash (one hex card hash per page)
+        and photo_phash
+        """
+        if not doc.get("phash") or str(doc["_id"]) in self.document_ids:
+            return
+        # whole page hashes of earlier versions are not comparable
+        if any(len(h) != CARD_HASH_HEX for h in doc["phash"]):
+            return
+
+        entry = {
+            "document_id": str(doc["_id"]),
+            "user_id": doc.get("user_id"),
+            "doc_type_id": doc.get("doc_type_id"),
+            "is_valid": doc.get("is_valid"),
+            "selfie_hash": doc.get("selfie_hash"),
+            "validated_at": doc.get("validated_at"),
+            "phash": [int(h, 16) for h in doc["phash"]],
+            "photo_phash": int(doc["photo_phash"], 16) if doc.get("photo_phash") else None,
+        }
+        self.hashes.add(card_key(entry["phash"][0]), entry)
+        self.document_ids.add(entry["document_id"])
+
+    def clear(self):
+        self.hashes = MultiIndexHash(self.key_distance)
+        self.document_ids = set()
+        self.synced_from = None
+
+    def __len__(self):
+        return len(self.document_ids)
+
+    async def load(self, repo) -> int:
+        """
+        Rebuild from the collection, lookups keep using the current
+        index until the new one is complete
+        """
+        start = time.perf_counter()
+        started = datetime.utcnow()
+        since = started - timedelta(days=self.window_days)
+
+        index = NearDuplicateIndex(self.max_distance, self.reuse_distance, self.ttl_seconds,
+                                   self.window_days, self.max_docs, self.key_distance,
+                                   self.photo_reuse_distance)
+        async for doc in repo.find_phashes(since=since, limit=self.max_docs):
+            index.add(doc)
+
+        # documents saved meanwhile went to the old index, the next sync reads them again
+        self.hashes, self.document_ids = index.hashes, index.document_ids
+        self.synced_from = started - timedelta(seconds=self.SYNC_OVERLAP_SECONDS)
+
+        elapsed = time.perf_counter() - start
+        metrics.observe("near_duplicate_index_load_seconds", elapsed)
+        print(f"Near duplicate index loaded: {len(self)} documents in {elapsed:.2f}s")
+        return len(self)
+
+    async def sync(self, repo) -> int:
+        """
+        Add the documents saved (by any replica) since the last read
+        """
+        if self.synced_from is None:
+            return await self.load(repo)
+
+        started = datetime.utcnow()
+        before = len(self)
+
+        async for doc in repo.find_phashes(since=self.synced_from):
+            self.add(doc)
+
+        self.synced_from = started - timedelta(seconds=self.SYNC_OVERLAP_SECONDS)
+        return len(self) - before
+
+    def start_sync(self, repo, sync_seconds: float = PHASH_INDEX_SYNC_SECONDS,
+                   rebuild_seconds: float = PHASH_INDEX_REBUILD_SECONDS) -> asyncio.Task:
+        """
+        Load the index, then keep it in sync with the collection in the background
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._keep_in_sync(repo, sync_seconds, rebuild_seconds))
+        return self._task
+
+    async def _keep_in_sync(self, repo, sync_seconds: float, rebuild_seconds: float):
+        rebuilt_at = None
+
+        while True:
+            try:
+                if rebuilt_at is None or time.monotonic() - rebuilt_at >= rebuild_seconds:
+                    await self.load(repo)
+                    rebuilt_at = time.monotonic()
+                else:
+                    await self.sync(repo)
+            except Exception as e:
+                # lookups keep the current index, the next round retries
+                print(f"Near duplicate index sync failed: {e}")
+
+            await asyncio.sleep(sync_seconds)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def find(self, phash: List[str], doc_type_id=None) -> List[Dict[str, Any]]:
+        """
+        Stored documents within max_distance on every page, closest first.
+        Each match is the stored entry plus its distance (worst page)
+        """
+        if not phash:
+            return []
+
+        pages = [int(h, 16) for h in phash]
+        matches = []
+
+        for _, entry in self.hashes.search(card_key(pages[0])):
+            if doc_type_id is not None and entry["doc_type_id"] != doc_type_id:
+                continue
+            if len(entry["phash"]) != len(pages):
+                continue
+
+            distance = max(hamming(a, b) for a, b in zip(pages, entry["phash"]))
+            if distance <= self.max_distance:
+                matches.append({**entry, "distance": distance})
+
+        matches.sort(key=lambda match: match["distance"])
+        return matches
+
+    def reusable(self, matches: List[Dict[str, Any]], user_id, selfie_hash: Optional[str],
+                 photo_phash: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Closest recent valid upload of the same card by the same user with
+        the same selfie and the same photo, whose verdict stands for this one.
+        Rejected verdicts are never reused, the card is analyzed again
+        """
+        if self.reuse_distance < 0 or self.ttl_seconds <= 0 or not photo_phash:
+            return None
+
+        since = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        photo = int(photo_phash, 16)
+
+        for match in matches:
+            if (match["distance"] <= self.reuse_distance
+                    and match["is_valid"] is True
+                    and match["user_id"] == user_id
+                    and match["selfie_hash"] == selfie_hash
+                    and match["photo_phash"] is not None
+                    and hamming(match["photo_phash"], photo) <= self.photo_reuse_distance
+                    and match["validated_at"] is not None
+                    and match["validated_at"] >= since):
+                metrics.incr("near_duplicate_reuses")
+                return match
+
+        return None
+
+    def other_users(self, matches: List[Dict[str, Any]], user_id) -> List[str]:
+        """
+        Documents of the same card uploaded by other users
+        """
+        document_ids = [match["document_id"] for match in matches if match["user_id"] != user_id]
+
+        # ids stay out of the logs, they are stored as cross_user_duplicates
+        if document_ids:
+            metrics.incr("near_duplicate_cross_user_matches")
+
+        return document_ids
+
+
+near_duplicates = NearDuplicateIndex()
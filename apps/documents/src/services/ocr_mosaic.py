@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+import numpy as np
+import pytesseract
+
+
+class OcrMosaic:
+    """
+    Packs many small binarized crops into a single image so tesseract
+    runs its page layout analysis once, then maps the recognized words
+    back to the crop they came from using their vertical position.
+    """
+
+    # white band between crops, tall enough to break tesseract lines
+    SEPARATOR_PX = 24
+    # white border around each crop
+    PADDING_PX = 8
+    # keep each mosaic under this height, bigger documents get several mosaics
+    MAX_HEIGHT_PX = 6000
+
+    def split(self, crops: List[np.ndarray]) -> List[List[int]]:
+        """
+        Split crop indexes in chunks whose mosaic fits MAX_HEIGHT_PX
+        """
+        chunks = []
+        current = []
+        height = 0
+
+        for idx, crop in enumerate(crops):
+            crop_height = crop.shape[0] + 2 * self.PADDING_PX + self.SEPARATOR_PX
+
+            if current and height + crop_height > self.MAX_HEIGHT_PX:
+                chunks.append(current)
+                current = []
+                height = 0
+
+            current.append(idx)
+            height += crop_height
+
+        if current:
+            chunks.append(current)
+
+        return chunks
+
+    def build(self, crops: List[np.ndarray]) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+        """
+        Stack grayscale crops vertically on a white canvas.
+
+        Returns:
+            The mosaic and the (y_start, y_end) span of every crop
+        """
+        width = max(c.shape[1] for c in crops) + 2 * self.PADDING_PX
+        height = sum(
+            c.shape[0] + 2 * self.PADDING_PX + self.SEPARATOR_PX
+            for c in crops
+        )
+
+        mosaic = np.full((height, width), 255, dtype=np.uint8)
+        spans = []
+        y = 0
+
+        for crop in crops:
+            h, w = crop.shape[:2]
+            top = y + self.PADDING_PX
+
+            mosaic[top:top + h, self.PADDING_PX:self.PADDING_PX + w] = crop
+            spans.append((y, top + h + self.PADDING_PX))
+
+            y += h + 2 * self.PADDING_PX + self.SEPARATOR_PX
+
+        return mosaic, spans
+
+    def assign_words(self, data: Dict[str, list], spans: List[Tuple[int, int]]) -> List[str]:
+        """
+        Map word boxes from image_to_data back to the crop they belong to.
+        Words keep tesseract's reading order and lines are joined with newlines
+        """
+        starts = [s[0] for s in spans]
+        lines_by_crop: List[Dict[Tuple[int, int, int], List[str]]] = [
+            {} for _ in spans
+        ]
+
+        for i, word in enumerate(data["text"]):
+            word = word.strip()
+            if not word:
+                continue
+
+            center_y = data["top"][i] + data["height"][i] / 2
+            crop_idx = bisect_right(starts, center_y) - 1
+
+            if crop_idx < 0 or center_y > spans[crop_idx][1]:
+                # word fell on a separator band
+                continue
+
+            line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines_by_crop[crop_idx].setdefault(line_key, []).append(word)
+
+        return [
+            "\n".join(" ".join(words) for words in lines.values()).strip()
+            for lines in lines_by_crop
+        ]
+
+    def recognize(self, crops: List[np.ndarray], config: str) -> List[str]:
+        """
+        Run a single OCR call for a chunk of crops
+        """
+        if not crops:
+            return []
+
+        mosaic, spans = self.build(crops)
+
+        data = pytesseract.image_to_data(
+            mosaic,
+            config=config,
+            output_type=pytesseract.Output.DICT
+        )
+
+        return self.assign_words(data, spans)
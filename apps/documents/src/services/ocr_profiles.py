@@ -0,0 +1,103 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Union
+
+
+ALNUM_WHITELIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789/.-:,"
+
+# Keywords that indicate fields where OCR does not apply
+NON_OCR_KEYWORDS = ["photo", "codigo", "firma", "escudo", "huella", "logo",
+                    "microphoto", "qr", "photo_", "mariposa", "micro"]
+
+
+@dataclass(frozen=True)
+class OcrProfile:
+    """
+    How a single layout field is recognized
+    """
+    psm: int = 6                       # tesseract page segmentation mode
+    whitelist: str = ALNUM_WHITELIST
+    upscale: float = 1.0               # resize factor applied to the crop before OCR
+    skip: bool = False                 # field is never cropped nor recognized
+
+    @property
+    def config(self) -> str:
+        return f"--psm {self.psm} -c tessedit_char_whitelist={self.whitelist}"
+
+    # single line/word/char modes cannot read a mosaic of stacked crops
+    SINGLE_LINE_PSMS = (7, 8, 10, 13)
+
+    @property
+    def mosaic_config(self) -> str:
+        # the mosaic overrides single line modes with block segmentation (psm 6),
+        # so a "line" field may read differently than in per_crop mode
+        psm = 6 if self.psm in self.SINGLE_LINE_PSMS else self.psm
+        return f"--psm {psm} -c tessedit_char_whitelist={self.whitelist}"
+
+
+# presets layouts can refer to by name
+OCR_PRESETS: Dict[str, OcrProfile] = {
+    "text": OcrProfile(),
+    "line": OcrProfile(psm=7),
+    "digits": OcrProfile(psm=7, whitelist="0123456789.,-"),
+    "date": OcrProfile(psm=7, whitelist="0123456789/-"),
+    "skip": OcrProfile(skip=True),
+}
+
+DEFAULT_PROFILE = OCR_PRESETS["text"]
+
+
+def needs_ocr(field_name: str) -> bool:
+    """
+    Determines if a field needs OCR based on its name
+    """
+    field_lower = field_name.lower()
+
+    # If contains a non-OCR keyword, returns False
+    for keyword in NON_OCR_KEYWORDS:
+        if keyword in field_lower:
+            return False
+
+    # If does not contain any, we assume it needs OCR
+    return True
+
+
+def parse_profile(spec: Union[str, Dict[str, Any]]) -> OcrProfile:
+    """
+    Build a profile from a layout entry.
+
+    Accepts a preset name ("digits") or a dict with an optional
+    "profile" preset plus overrides ({"profile": "line", "upscale": 2}).
+    """
+    if isinstance(spec, str):
+        if spec not in OCR_PRESETS:
+            raise ValueError(f"Unknown OCR profile: {spec}")
+        return OCR_PRESETS[spec]
+
+    overrides = dict(spec)
+    base = parse_profile(overrides.pop("profile", "text"))
+
+    unknown = set(overrides) - {"psm", "whitelist", "upscale", "skip"}
+    if unknown:
+        raise ValueError(f"Unknown OCR profile options: {sorted(unknown)}")
+
+    return replace(base, **overrides)
+
+
+def compile_ocr_profiles(template: Dict[str, Any],
+                         profile_specs: Dict[str, Any]) -> Dict[str, OcrProfile]:
+    """
+    Resolve the OCR profile of every field of a page template.
+    Explicit layout entries win, otherwise the field name decides
+    between the default text profile and skipping the field.
+    """
+    profiles = {}
+
+    for field_name in template:
+        if field_name in profile_specs:
+            profiles[field_name] = parse_profile(profile_specs[field_name])
+        elif needs_ocr(field_name):
+            profiles[field_name] = DEFAULT_PROFILE
+        else:
+            profiles[field_name] = OCR_PRESETS["skip"]
+
+    return profiles
@@ -0,0 +1,44 @@
+import hashlib
+import os
+from typing import Optional
+
+from .cache import LRUCache, TieredCache
+
+
+# Per page pipeline stages of recently uploaded files: normalized image,
+# structural regions and groups. A resubmission that only replaces one
+# file recomputes that file's pages. Entries hold full images, so the
+# cache is in-memory only and small
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "32"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "3600"))
+
+# OCR text of every field of a page, for a given layout page
+PAGE_TEXT_CACHE_SIZE = int(os.getenv("PAGE_TEXT_CACHE_SIZE", "1024"))
+
+page_cache = TieredCache(
+    "page",
+    LRUCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+)
+
+page_text_cache = TieredCache(
+    "page_text",
+    LRUCache(maxsize=PAGE_TEXT_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+)
+
+
+def file_key(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def page_text_key(page_key: str, page_idx: int, layout_version: Optional[str], ocr_mode: str) -> str:
+    """
+    Field texts depend on the page content and on the template it is read
+    with, which is chosen by its position in the document
+    """
+    hasher = hashlib.sha256()
+
+    for part in (page_key, str(page_idx), layout_version or "-", ocr_mode):
+        hasher.update(part.encode())
+        hasher.update(b"\0")
+
+    return hasher.hexdigest()
@@ -1,9 +1,74 @@
+import hashlib
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Tuple, Optional
 import cv2
 import pytesseract
 import numpy as np
 
+from .ocr_mosaic import OcrMosaic
+from .ocr_profiles import DEFAULT_PROFILE, OcrProfile, compile_ocr_profiles, needs_ocr
+from .metrics import metrics
+from .cache import LRUCache, RedisCache, TieredCache
+from .text_detection import TextDetector
+
+
+# OMP_THREAD_LIMIT=1 is set in the image (dockerfile): tesseract calls run
+# concurrently in the OCR pool and must stay single threaded each
+
+# OCR results keyed by the binarized crop content and the OCR config.
+# Resubmissions of the same card hit it instead of running tesseract again
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "4096"))
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", "86400"))
+
+ocr_cache = TieredCache(
+    "ocr",
+    LRUCache(maxsize=OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL),
+    RedisCache.from_env("OCR_CACHE_REDIS_URL", prefix="ocr:", ttl=OCR_CACHE_TTL)
+)
+
+
+def ocr_cache_key(thresh: np.ndarray, config: str) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(config.encode())
+    hasher.update(str(thresh.shape).encode())
+    hasher.update(np.ascontiguousarray(thresh).tobytes())
+    return hasher.hexdigest()
+
+
+_ocr_executor: Optional[ThreadPoolExecutor] = None
+_ocr_executor_lock = threading.Lock()
+
+
+def ocr_pool_size() -> int:
+    """
+    Number of concurrent OCR calls. Defaults to the available cores minus
+    the threads reserved for OpenCV/ONNX work running next to the OCR stage
+    """
+    configured = int(os.getenv("OCR_MAX_WORKERS", "0"))
+    if configured > 0:
+        return configured
+
+    reserved = int(os.getenv("OCR_RESERVED_THREADS", "1"))
+    return max(1, (os.cpu_count() or 1) - reserved)
+
+
+def get_ocr_executor() -> ThreadPoolExecutor:
+    """Shared bounded pool used by every request for OCR calls"""
+    global _ocr_executor
+
+    if _ocr_executor is None:
+        with _ocr_executor_lock:
+            if _ocr_executor is None:
+                _ocr_executor = ThreadPoolExecutor(
+                    max_workers=ocr_pool_size(),
+                    thread_name_prefix="ocr"
+                )
+
+    return _ocr_executor
+
 
 class PostAssignmentProcessor:
     """
@@ -12,146 +77,373 @@ class PostAssignmentProcessor:
     adding OCR results directly to the existing structure.
     """
     
-    def __init__(self):
-        # Keywords that indicate fields where OCR does not apply
-        self.non_ocr_keywords = ["photo", "codigo", "firma", "escudo", "huella", "logo", 
-                                "microphoto", "qr", "photo_", "mariposa", "micro"]
+    # per_crop: one tesseract call per group crop
+    # mosaic: all crops of the document packed in a single tesseract call
+    OCR_MODES = ("per_crop", "mosaic")
+
+    def __init__(self, use_text_prefilter: bool = True):
+        self.mosaic = OcrMosaic()
+        # skips blank crops and tightens the rest before running tesseract
+        self.text_detector = TextDetector() if use_text_prefilter else None
     
     def needs_ocr(self, field_name: str) -> bool:
         """
         Determines if a field needs OCR based on its name
         """
-        field_lower = field_name.lower()
-        
-        # If contains a non-OCR keyword, returns False
-        for keyword in self.non_ocr_keywords:
-            if keyword in field_lower:
-                return False
-        
-        # If does not contain any, we assume it needs OCR
-        return True
+        return needs_ocr(field_name)
     
+    def sort_groups(self, assigned_groups: List[Dict]) -> List[Dict]:
+        """
+        Sort groups left to right, top to bottom (reading order)
+        """
+        return sorted(
+            assigned_groups,
+            key=lambda g: (g["norm_bbox"][1], g["norm_bbox"][0])  # y, x
+        )
+
+    def crop_group(self, img: np.ndarray, group: Dict,
+                   img_shape: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        Crop the pixels of a group from its normalized bbox
+        """
+        # Convert normalized bbox to pixel coordinates
+        norm_bbox = group["norm_bbox"]
+        h, w = img_shape[:2]
+
+        x1 = int(norm_bbox[0] * w)
+        y1 = int(norm_bbox[1] * h)
+        x2 = int(norm_bbox[2] * w)
+        y2 = int(norm_bbox[3] * h)
+
+        # Ensure coordinates are within image bounds
+        x1 = max(0, min(x1, w-1))
+        y1 = max(0, min(y1, h-1))
+        x2 = max(0, min(x2, w))
+        y2 = max(0, min(y2, h))
+
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        region_img = img[y1:y2, x1:x2]
+
+        # Verify region is not empty
+        if region_img.size == 0:
+            return None
+
+        return region_img
+
+    def crop_text_region(self, img: np.ndarray, group: Dict,
+                         img_shape: Tuple[int, int],
+                         profile: OcrProfile = DEFAULT_PROFILE) -> Optional[np.ndarray]:
+        """
+        Crop a group and tighten it to its text lines, looked for at the
+        size the profile recognizes it. Returns None when there is nothing
+        to recognize
+        """
+        region_img = self.crop_group(img, group, img_shape)
+        if region_img is None or self.text_detector is None:
+            return region_img
+
+        text_bbox = self.text_detector.find_text_bbox(region_img, profile.upscale)
+        if text_bbox is None:
+            metrics.incr("ocr_blank_crops_skipped")
+            return None
+
+        x1, y1, x2, y2 = text_bbox
+        return region_img[y1:y2, x1:x2]
+
+    def binarize_crop(self, region_img: np.ndarray,
+                      profile: OcrProfile = DEFAULT_PROFILE) -> np.ndarray:
+        """
+        Preprocessing for OCR
+        """
+        gray = cv2.cvtColor(region_img, cv2.COLOR_BGR2GRAY)
+
+        if profile.upscale != 1.0:
+            gray = cv2.resize(
+                gray, None,
+                fx=profile.upscale, fy=profile.upscale,
+                interpolation=cv2.INTER_CUBIC
+            )
+
+        _, thresh = cv2.threshold(
+            gray, 0, 255,
+            cv2.THRESH_BINARY + cv2.THRESH_OTSU
+        )
+        return thresh
+
+    def ocr_group(self, img: np.ndarray, group: Dict,
+                  img_shape: Tuple[int, int],
+                  profile: OcrProfile = DEFAULT_PROFILE) -> str:
+        """
+        Run OCR over a single group crop
+        """
+        region_img = self.crop_text_region(img, group, img_shape, profile)
+        if region_img is None:
+            return ""
+
+        try:
+            thresh = self.binarize_crop(region_img, profile)
+
+            key = ocr_cache_key(thresh, profile.config)
+            cached = ocr_cache.get(key)
+            if cached is not None:
+                return cached
+
+            # Apply OCR with the field configuration
+            text = pytesseract.image_to_string(
+                thresh,
+                config=profile.config
+            ).strip()
+
+            ocr_cache.set(key, text)
+            return text
+        except Exception as e:
+            print(f"Error in OCR for region {group['norm_bbox']}: {e}")
+            return ""
+
     def extract_text_from_groups(self, img: np.ndarray, 
                                 assigned_groups: List[Dict],
-                                img_shape: Tuple[int, int]) -> str:
+                                img_shape: Tuple[int, int],
+                                profile: OcrProfile = DEFAULT_PROFILE) -> str:
         """
         Extract text from assigned groups
         """
-        if not assigned_groups:
+        if not assigned_groups or profile.skip:
             return ""
-        
-        # Sort groups left to right, top to bottom
-        sorted_groups = sorted(
-            assigned_groups,
-            key=lambda g: (g["norm_bbox"][1], g["norm_bbox"][0])  # y, x
-        )
-        
+
         all_texts = []
-        
-        for group in sorted_groups:
-            # Convert normalized bbox to pixel coordinates
-            norm_bbox = group["norm_bbox"]
-            h, w = img_shape[:2]
-            
-            x1 = int(norm_bbox[0] * w)
-            y1 = int(norm_bbox[1] * h)
-            x2 = int(norm_bbox[2] * w)
-            y2 = int(norm_bbox[3] * h)
-            
-            # Ensure coordinates are within image bounds
-            x1 = max(0, min(x1, w-1))
-            y1 = max(0, min(y1, h-1))
-            x2 = max(0, min(x2, w))
-            y2 = max(0, min(y2, h))
-            
-            if x2 > x1 and y2 > y1:
-                region_img = img[y1:y2, x1:x2]
-                
-                # Verify region is not empty
-                if region_img.size > 0:
-                    try:
-                        # Preprocessing for OCR
-                        gray = cv2.cvtColor(region_img, cv2.COLOR_BGR2GRAY)
-                        _, thresh = cv2.threshold(
-                            gray, 0, 255,
-                            cv2.THRESH_BINARY + cv2.THRESH_OTSU
-                        )
-                        
-                        # Apply OCR with appropriate configuration
-                        text = pytesseract.image_to_string(
-                            thresh,
-                            config="--psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789/.-:,"
-                        ).strip()
-                        
-                        if text:
-                            all_texts.append(text)
-                    except Exception as e:
-                        print(f"Error in OCR for region {norm_bbox}: {e}")
-                        continue
-        
+
+        for group in self.sort_groups(assigned_groups):
+            text = self.ocr_group(img, group, img_shape, profile)
+            if text:
+                all_texts.append(text)
+
         return " ".join(all_texts).strip()
-    
+
+    def run_ocr_tasks(self, original_images: List[np.ndarray],
+                      tasks: List[Tuple[int, Dict, OcrProfile]],
+                      ocr_mode: str = "per_crop") -> List[str]:
+        """
+        OCR every (page_idx, group, profile) task on the shared pool.
+        Results keep the order of the tasks.
+        """
+        if ocr_mode == "mosaic":
+            return self.run_mosaic_ocr(original_images, tasks)
+
+        def run(task):
+            page_idx, group, profile = task
+            img = original_images[page_idx]
+            return self.ocr_group(img, group, img.shape, profile)
+
+        if len(tasks) <= 1 or ocr_pool_size() == 1:
+            return [run(task) for task in tasks]
+
+        return list(get_ocr_executor().map(run, tasks))
+
+    def run_mosaic_ocr(self, original_images: List[np.ndarray],
+                       tasks: List[Tuple[int, Dict, OcrProfile]]) -> List[str]:
+        """
+        OCR all task crops packed in mosaics (one tesseract call per mosaic).
+        Crops only share a mosaic when their profiles share the same config,
+        single line psms are read with psm 6 (see OcrProfile.mosaic_config).
+        """
+        texts = [""] * len(tasks)
+        crops = []
+        crop_tasks = []
+        crop_keys = []
+        crops_by_config: Dict[str, List[int]] = {}
+
+        for task_idx, (page_idx, group, profile) in enumerate(tasks):
+            img = original_images[page_idx]
+            region_img = self.crop_text_region(img, group, img.shape, profile)
+            if region_img is None:
+                continue
+
+            thresh = self.binarize_crop(region_img, profile)
+
+            # only crops missing from the cache go into a mosaic
+            key = ocr_cache_key(thresh, "mosaic " + profile.mosaic_config)
+            cached = ocr_cache.get(key)
+            if cached is not None:
+                texts[task_idx] = cached
+                continue
+
+            crops_by_config.setdefault(profile.config, []).append(len(crops))
+            crops.append(thresh)
+            crop_tasks.append(task_idx)
+            crop_keys.append(key)
+
+        # (mosaic config, crop indexes) for every mosaic to recognize
+        chunks = []
+        for crop_idxs in crops_by_config.values():
+            config = tasks[crop_tasks[crop_idxs[0]]][2].mosaic_config
+            for chunk in self.mosaic.split([crops[i] for i in crop_idxs]):
+                chunks.append((config, [crop_idxs[i] for i in chunk]))
+
+        def run(chunk):
+            config, crop_idxs = chunk
+            try:
+                chunk_text = self.mosaic.recognize([crops[i] for i in crop_idxs], config)
+            except Exception as e:
+                print(f"Error in mosaic OCR for {len(crop_idxs)} crops: {e}")
+                return [""] * len(crop_idxs)
+
+            for crop_idx, text in zip(crop_idxs, chunk_text):
+                ocr_cache.set(crop_keys[crop_idx], text)
+            return chunk_text
+
+        if len(chunks) <= 1 or ocr_pool_size() == 1:
+            chunk_texts = [run(chunk) for chunk in chunks]
+        else:
+            chunk_texts = list(get_ocr_executor().map(run, chunks))
+
+        for (_, crop_idxs), chunk_text in zip(chunks, chunk_texts):
+            for crop_idx, text in zip(crop_idxs, chunk_text):
+                texts[crop_tasks[crop_idx]] = text
+
+        return texts
+
     def add_ocr_to_page_results(self, 
                             original_images: List[np.ndarray],
-                            page_results: List[Dict]) -> List[Dict]:
+                            page_results: List[Dict],
+                            ocr_mode: str = "per_crop",
+                            ocr_profiles: Optional[List[Dict[str, OcrProfile]]] = None,
+                            document_type_id: Any = None,
+                            pages: Optional[List[int]] = None) -> List[Dict]:
         """
         Add OCR text directly to page results structure.
+        All crops of the document are collected first and recognized
+        concurrently, then the text of every field is reassembled in reading order.
+        A group assigned to several overlapping fields is recognized only once.
         
         Args:
             original_images: List of original images (one per page)
             page_results: Results from _process_page for each page
+            ocr_mode: "per_crop" or "mosaic" (see OCR_MODES)
+            ocr_profiles: Compiled field profiles for each page template.
+                          When missing they are derived from the field names
+            document_type_id: Label for the OCR metrics
+            pages: Indexes of the pages to recognize, all of them when missing
             
         Returns:
             Modified page_results with OCR text added
         """
-        modified_results = []
-        
+        # 1. collect every (page, field, group) crop up front,
+        # keeping one task per unique (page, group, profile)
+        fields = []
+        tasks = []
+        task_index: Dict[Tuple, int] = {}
+        requested = 0
+
         for page_idx, page_result in enumerate(page_results):
             if page_idx >= len(original_images):
-                modified_results.append(page_result)
                 continue
-                
-            img = original_images[page_idx]
-            img_shape = img.shape
-            
+
+            if pages is not None and page_idx not in pages:
+                continue
+
             # Get assignments
             assignments = page_result.get("assignments", {})
-            
-            # Process each field
+            profiles = self._page_profiles(ocr_profiles, page_idx, assignments)
+
             for field_name, assigned_groups in assignments.items():
-                # Skip if field doesn't need OCR
-                if not self.needs_ocr(field_name):
+                profile = profiles.get(field_name, DEFAULT_PROFILE)
+
+                # Skip if field doesn't need OCR, it is never cropped
+                if profile.skip:
                     continue
-                
-                # Extract text from groups
-                text = self.extract_text_from_groups(img, assigned_groups, img_shape)
-                
-                # Add text directly to assignated_groups
-                if "assignated_groups" in page_result and field_name in page_result["assignated_groups"]:
-                    current_data = page_result["assignated_groups"][field_name]
-                    
-                    if isinstance(current_data, tuple):
-                        #if its just a tuple bbox, we turn it into a dict
-                        page_result["assignated_groups"][field_name] = {
-                            "bbox": current_data,
-                            "text": text
-                        }
-                    elif isinstance(current_data, dict):
-                        # if it its already a dict
-                        current_data["text"] = text
-                    # if already has text, it gest overrided
+
+                field_tasks = []
+
+                for group in self.sort_groups(assigned_groups):
+                    key = (page_idx, self._group_key(group), profile)
+
+                    if key not in task_index:
+                        task_index[key] = len(tasks)
+                        tasks.append((page_idx, group, profile))
+
+                    field_tasks.append(task_index[key])
+
+                requested += len(field_tasks)
+                fields.append((page_idx, field_name, field_tasks))
+
+        # 2. recognize all crops on the bounded pool
+        texts = self.run_ocr_tasks(original_images, tasks, ocr_mode)
+
+        metrics.incr("ocr_crops_requested", requested, doc_type=document_type_id)
+        metrics.incr("ocr_calls_saved", requested - len(tasks), doc_type=document_type_id)
+
+        # 3. reassemble field text keeping the reading order
+        for page_idx, field_name, field_tasks in fields:
+            text = " ".join(texts[i] for i in field_tasks if texts[i]).strip()
+            self._set_field_text(page_results[page_idx], field_name, text)
+
+        return list(page_results)
+
+    def _group_key(self, group: Dict) -> Any:
+        """
+        Identity of a detected group inside its page
+        """
+        if "group_id" in group:
+            return group["group_id"]
+        return tuple(group["norm_bbox"])
+
+    def _page_profiles(self, ocr_profiles: Optional[List[Dict[str, OcrProfile]]],
+                       page_idx: int, assignments: Dict[str, List]) -> Dict[str, OcrProfile]:
+        """
+        Profiles of a page. Extra pages use the last template, like SemanticAsignation
+        """
+        if not ocr_profiles:
+            return compile_ocr_profiles(assignments, {})
+
+        return ocr_profiles[min(page_idx, len(ocr_profiles) - 1)]
+
+    def _set_field_text(self, page_result: Dict, field_name: str, text: str):
+        """
+        Add text directly to assignated_groups
+        """
+        if "assignated_groups" in page_result and field_name in page_result["assignated_groups"]:
+            current_data = page_result["assignated_groups"][field_name]
             
-            modified_results.append(page_result)
-        
-        return modified_results
+            if isinstance(current_data, tuple):
+                #if its just a tuple bbox, we turn it into a dict
+                page_result["assignated_groups"][field_name] = {
+                    "bbox": current_data,
+                    "text": text
+                }
+            elif isinstance(current_data, dict):
+                # if it its already a dict
+                current_data["text"] = text
+            # if already has text, it gest overrided
     
-    def enrich_semantic_results(self, semantic_results: Dict[str, Any], original_images: List[np.ndarray]) -> Dict[str, Any]:
+    def page_texts(self, page_result: Dict) -> Dict[str, str]:
+        """
+        OCR text of every field of a page
+        """
+        return {
+            field_name: data["text"]
+            for field_name, data in page_result.get("assignated_groups", {}).items()
+            if isinstance(data, dict) and "text" in data
+        }
+
+    def set_page_texts(self, page_result: Dict, texts: Dict[str, str]):
+        for field_name, text in texts.items():
+            self._set_field_text(page_result, field_name, text)
+
+    def enrich_semantic_results(self, semantic_results: Dict[str, Any], original_images: List[np.ndarray],
+                                ocr_mode: str = "per_crop",
+                                ocr_profiles: Optional[List[Dict[str, OcrProfile]]] = None,
+                                pages: Optional[List[int]] = None) -> Dict[str, Any]:
         """
         Enrich semantic results by adding OCR text directly to the structure.
         
         Args:
             semantic_results: Results from SemanticAsignation.process_document()
             original_images: Original images
+            ocr_mode: OCR strategy configured in the layout
+            ocr_profiles: Field profiles compiled from the layout, one dict per page
+            pages: Indexes of the pages to recognize (the others already have their text)
         
         Returns:
             Enriched results with OCR text integrated
@@ -166,7 +458,14 @@ class PostAssignmentProcessor:
             return enriched_results
         
         # Add OCR to page results
-        enriched_page_results = self.add_ocr_to_page_results(original_images, page_results)
+        if ocr_mode not in self.OCR_MODES:
+            raise ValueError(f"Unknown OCR mode: {ocr_mode}")
+
+        enriched_page_results = self.add_ocr_to_page_results(
+            original_images, page_results, ocr_mode, ocr_profiles,
+            document_type_id=enriched_results.get("document_type_id"),
+            pages=pages
+        )
         enriched_results["pages"] = enriched_page_results
 
         return enriched_results
@@ -1,14 +1,21 @@
-from typing import List
+import time
+from typing import List, Optional, Tuple
 from PIL import Image
 import numpy as np
 import cv2
 from io import BytesIO
 
+from .metrics import metrics
+
 
 class LowQualityError(Exception):
     pass
 
 
+class SelfieQualityError(Exception):
+    pass
+
+
 class ValidationService:
 
     MIN_SIZE_PX = 500
@@ -17,6 +24,13 @@ class ValidationService:
     CONTRAST_RANGE = (30, 70)
     MIN_SHARPNESS = 100
 
+    # selfie gate, brightness/contrast/sharpness measured on a SELFIE_CHECK_PX copy
+    SELFIE_MIN_SIZE_PX = 160
+    SELFIE_CHECK_PX = 256
+    SELFIE_BRIGHTNESS_RANGE = (50, 235)
+    SELFIE_MIN_CONTRAST = 20
+    SELFIE_MIN_SHARPNESS = 40
+
 
     def quality_validation(self, file_images: List[Image.Image]):
 
@@ -62,3 +76,58 @@ class ValidationService:
                 )
 
         return True
+
+    def selfie_validation(self, img: np.ndarray):
+        """
+        Cheap selfie checks run before the face model, so dark, flat,
+        blurry or tiny selfies are rejected in a couple of milliseconds
+
+        Args:
+            img: Decoded BGR selfie
+        """
+        start = time.perf_counter()
+        issue = self._selfie_issue(img)
+        metrics.observe("selfie_gate_seconds", time.perf_counter() - start)
+
+        if issue:
+            reason, message = issue
+            # every rejection is a detector + recognizer run avoided
+            metrics.incr("selfie_gate", result="rejected", reason=reason)
+            raise SelfieQualityError(message)
+
+        metrics.incr("selfie_gate", result="passed")
+        return True
+
+    def _selfie_issue(self, img: np.ndarray) -> Optional[Tuple[str, str]]:
+        """
+        First failed check as (reason, message), None when the selfie is usable
+        """
+        height, width = img.shape[:2]
+
+        if min(height, width) < self.SELFIE_MIN_SIZE_PX:
+            return "size", f"Selfie too small. Needs at least {self.SELFIE_MIN_SIZE_PX}px"
+
+        scale = self.SELFIE_CHECK_PX / max(height, width)
+        if scale < 1:
+            img = cv2.resize(
+                img,
+                (int(width * scale), int(height * scale)),
+                interpolation=cv2.INTER_AREA
+            )
+
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        brightness = gray.mean()
+        if brightness < self.SELFIE_BRIGHTNESS_RANGE[0]:
+            return "dark", "The selfie is too dark"
+
+        if brightness > self.SELFIE_BRIGHTNESS_RANGE[1]:
+            return "bright", "The selfie is too bright"
+
+        if gray.std() < self.SELFIE_MIN_CONTRAST:
+            return "contrast", "The selfie has too low contrast"
+
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < self.SELFIE_MIN_SHARPNESS:
+            return "blur", "The selfie is not sharp enough"
+
+        return None
@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from .cache import LRUCache, RedisCache, TieredCache
+
+
+# Outcome of process_document keyed by everything it depends on: the
+# uploaded bytes, the selfie, the layout file and the scoring pipeline.
+# A layout or weight change yields new keys, old entries just age out
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+
+
+def _json_default(value):
+    # face template embeddings are raw or encrypted bytes
+    if isinstance(value, (bytes, bytearray)):
+        return {"$bytes": base64.b64encode(value).decode()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _object_hook(value: dict):
+    if value.keys() == {"$bytes"}:
+        return base64.b64decode(value["$bytes"])
+    return value
+
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_json_default).encode()
+
+
+def loads(raw: bytes) -> Any:
+    return json.loads(raw, object_hook=_object_hook)
+
+
+result_cache = TieredCache(
+    "result",
+    LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL),
+    RedisCache.from_env(
+        "RESULT_CACHE_REDIS_URL", prefix="result:", ttl=RESULT_CACHE_TTL, dumps=dumps, loads=loads
+    )
+)
+
+
+def result_cache_key(file_hash: str, selfie_hash: Optional[str], doc_type_id,
+                     layout_version: str, pipeline_version: str) -> str:
+    hasher = hashlib.sha256()
+
+    for part in (file_hash, selfie_hash or "-", str(doc_type_id), layout_version, pipeline_version):
+        hasher.update(part.encode())
+        hasher.update(b"\0")
+
+    return hasher.hexdigest()
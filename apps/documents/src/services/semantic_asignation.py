@@ -1,9 +1,15 @@
+import hashlib
 import json
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from .ocr_profiles import compile_ocr_profiles
+
 
 class SemanticAsignation:
+
+    # photo fields that never hold the holder's face (microprint, hologram)
+    NON_FACE_PHOTO_KEYWORDS = ("micro", "mariposa")
     
     def __init__(self):
         self.layouts = self._load_layouts()
@@ -19,7 +25,9 @@ class SemanticAsignation:
                 doc_type_id = int(parts[0])          # 1
                 doc_key = parts[1] if len(parts) > 1 else str(doc_type_id)
 
-                layout_data = json.load(open(file))
+                raw = file.read_bytes()
+                layout_data = json.loads(raw)
+                profile_specs = layout_data.get("ocr_profiles", {})
 
                 templates_by_page = []
                 for template_info in layout_data.get("templates", []):
@@ -28,7 +36,12 @@ class SemanticAsignation:
                             "side",
                             f"page_{len(templates_by_page)}"
                         ),
-                        "template": template_info["template"]
+                        "template": template_info["template"],
+                        # OCR settings per field, resolved once at load time
+                        "ocr_profiles": compile_ocr_profiles(
+                            template_info["template"],
+                            profile_specs
+                        )
                     })
 
                 layouts[doc_type_id] = {
@@ -36,6 +49,9 @@ class SemanticAsignation:
                     "document_type": layout_data.get("document_type"),
                     "document_type_id": doc_type_id,
                     "version": layout_data.get("version"),
+                    # content hash, changes with any edit of the file
+                    "fingerprint": hashlib.sha256(raw).hexdigest(),
+                    "ocr_mode": layout_data.get("ocr_mode", "per_crop"),
                     "templates": templates_by_page
                 }
 
@@ -45,6 +61,10 @@ class SemanticAsignation:
 
         return layouts
 
+    def layout_fingerprint(self, document_id: int) -> Optional[str]:
+        layout = self.layouts.get(document_id)
+        return layout["fingerprint"] if layout else None
+
     def normalize_bbox(self, bbox, img_shape):
         """
         Converts an absolute bounding box (pixel coordinates)
@@ -388,6 +408,73 @@ class SemanticAsignation:
             "img_shape": img_shape
         }
 
+    def text_field_regions(self, document_id, page_idx: int) -> List[Tuple]:
+        """
+        Template bboxes of the fields read by OCR on a page, the part
+        of the card that changes from one holder to another
+
+        Returns:
+            List of (x1, y1, x2, y2) in normalized coordinates
+        """
+        layout_templates = self.layouts[document_id]["templates"]
+        page_template = layout_templates[min(page_idx, len(layout_templates) - 1)]
+
+        return [
+            (bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"])
+            for field, bbox in page_template["template"].items()
+            if not page_template["ocr_profiles"][field].skip
+        ]
+
+    def is_face_photo_field(self, field: str) -> bool:
+        field_lower = field.lower()
+        return "photo" in field_lower and not any(k in field_lower for k in self.NON_FACE_PHOTO_KEYWORDS)
+
+    def face_photo_template_regions(self, document_id, page_idx: int) -> List[Tuple]:
+        """
+        Template bboxes of the holder's photo fields on a page
+
+        Returns:
+            List of (x1, y1, x2, y2) in normalized coordinates
+        """
+        layout_templates = self.layouts[document_id]["templates"]
+        template = layout_templates[min(page_idx, len(layout_templates) - 1)]["template"]
+
+        return [
+            (bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"])
+            for field, bbox in template.items()
+            if self.is_face_photo_field(field)
+        ]
+
+    def photo_field_regions(self, document_id, semantic_results: Dict[str, Any]) -> List[Tuple[int, Tuple]]:
+        """
+        Where to look for the holder's face: the layout photo fields of every
+        page, as the union of the template bbox and the groups assigned to it.
+
+        Returns:
+            List of (page_idx, (x1, y1, x2, y2)) in normalized coordinates
+        """
+        layout_templates = self.layouts[document_id]["templates"]
+        regions = []
+
+        for page_result in semantic_results.get("pages", []):
+            page_idx = page_result["page"]
+            template = layout_templates[min(page_idx, len(layout_templates) - 1)]["template"]
+
+            for field, layout_bbox in template.items():
+                if not self.is_face_photo_field(field):
+                    continue
+
+                bboxes = [(layout_bbox["x1"], layout_bbox["y1"], layout_bbox["x2"], layout_bbox["y2"])]
+
+                assigned = page_result.get("assignated_groups", {}).get(field)
+                assigned_bbox = assigned.get("bbox") if isinstance(assigned, dict) else assigned
+                if assigned_bbox:
+                    bboxes.append(tuple(assigned_bbox))
+
+                regions.append((page_idx, self.merge_bboxes(bboxes)))
+
+        return regions
+
     def _combine_pages_results(self, page_results, layout_data):
         """Combine all pages results"""
         # Combine all extracted data
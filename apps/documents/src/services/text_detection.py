@@ -1,9 +1,27 @@
 import cv2
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 class TextDetector:
 
+    # aligned components a line needs for a crop to be worth recognizing
+    MIN_TEXT_COMPONENTS = 3
+    # line components are glyphs of similar height (ratio to the line median)
+    # with centroids within ALIGN_TOLERANCE heights of the line centre,
+    # and no gap wider than MAX_GAP_RATIO heights between neighbours
+    GLYPH_HEIGHT_RANGE = (0.5, 2.0)
+    ALIGN_TOLERANCE = 0.2
+    MAX_GAP_RATIO = 1.0
+    # a lone glyph (M/F, blood type) counts when it fills this much of the crop height
+    MIN_GLYPH_HEIGHT_RATIO = 0.25
+    # component area bounds for a crop REFERENCE_CROP_HEIGHT_PX high,
+    # they follow the squared crop height (glyphs grow with the field)
+    MIN_COMPONENT_AREA = 20
+    MAX_COMPONENT_AREA = 5000
+    REFERENCE_CROP_HEIGHT_PX = 60
+    # pixels kept around the detected lines when tightening a crop
+    TIGHT_PADDING_PX = 4
+
     @staticmethod
     def normalize_text_region(gray: np.ndarray) -> np.ndarray:
         """
@@ -30,82 +48,137 @@ class TextDetector:
         return opened
 
     @staticmethod
-    def find_connected_components(binary: np.ndarray) -> List[Dict]:
-        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(binary)
-
-        components = []
+    def connected_component_arrays(binary: np.ndarray, min_area: float = MIN_COMPONENT_AREA,
+                                   max_area: float = MAX_COMPONENT_AREA) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Text-like components as arrays, min_area..max_area pixels each.
 
-        for i in range(1, num_labels):  # saltamos fondo
-            x, y, w, h, area = stats[i]
+        Returns:
+            boxes: (n, 4) int array of x1, y1, x2, y2
+            centroids: (n, 2) float array of cx, cy
+        """
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(binary)
+
+        # skip background, then basic geometric filter
+        stats = stats[1:]
+        centroids = centroids[1:]
+        area = stats[:, cv2.CC_STAT_AREA]
+        keep = (area >= min_area) & (area <= max_area)
+
+        stats = stats[keep]
+        x = stats[:, cv2.CC_STAT_LEFT]
+        y = stats[:, cv2.CC_STAT_TOP]
+        boxes = np.stack(
+            [x, y, x + stats[:, cv2.CC_STAT_WIDTH], y + stats[:, cv2.CC_STAT_HEIGHT]],
+            axis=1
+        )
 
-            # Filtro geométrico básico
-            if area < 20 or area > 5000:
-                continue
+        return boxes, centroids[keep]
 
-            component = {
-                "bbox": (x, y, x + w, y + h),
-                "centroid": centroids[i],
-                "height": h,
-                "width": w
+    @staticmethod
+    def find_connected_components(binary: np.ndarray) -> List[Dict]:
+        boxes, centroids = TextDetector.connected_component_arrays(binary)
+
+        return [
+            {
+                "bbox": tuple(box),
+                "centroid": centroid,
+                "height": box[3] - box[1],
+                "width": box[2] - box[0]
             }
+            for box, centroid in zip(boxes, centroids)
+        ]
 
-            components.append(component)
+    @staticmethod
+    def group_lines_by_centroid(center_y: np.ndarray, y_threshold=10) -> List[np.ndarray]:
+        """
+        Sweep line over components sorted by centroid y.
 
-        return components
+        A component joins the oldest line whose mean y is closer than
+        y_threshold. Components arrive in increasing y, so a line whose mean
+        is y_threshold behind the sweep can never grow again and leaves the
+        active set; only the few lines near the sweep are ever compared.
 
-    @staticmethod
-    def group_components_into_lines(components: List[Dict], y_threshold=10) -> List[List[Dict]]:
-        components = sorted(components, key=lambda c: c["centroid"][1])
+        Returns:
+            Component indexes of every line, in line creation order
+        """
+        order = np.argsort(center_y, kind="stable")
+
+        lines: List[List[int]] = []
+        sums: List[float] = []
+        active: List[int] = []
 
-        lines = []
+        for idx in order.tolist():
+            y = float(center_y[idx])
+            target = None
+            still_active = []
 
-        for comp in components:
-            placed = False
+            for line_idx in active:
+                mean = sums[line_idx] / len(lines[line_idx])
+                if y - mean >= y_threshold:
+                    continue
 
-            for line in lines:
-                avg_y = np.mean([c["centroid"][1] for c in line])
-                if abs(comp["centroid"][1] - avg_y) < y_threshold:
-                    line.append(comp)
-                    placed = True
-                    break
+                still_active.append(line_idx)
+                if target is None:
+                    target = line_idx
 
-            if not placed:
-                lines.append([comp])
+            if target is None:
+                target = len(lines)
+                lines.append([])
+                sums.append(0.0)
+                still_active.append(target)
 
-        return lines
+            lines[target].append(idx)
+            sums[target] += y
+            active = still_active
+
+        return [np.asarray(line, dtype=np.intp) for line in lines]
 
     @staticmethod
-    def group_line_into_words(line: List[Dict], gap_threshold=15) -> List[Dict]:
-        line = sorted(line, key=lambda c: c["bbox"][0])
+    def split_words(boxes: np.ndarray, gap_threshold=15) -> np.ndarray:
+        """
+        Split the boxes of a line in words using the horizontal gaps.
 
-        words = []
-        current_word = [line[0]]
+        Returns:
+            (n_words, 4) array with the bbox of every word, left to right
+        """
+        boxes = boxes[np.argsort(boxes[:, 0], kind="stable")]
 
-        for prev, curr in zip(line, line[1:]):
-            gap = curr["bbox"][0] - prev["bbox"][2]
+        gaps = boxes[1:, 0] - boxes[:-1, 2]
+        starts = np.concatenate(([0], np.flatnonzero(gaps >= gap_threshold) + 1))
 
-            if gap < gap_threshold:
-                current_word.append(curr)
-            else:
-                words.append(current_word)
-                current_word = [curr]
+        return np.stack([
+            np.minimum.reduceat(boxes[:, 0], starts),
+            np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts),
+            np.maximum.reduceat(boxes[:, 3], starts),
+        ], axis=1)
 
-        words.append(current_word)
+    @staticmethod
+    def group_components_into_lines(components: List[Dict], y_threshold=10) -> List[List[Dict]]:
+        if not components:
+            return []
 
-        word_bboxes = []
+        center_y = np.array([c["centroid"][1] for c in components], dtype=np.float64)
+        lines = TextDetector.group_lines_by_centroid(center_y, y_threshold)
 
-        for word_id, word in enumerate(words, start=1):
-            xs = [c["bbox"][0] for c in word] + [c["bbox"][2] for c in word]
-            ys = [c["bbox"][1] for c in word] + [c["bbox"][3] for c in word]
+        return [[components[i] for i in line] for line in lines]
 
-            word_bboxes.append({
-                "word_id": word_id,
-                "bbox": (min(xs), min(ys), max(xs), max(ys))
-            })
+    @staticmethod
+    def group_line_into_words(line: List[Dict], gap_threshold=15) -> List[Dict]:
+        boxes = np.array([c["bbox"] for c in line])
+        word_boxes = TextDetector.split_words(boxes, gap_threshold)
 
-        return word_bboxes
+        return [
+            {
+                "word_id": word_id,
+                "bbox": tuple(box)
+            }
+            for word_id, box in enumerate(word_boxes.tolist(), start=1)
+        ]
 
-    def detect_text_in_region(self, img: np.ndarray, region_bbox) -> Dict:
+    def detect_text_in_region(self, img: np.ndarray, region_bbox,
+                              area_bounds: Tuple[float, float] = (MIN_COMPONENT_AREA, MAX_COMPONENT_AREA)) -> Dict:
         x1, y1, x2, y2 = region_bbox
         region = img[y1:y2, x1:x2]
 
@@ -115,36 +188,121 @@ class TextDetector:
         binary = self.adaptive_binarization(gray)
         binary = self.remove_noise(binary)
 
-        components = self.find_connected_components(binary)
-        lines_components = self.group_components_into_lines(components)
+        boxes, centroids = self.connected_component_arrays(binary, *area_bounds)
+        if len(boxes) == 0:
+            return {"lines": []}
 
+        offset = np.array([x1, y1, x1, y1])
         lines_output = []
 
-        for line_id, line in enumerate(lines_components, start=1):
-            words = self.group_line_into_words(line)
-
-            xs = [c["bbox"][0] for c in line] + [c["bbox"][2] for c in line]
-            ys = [c["bbox"][1] for c in line] + [c["bbox"][3] for c in line]
+        for line_id, line in enumerate(self.group_lines_by_centroid(centroids[:, 1]), start=1):
+            line_boxes = boxes[line]
+            words = self.split_words(line_boxes) + offset
 
             line_bbox = (
-                min(xs) + x1,
-                min(ys) + y1,
-                max(xs) + x1,
-                max(ys) + y1
+                int(line_boxes[:, 0].min()) + x1,
+                int(line_boxes[:, 1].min()) + y1,
+                int(line_boxes[:, 2].max()) + x1,
+                int(line_boxes[:, 3].max()) + y1
             )
 
-            for w in words:
-                w["bbox"] = (
-                    w["bbox"][0] + x1,
-                    w["bbox"][1] + y1,
-                    w["bbox"][2] + x1,
-                    w["bbox"][3] + y1
-                )
-
             lines_output.append({
                 "line_id": line_id,
                 "bbox": line_bbox,
-                "words": words
+                "num_components": len(line),
+                "num_aligned": self.aligned_components(line_boxes, centroids[line, 1]),
+                "glyph_height": int(np.median(line_boxes[:, 3] - line_boxes[:, 1])),
+                "words": [
+                    {"word_id": word_id, "bbox": tuple(box)}
+                    for word_id, box in enumerate(words.tolist(), start=1)
+                ]
             })
 
         return {"lines": lines_output}
+
+    @classmethod
+    def aligned_components(cls, boxes: np.ndarray, center_y: np.ndarray) -> int:
+        """
+        Length of the longest run of glyph sized, vertically aligned and
+        horizontally adjacent components of a line. Scattered specks of
+        noise grouped in the same band do not form such a run
+        """
+        heights = boxes[:, 3] - boxes[:, 1]
+        height = float(np.median(heights))
+        low, high = cls.GLYPH_HEIGHT_RANGE
+
+        glyph = (heights >= low * height) & (heights <= high * height)
+        glyph &= np.abs(center_y - np.median(center_y[glyph])) <= cls.ALIGN_TOLERANCE * height
+        if not glyph.any():
+            return 0
+
+        glyphs = boxes[glyph]
+        glyphs = glyphs[np.argsort(glyphs[:, 0], kind="stable")]
+        gaps = glyphs[1:, 0] - glyphs[:-1, 2]
+        breaks = np.flatnonzero(gaps > cls.MAX_GAP_RATIO * height)
+
+        runs = np.diff(np.concatenate(([0], breaks + 1, [len(glyphs)])))
+        return int(runs.max())
+
+    def crop_area_bounds(self, crop_height: int) -> Tuple[float, float]:
+        scale = (crop_height / self.REFERENCE_CROP_HEIGHT_PX) ** 2
+        # small crops keep small glyphs, large ones keep large glyphs
+        return (
+            self.MIN_COMPONENT_AREA * min(scale, 1.0),
+            self.MAX_COMPONENT_AREA * max(scale, 1.0),
+        )
+
+    def has_text_line(self, line: Dict, crop_height: int) -> bool:
+        if line["num_aligned"] >= self.MIN_TEXT_COMPONENTS:
+            return True
+
+        # short values of a single glyph or two
+        return line["num_aligned"] > 0 and line["glyph_height"] >= self.MIN_GLYPH_HEIGHT_RATIO * crop_height
+
+    def find_text_bbox(self, img: np.ndarray, upscale: float = 1.0) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Cheap text presence check for an OCR crop.
+
+        Args:
+            img: Crop as cut from the page
+            upscale: Resize the OCR profile applies to the crop. Detection
+                runs on the crop at that size, tiny glyphs do not survive
+                the noise removal at their original size
+
+        Returns:
+            Bbox enclosing the text lines (with padding) in img pixels,
+            or None when no line of aligned glyphs is found
+        """
+        h, w = img.shape[:2]
+
+        if upscale != 1.0:
+            scaled = cv2.resize(img, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+            bbox = self.find_text_bbox(scaled)
+            if bbox is None:
+                return None
+
+            x1, y1, x2, y2 = bbox
+            return (
+                int(x1 / upscale),
+                int(y1 / upscale),
+                min(w, int(np.ceil(x2 / upscale))),
+                min(h, int(np.ceil(y2 / upscale)))
+            )
+        lines = self.detect_text_in_region(img, (0, 0, w, h), self.crop_area_bounds(h))["lines"]
+
+        lines = [line for line in lines if self.has_text_line(line, h)]
+        if not lines:
+            return None
+
+        pad = self.TIGHT_PADDING_PX
+        x1 = min(line["bbox"][0] for line in lines)
+        y1 = min(line["bbox"][1] for line in lines)
+        x2 = max(line["bbox"][2] for line in lines)
+        y2 = max(line["bbox"][3] for line in lines)
+
+        return (
+            max(0, x1 - pad),
+            max(0, y1 - pad),
+            min(w, x2 + pad),
+            min(h, y2 + pad)
+        )
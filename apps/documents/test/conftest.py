@@ -0,0 +1,37 @@
+import pytest
+
+from src.services import post_asignment_processor
+from src.services.page_cache import page_cache, page_text_cache
+from src.services.semantic_asignation import SemanticAsignation
+from .helpers.stub_service import StubService
+
+
+@pytest.fixture(scope="session")
+def layouts():
+    return SemanticAsignation()
+
+
+@pytest.fixture
+def tesseract_calls(monkeypatch):
+    calls = []
+
+    def image_to_string(img, config=""):
+        calls.append(img.shape)
+        return f"text {len(calls)}"
+
+    monkeypatch.setattr(post_asignment_processor.pytesseract, "image_to_string", image_to_string)
+    post_asignment_processor.ocr_cache.memory.clear()
+    page_cache.memory.clear()
+    page_text_cache.memory.clear()
+    return calls
+
+
+@pytest.fixture
+def stub_service(layouts):
+    """
+    Build a StubService sharing the loaded layouts
+    """
+    def make(**options):
+        return StubService(layouts, **options)
+
+    return make
@@ -0,0 +1,156 @@
+import copy
+from datetime import datetime
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+
+BSON_TYPES = {"array": list, "string": str, "bool": bool, "date": datetime}
+
+OPERATORS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+    "$in": lambda value, arg: value in arg,
+    "$exists": lambda value, arg: (value is not None) == arg,
+    "$type": lambda value, arg: isinstance(value, BSON_TYPES[arg]),
+}
+
+
+def get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+
+        value = get_path(doc, key)
+
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(OPERATORS[op](value, arg) for op, arg in condition.items()):
+                return False
+        elif value != condition:
+            return False
+
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+
+    included = {k for k, v in projection.items() if v}
+    if included:
+        result = {k: copy.deepcopy(doc[k]) for k in included if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+
+    return {k: copy.deepcopy(v) for k, v in doc.items() if k not in projection}
+
+
+class FakeCursor:
+
+    def __init__(self, docs, projection=None):
+        self._docs = docs
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=1):
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        for key, direction in reversed(keys):
+            self._docs.sort(
+                key=lambda d: (get_path(d, key) is not None, get_path(d, key)),
+                reverse=direction < 0
+            )
+        return self
+
+    def batch_size(self, count):
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _selected(self):
+        docs = self._docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(d, self._projection) for d in docs]
+
+    async def to_list(self, length=None):
+        docs = self._selected()
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        self._iter = iter(self._selected())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for an AsyncCollection, enough for the repository:
+    equality and comparison filters, projections, sort/skip/limit cursors
+    """
+
+    def __init__(self):
+        self.docs = []
+        self.indexes = []
+
+    async def insert_one(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        ids = [(await self.insert_one(doc)).inserted_id for doc in docs]
+        return SimpleNamespace(inserted_ids=ids)
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
+        docs = await cursor.limit(1).to_list()
+        return docs[0] if docs else None
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([d for d in self.docs if matches(d, query or {})], projection)
+
+    async def count_documents(self, query):
+        return len(self.find(query)._docs)
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not matches(d, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+        return kwargs.get("name", "_".join(f"{k}_{v}" for k, v in keys))
+
+    async def create_indexes(self, models):
+        return [await self.create_index(list(m.document["key"].items()), name=m.document["name"])
+                for m in models]
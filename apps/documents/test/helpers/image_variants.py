@@ -8,6 +8,69 @@ def load_base_image():
         "test/fixtures/cedula_nueva_frontal_base.jpeg"
     )
 
+def synthetic_selfie(width=480, height=640):
+    """
+    BGR face-like drawing with the brightness, contrast and detail of a usable selfie
+    """
+    rng = np.random.default_rng(0)
+    img = np.full((height, width, 3), (90, 120, 150), np.uint8)
+    img = cv2.add(img, rng.integers(0, 40, img.shape, dtype=np.uint8))
+
+    cx, cy = width // 2, int(height * 0.47)
+    cv2.ellipse(img, (cx, cy), (int(width * 0.27), int(height * 0.27)), 0, 0, 360, (140, 170, 210), -1)
+    for dx in (-50, 50):
+        cv2.circle(img, (cx + dx, cy - 40), 18, (40, 40, 40), -1)
+    cv2.ellipse(img, (cx, cy + 80), (50, 20), 0, 0, 180, (60, 60, 120), 6)
+    cv2.rectangle(img, (0, 0), (width, int(height * 0.14)), (30, 30, 30), -1)
+    return img
+
+# normalized fields of synthetic_card: the photo block and one slot per text line
+CARD_PHOTO_FIELD = (0.025, 0.16, 0.35, 0.9)
+CARD_TEXT_FIELDS = [(0.36, 0.14 + i * 0.104, 0.8, 0.244 + i * 0.104) for i in range(8)]
+
+
+def synthetic_card(seed=0, width=1580, height=1000, template_seed=None):
+    """
+    BGR normalized-document-like drawing: header band, photo block with a
+    face and text lines, different for every seed.
+    With a template_seed the colors and line positions come from it and
+    only the text and the face change with the seed
+    """
+    template = np.random.default_rng(seed if template_seed is None else template_seed)
+    rng = np.random.default_rng([seed, 1])
+    img = np.full((height, width, 3), (235, 230, 220), np.uint8)
+
+    color = lambda r, low, high: tuple(int(c) for c in r.integers(low, high, 3))
+    cv2.rectangle(img, (0, 0), (width, int(height * 0.12)), color(template, 0, 255), -1)
+    px1, py1, px2, py2 = 40, int(height * 0.16), int(width * 0.35), int(height * 0.9)
+    cv2.rectangle(img, (px1, py1), (px2, py2), color(template, 60, 200), -1)
+
+    # face: skin, hair, eyes and mouth
+    cx = (px1 + px2) // 2 + int(rng.integers(-20, 20))
+    cy = (py1 + py2) // 2 + int(rng.integers(-20, 20))
+    fw, fh = int(rng.integers(110, 150)), int(rng.integers(150, 200))
+    cv2.ellipse(img, (cx, cy), (fw, fh), 0, 0, 360, color(rng, 90, 230), -1)
+    cv2.ellipse(img, (cx, cy - fh + int(rng.integers(10, 60))), (fw + 10, int(rng.integers(40, 90))),
+                0, 180, 360, color(rng, 0, 90), -1)
+    eye_y, eye_dx = cy - int(rng.integers(20, 60)), int(rng.integers(35, 60))
+    for dx in (-eye_dx, eye_dx):
+        cv2.circle(img, (cx + dx, eye_y), int(rng.integers(8, 16)), (30, 30, 30), -1)
+    cv2.ellipse(img, (cx, cy + int(rng.integers(50, 90))), (int(rng.integers(25, 55)), int(rng.integers(8, 20))),
+                0, 0, 180, color(rng, 40, 140), 6)
+
+    for line in range(8):
+        if template_seed is None:
+            x = int(rng.integers(int(width * 0.38), int(width * 0.7)))
+            y = int(rng.integers(int(height * 0.18), int(height * 0.95)))
+            length = 8
+        else:
+            x = int(width * 0.38)
+            y = int(height * (0.22 + line * 0.104))
+            length = int(rng.integers(5, 12))
+        text = "".join(rng.choice(list("ABCDEFGH0123456789"), length))
+        cv2.putText(img, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (20, 20, 20), 3)
+    return img
+
 def darken(img, factor=0.4):
     arr = np.array(img).astype(np.float32)
     arr *= factor
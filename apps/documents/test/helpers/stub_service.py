@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+from src.document_impl import DocumentService
+from src.document_repo import DocumentsRepository
+from src.services.biometric_processor import BiometricProcessor
+from src.services.document_hash import DocumentDeduplicator
+from src.services.post_asignment_processor import PostAssignmentProcessor
+from .fake_mongo import FakeCollection
+
+
+IMG_SHAPE = (1000, 1580, 3)
+
+LICENCIA = 3
+
+# one group inside "nombre" on the front, one inside "texto" on the back
+GROUPS = {
+    b"front": [{"group_id": 1, "type": "text_block", "regions": [], "bbox": (664, 480, 916, 600)}],
+    b"back": [{"group_id": 1, "type": "text_block", "regions": [], "bbox": (474, 880, 1422, 980)}],
+}
+
+
+class StubService(DocumentService):
+    """
+    DocumentService without models, file stages are synthetic and counted.
+
+    page_seconds: delay of the page stage
+    selfie_error: error the selfie quality gate raises
+    cache_results: keep the full result cache
+    fake_analysis: skip pages and OCR, analyze_document returns a fixed valid result
+    error: error the fake analysis raises
+    phashes: card hashes of every upload, by default each file hashes apart
+    photo_phash: photo field hash of every upload
+    """
+
+    def __init__(self, layouts, page_seconds: float = 0.0, selfie_error: Exception = None,
+                 cache_results: bool = True, fake_analysis: bool = False, error: Exception = None,
+                 phashes: list = None, photo_phash: str = None):
+        self.repo = DocumentsRepository(collection=FakeCollection())
+        self.deduplicator = DocumentDeduplicator(self.repo, ttl_seconds=0)
+        self.structure_validator = layouts
+        self.post_assignment_processor = PostAssignmentProcessor(use_text_prefilter=False)
+        self.page_seconds = page_seconds
+        self.cache_results = cache_results
+        self.fake_analysis = fake_analysis
+        self.error = error
+        self.phashes = phashes
+        self.photo_phash = photo_phash
+        self.pages_loaded = threading.Event()
+        self.processed = []
+        self.analyzed = 0
+
+        if selfie_error is not None:
+            self.biometric = BiometricProcessor.__new__(BiometricProcessor)
+            self.biometric.start_selfie_processing = lambda selfie_bytes: self.reject_selfie(selfie_error)
+
+    def reject_selfie(self, error):
+        def gate():
+            time.sleep(0.02)
+            raise error
+
+        return asyncio.get_running_loop().run_in_executor(None, gate)
+
+    def result_cache_key(self, *args):
+        return super().result_cache_key(*args) if self.cache_results else None
+
+    def process_file(self, file_bytes):
+        self.processed.append(file_bytes)
+        seed = int.from_bytes(file_bytes[-4:].ljust(4, b"\0"), "big")
+        image = np.random.default_rng(seed).integers(0, 255, IMG_SHAPE, dtype=np.uint8)
+        side = b"front" if file_bytes.startswith(b"front") else b"back"
+
+        return [{"image": image, "regions": [], "groups": GROUPS[side]}]
+
+    def load_pages(self, files_bytes):
+        time.sleep(self.page_seconds)
+        if self.fake_analysis:
+            pages = [{"file": file_bytes} for file_bytes in files_bytes]
+        else:
+            pages = super().load_pages(files_bytes)
+        self.pages_loaded.set()
+        return pages
+
+    def card_hashes(self, doc_type_id, pages):
+        if self.phashes is not None:
+            return list(self.phashes), self.photo_phash
+        if self.fake_analysis:
+            # unrelated uploads, far apart
+            return [hashlib.sha256(page["file"]).hexdigest() for page in pages], self.photo_phash
+        return super().card_hashes(doc_type_id, pages)
+
+    def analyze_document(self, doc_type_id, *args, **kwargs):
+        self.analyzed += 1
+        if not self.fake_analysis:
+            return super().analyze_document(doc_type_id, *args, **kwargs)
+        if self.error is not None:
+            raise self.error
+
+        return {
+            "structural_results": {"combined_validation": {"final_score": 0.9}},
+            "enriched_results": {"document_type_id": doc_type_id, "pages": []},
+            "logic_score": 1.0,
+            "doc_face": None,
+        }
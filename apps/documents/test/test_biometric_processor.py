@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import cv2
+import numpy as np
+import pytest
+from src.services import biometric_processor
+from src.services.biometric_processor import BiometricError, BiometricProcessor, FaceDetection
+from src.services.face_engine import FaceEngineConfig
+from src.services.quality_validation import SelfieQualityError
+from .helpers.image_variants import synthetic_selfie
+
+
+class FakeFace:
+    def __init__(self, bbox, det_score):
+        self.bbox = np.array(bbox, dtype=np.float32)
+        self.det_score = det_score
+        self.normed_embedding = None
+
+
+class FakeEngine:
+    """
+    Finds one face in the middle of any image and counts the model calls
+    """
+
+    config = FaceEngineConfig()
+
+    def __init__(self, det_score=0.9):
+        self.det_score = det_score
+        self.detect_calls = 0
+        self.embed_calls = 0
+        self.input_sizes = []
+
+    def detect(self, img, input_size=None):
+        self.detect_calls += 1
+        self.input_sizes.append(input_size)
+        h, w = img.shape[:2]
+        return [FakeFace((w * 0.25, h * 0.25, w * 0.75, h * 0.75), self.det_score)]
+
+    def embed(self, img, face):
+        self.embed_calls += 1
+        face.normed_embedding = np.ones(4, dtype=np.float32) / 2
+        return face.normed_embedding
+
+    def get(self, img):
+        faces = self.detect(img)
+        for face in faces:
+            self.embed(img, face)
+        return faces
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    fake = FakeEngine()
+    monkeypatch.setattr(biometric_processor, "get_face_engine", lambda config=None: fake)
+    biometric_processor.face_cache.memory.clear()
+    return fake
+
+
+def page():
+    return np.full((400, 600, 3), 128, np.uint8)
+
+
+def test_document_face_is_embedded_in_a_single_pass(engine):
+    processor = BiometricProcessor()
+
+    doc_face = asyncio.run(processor.get_face_from_full_image([page()]))
+
+    assert isinstance(doc_face, FaceDetection)
+    assert doc_face.embedding is not None
+    assert (engine.detect_calls, engine.embed_calls) == (1, 1)
+
+    doc_result = processor._redetect_low_confidence(doc_face)
+    assert doc_result is doc_face
+    assert engine.detect_calls == 1
+
+
+def test_low_confidence_document_face_is_detected_again(engine):
+    processor = BiometricProcessor()
+    engine.det_score = 0.3
+    doc_face = asyncio.run(processor.get_face_from_full_image([page()]))
+
+    engine.det_score = 0.8
+    doc_result = processor._redetect_low_confidence(doc_face)
+
+    assert doc_result.confidence == pytest.approx(0.8)
+    assert engine.detect_calls == 2
+
+
+def test_redetection_runs_off_the_event_loop(engine, monkeypatch):
+    processor = BiometricProcessor()
+    engine.det_score = 0.3
+    doc_face = processor.find_document_face([page()])
+    selfie = processor._process_selfie_sync(encoded_selfie())
+    threads = []
+
+    def detect(img, input_size=None):
+        threads.append(threading.current_thread())
+        return FakeEngine.detect(engine, img, input_size)
+
+    monkeypatch.setattr(engine, "detect", detect)
+
+    async def run():
+        selfie_task = asyncio.get_running_loop().create_future()
+        selfie_task.set_result(selfie)
+        return await processor.score_faces(doc_face, selfie_task)
+
+    asyncio.run(run())
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+
+
+def test_face_search_is_restricted_to_the_photo_field(engine):
+    processor = BiometricProcessor()
+    pages = [page(), page()]
+
+    doc_face = asyncio.run(processor.get_face_from_full_image(
+        pages, photo_regions=[(1, (0.5, 0.5, 0.7, 0.8))]
+    ))
+
+    # window = field + 25% margin: x 0.45..0.75, y 0.425..0.875
+    assert engine.detect_calls == 1
+    assert engine.input_sizes == [192]
+    x1, y1, x2, y2 = doc_face.bbox
+    assert 270 <= x1 < x2 <= 450
+    assert 170 <= y1 < y2 <= 350
+
+
+def test_face_search_falls_back_to_full_pages(engine, monkeypatch):
+    processor = BiometricProcessor()
+    found = []
+
+    def detect(img, input_size=None):
+        found.append(input_size)
+        # nothing inside the photo window, face on the full page
+        return [] if input_size else FakeEngine.detect(engine, img)
+
+    monkeypatch.setattr(engine, "detect", detect)
+
+    doc_face = asyncio.run(processor.get_face_from_full_image(
+        [page()], photo_regions=[(0, (0.1, 0.1, 0.3, 0.3))]
+    ))
+
+    assert doc_face is not None
+    assert found == [192, None]
+
+
+def encoded_selfie(img=None):
+    ok, buffer = cv2.imencode(".png", synthetic_selfie() if img is None else img)
+    return buffer.tobytes()
+
+
+def test_selfie_branch_runs_on_a_worker_thread(engine):
+    processor = BiometricProcessor()
+    doc_face = asyncio.run(processor.get_face_from_full_image([page()]))
+
+    async def run():
+        selfie_task = processor.start_selfie_processing(encoded_selfie())
+        # the event loop is free while the selfie is processed
+        await asyncio.sleep(0)
+        return await processor.score_faces(doc_face, selfie_task)
+
+    score = asyncio.run(run())
+
+    assert 0.0 <= score <= 1.0
+    assert engine.embed_calls == 2
+
+
+def test_undecodable_selfie_raises_biometric_error(engine):
+    processor = BiometricProcessor()
+
+    with pytest.raises(BiometricError, match="cannot be decoded"):
+        asyncio.run(processor.verify_biometric(None, b"not an image"))
+
+
+def test_same_selfie_is_served_from_the_face_cache(engine):
+    processor = BiometricProcessor()
+
+    first = processor._process_selfie_sync(encoded_selfie())
+    second = processor._process_selfie_sync(encoded_selfie())
+
+    assert second is first
+    assert (engine.detect_calls, engine.embed_calls) == (1, 1)
+
+
+def test_document_face_is_cached_by_files_hash(engine):
+    processor = BiometricProcessor()
+
+    first = processor.find_document_face([page()], cache_key="1:abc")
+    second = processor.find_document_face([page()], cache_key="1:abc")
+    other = processor.find_document_face([page()], cache_key="2:abc")
+
+    assert second is first
+    assert other is not first
+    assert engine.detect_calls == 2
+
+
+def test_dark_selfie_never_reaches_the_face_model(engine):
+    processor = BiometricProcessor()
+    doc_face = processor.find_document_face([page()])
+    dark = (synthetic_selfie() * 0.25).astype(np.uint8)
+
+    with pytest.raises(SelfieQualityError, match="too dark"):
+        asyncio.run(processor.verify_biometric(doc_face, encoded_selfie(dark)))
+
+    assert engine.detect_calls == 1  # document side only
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import bson
+import numpy as np
+from bson.codec_options import CodecOptions
+
+from src.models.bson_codecs import TYPE_REGISTRY
+from src.models.document import Document
+
+
+def test_numpy_values_are_encoded_by_the_registry():
+    doc = {
+        "int": np.int64(7),
+        "float32": np.float32(0.5),
+        "flag": np.bool_(True),
+        "bbox": (np.int32(1), np.int32(2), 3, 4),
+        "array": np.arange(3),
+        "nested": [{"score": np.float64(0.25)}],
+    }
+
+    decoded = bson.decode(bson.encode(doc, codec_options=CodecOptions(type_registry=TYPE_REGISTRY)))
+
+    assert decoded == {
+        "int": 7, "float32": 0.5, "flag": True, "bbox": [1, 2, 3, 4],
+        "array": [0, 1, 2], "nested": [{"score": 0.25}],
+    }
+    assert type(decoded["int"]) is int and type(decoded["flag"]) is bool
+
+
+def test_to_mongo_does_not_copy_the_metadata():
+    metadata = {"pages": [{"score": np.float64(0.9)}]}
+    document = Document(id="x", user_id="u", doc_type_id="1", metadata=metadata,
+                        file_hash="h", is_valid=True, validated_at=datetime(2024, 1, 1))
+
+    data = document.to_mongo()
+
+    assert "id" not in data
+    assert data["metadata"] is metadata
+    assert data["selfie_hash"] is None
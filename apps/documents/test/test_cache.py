@@ -0,0 +1,54 @@
+import time
+from src.services.cache import LRUCache, TieredCache
+
+
+class DictTier:
+    """In-memory stand-in for the Redis tier"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+
+
+def test_tiered_cache_promotes_remote_hits():
+    remote = DictTier()
+    cache = TieredCache("test_tiered", LRUCache(maxsize=4), remote)
+    remote.set("k", "value")
+
+    assert cache.get("missing") is None
+    assert cache.get("k") == "value"
+    assert cache.memory.get("k") == "value"
+    assert cache.get("k") == "value"
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["remote_hits"] == 1
+    assert stats["misses"] == 1
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from src.document_repo import DocumentsRepository
+from src.services.document_hash import DocumentDeduplicator, hash_files, hash_selfie
+from .helpers.fake_mongo import FakeCollection
+from .test_document_repo import document
+
+
+FILES = [b"front", b"back"]
+
+
+def stored_repo(**overrides):
+    repo = DocumentsRepository(collection=FakeCollection())
+    fields = dict(file_hash=hash_files(FILES), validated_at=datetime.utcnow())
+    fields.update(overrides)
+    asyncio.run(repo.create(document(**fields)))
+    return repo
+
+
+def lookup(dedup, user_id="user-1", doc_type_id="1", selfie_hash=None):
+    return asyncio.run(dedup.find_verdict(user_id, doc_type_id, hash_files(FILES), selfie_hash))
+
+
+def test_resubmission_reuses_the_previous_verdict():
+    dedup = DocumentDeduplicator(stored_repo(is_valid=False))
+
+    verdict = lookup(dedup)
+
+    assert verdict["is_valid"] is False
+    assert verdict["duplicate"] is True
+    assert verdict["document_id"]
+
+
+def test_different_type_or_selfie_is_not_a_duplicate():
+    dedup = DocumentDeduplicator(stored_repo(selfie_hash=hash_selfie(b"selfie")))
+
+    assert lookup(dedup, doc_type_id="2", selfie_hash=hash_selfie(b"selfie")) is None
+    assert lookup(dedup, selfie_hash=hash_selfie(b"other selfie")) is None
+    assert lookup(dedup) is None
+    assert lookup(dedup, selfie_hash=hash_selfie(b"selfie")) is not None
+
+
+def test_verdict_expires_after_the_ttl():
+    repo = stored_repo(validated_at=datetime.utcnow() - timedelta(hours=2))
+
+    assert lookup(DocumentDeduplicator(repo, ttl_seconds=3600)) is None
+    assert lookup(DocumentDeduplicator(repo, ttl_seconds=3 * 3600)) is not None
+    assert lookup(DocumentDeduplicator(repo, ttl_seconds=0)) is None
+
+
+def test_user_scope_hides_other_users_submissions():
+    repo = stored_repo()
+
+    assert lookup(DocumentDeduplicator(repo, scope="user"), user_id="user-2") is None
+    assert lookup(DocumentDeduplicator(repo, scope="global"), user_id="user-2") is not None
+
+
+def test_lookup_is_skipped_while_the_store_is_unavailable():
+    dedup = DocumentDeduplicator(stored_repo(), available=lambda: False)
+
+    assert lookup(dedup) is None
+
+
+def test_failed_lookup_is_a_miss():
+    class BrokenRepo:
+        async def find_recent_verdict(self, **kwargs):
+            raise TimeoutError("server selection timeout")
+
+    assert lookup(DocumentDeduplicator(BrokenRepo())) is None
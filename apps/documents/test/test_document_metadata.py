@@ -0,0 +1,59 @@
+import numpy as np
+
+from src.services.document_metadata import (compact_metadata, compress_trace, decompress_trace,
+                                             should_store_trace)
+
+
+def enriched():
+    region = {"region_id": 1, "bbox": (np.int64(10), np.int64(20), np.int64(90), np.int64(40)),
+              "area": np.int64(1600), "type": "text"}
+    return {
+        "document_type_id": 5,
+        "pages": [{
+            "page": 0,
+            "side": "front",
+            "validation": {
+                "final_score": np.float64(0.812345),
+                "passes": True,
+                "field_details": {
+                    "no_poliza": {"iou": np.float64(0.7), "coverage": np.float64(0.9),
+                                  "spill_penalty": np.float64(0.05), "exists": True},
+                    "codigo_qr": {"iou": 0.0, "coverage": 0.0, "spill_penalty": 0.0, "exists": False},
+                },
+            },
+            "assignated_groups": {
+                "no_poliza": {"bbox": (np.float64(0.1), np.float64(0.2), np.float64(0.5), np.float64(0.3)),
+                              "text": "123456"},
+                "codigo_qr": None,
+            },
+            "assignments": {"no_poliza": [{"group_id": 1, "regions": [region], "bbox": region["bbox"]}]},
+            "img_shape": (1000, 1580, 3),
+        }],
+        "combined_validation": {"final_score": np.float64(0.812345), "page_scores": [np.float64(0.812345)]},
+    }
+
+
+def test_compact_metadata_keeps_fields_and_scores_only():
+    compact = compact_metadata(enriched())
+
+    assert compact["final_score"] == 0.8123
+    page = compact["pages"][0]
+    assert page["score"] == 0.8123 and page["passes"] is True
+    assert page["fields"]["no_poliza"] == {
+        "bbox": [0.1, 0.2, 0.5, 0.3], "text": "123456", "iou": 0.7, "coverage": 0.9, "spill": 0.05
+    }
+    assert page["fields"]["codigo_qr"]["bbox"] is None
+    assert "assignments" not in page and "img_shape" not in page
+    assert all(type(v) is float for v in page["fields"]["no_poliza"]["bbox"])
+
+
+def test_trace_round_trip():
+    trace = decompress_trace(compress_trace(enriched()))
+
+    assert trace["pages"][0]["assignments"]["no_poliza"][0]["regions"][0]["area"] == 1600
+    assert trace["pages"][0]["img_shape"] == [1000, 1580, 3]
+
+
+def test_trace_sampling_rate():
+    assert not should_store_trace(0)
+    assert should_store_trace(1)
@@ -0,0 +1,187 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from src.document_write_buffer import WriteBehindBuffer
+from src.document_repo import DocumentsRepository, InvalidPageTokenError, page_token
+from src.models.document import Document
+from .helpers.fake_mongo import FakeCollection
+
+
+def document(**overrides):
+    fields = dict(
+        id=None,
+        user_id="user-1",
+        doc_type_id="1",
+        metadata={"pages": []},
+        file_hash="abc",
+        is_valid=True,
+        validated_at=datetime(2024, 1, 1),
+    )
+    fields.update(overrides)
+    return Document(**fields)
+
+
+def test_created_document_is_found_by_id():
+    repo = DocumentsRepository(collection=FakeCollection())
+
+    async def run():
+        doc_id = await repo.create(document())
+        return doc_id, await repo.get_by_id(doc_id)
+
+    doc_id, stored = asyncio.run(run())
+
+    assert str(stored["_id"]) == doc_id
+    assert stored["file_hash"] == "abc"
+
+
+def test_unknown_or_malformed_id_returns_none():
+    repo = DocumentsRepository(collection=FakeCollection())
+
+    assert asyncio.run(repo.get_by_id("not-an-object-id")) is None
+    assert asyncio.run(repo.get_by_id("0123456789abcdef01234567")) is None
+
+
+def stored(docs):
+    repo = DocumentsRepository(collection=FakeCollection())
+    for doc in docs:
+        asyncio.run(repo.create(doc))
+    return repo
+
+
+def collect(stream):
+    async def run():
+        return [doc async for doc in stream]
+    return asyncio.run(run())
+
+
+def test_indexes_are_declared():
+    collection = FakeCollection()
+    asyncio.run(DocumentsRepository(collection=collection).ensure_indexes())
+
+    names = [kwargs["name"] for _, kwargs in collection.indexes]
+    assert names == ["dedup_lookup", "user_validated_at", "type_validity_validated_at", "phash_validated_at"]
+
+
+def test_latest_valid_document_per_user():
+    repo = stored([
+        document(validated_at=datetime(2024, 1, 1)),
+        document(validated_at=datetime(2024, 3, 1)),
+        document(validated_at=datetime(2024, 5, 1), is_valid=False),
+        document(validated_at=datetime(2024, 6, 1), user_id="user-2"),
+    ])
+
+    latest = asyncio.run(repo.latest_valid_for_user("user-1"))
+
+    assert latest["validated_at"] == datetime(2024, 3, 1)
+    assert "metadata" not in latest
+
+
+def test_documents_by_type_in_a_date_range_are_paginated():
+    repo = stored([
+        document(validated_at=datetime(2024, month, 1), doc_type_id="1" if month % 2 else "2")
+        for month in range(1, 13)
+    ])
+
+    first = collect(repo.find_by_type("1", datetime(2024, 2, 1), datetime(2024, 12, 1), limit=2))
+    rest = collect(repo.find_by_type("1", datetime(2024, 2, 1), datetime(2024, 12, 1),
+                                     after=page_token(first[-1])))
+
+    months = [doc["validated_at"].month for doc in first + rest]
+    assert months == [11, 9, 7, 5, 3]
+    assert set(first[0]) == {"_id", "user_id", "doc_type_id", "is_valid", "validated_at", "file_hash"}
+
+
+def test_malformed_page_token_is_rejected():
+    repo = stored([document()])
+
+    with pytest.raises(InvalidPageTokenError):
+        collect(repo.find_documents(after="yesterday"))
+
+
+class SlowCollection(FakeCollection):
+    """Counts insert_many calls, optionally failing some documents"""
+
+    def __init__(self, fail_index=None):
+        super().__init__()
+        self.batches = []
+        self.fail_index = fail_index
+
+    async def insert_many(self, docs, ordered=True):
+        self.batches.append(len(docs))
+        await asyncio.sleep(0.01)
+        if self.fail_index is not None:
+            ok = [d for i, d in enumerate(docs) if i != self.fail_index]
+            await super().insert_many(ok)
+            raise BulkWriteError({"writeErrors": [{"index": self.fail_index, "code": 11000,
+                                                    "errmsg": "duplicate key"}]})
+        return await super().insert_many(docs)
+
+
+def test_ack_mode_groups_concurrent_creates_in_one_bulk_insert():
+    collection = SlowCollection()
+
+    async def run():
+        buffer = WriteBehindBuffer(collection, max_batch=50, flush_interval=0.05)
+        repo = DocumentsRepository(collection=collection, write_mode="ack", write_buffer=buffer)
+        ids = await asyncio.gather(*(repo.create(document(file_hash=str(i))) for i in range(10)))
+        await buffer.close()
+        return ids
+
+    ids = asyncio.run(run())
+
+    assert collection.batches == [10]
+    assert sorted(str(d["_id"]) for d in collection.docs) == sorted(ids)
+
+
+def test_async_mode_returns_before_the_write_and_close_flushes():
+    collection = SlowCollection()
+
+    async def run():
+        buffer = WriteBehindBuffer(collection, max_batch=50, flush_interval=10)
+        repo = DocumentsRepository(collection=collection, write_mode="async", write_buffer=buffer)
+        doc_id = await repo.create(document())
+        pending = len(collection.docs)
+        await buffer.close()
+        return doc_id, pending
+
+    doc_id, pending = asyncio.run(run())
+
+    assert pending == 0
+    assert [str(d["_id"]) for d in collection.docs] == [doc_id]
+
+
+def test_full_buffer_blocks_new_documents():
+    collection = SlowCollection()
+
+    async def run():
+        buffer = WriteBehindBuffer(collection, max_batch=1, flush_interval=0, max_pending=1)
+        first = await buffer.submit({"_id": 1})
+        second = await buffer.submit({"_id": 2})
+        third = asyncio.create_task(buffer.submit({"_id": 3}))
+        await asyncio.sleep(0)
+        blocked = not third.done()
+        await asyncio.gather(first, second, await third)
+        await buffer.close()
+        return blocked
+
+    assert asyncio.run(run()) is True
+    assert collection.batches == [1, 1, 1]
+
+
+def test_only_the_failed_document_gets_the_bulk_error():
+    collection = SlowCollection(fail_index=1)
+
+    async def run():
+        buffer = WriteBehindBuffer(collection, max_batch=3, flush_interval=0.05)
+        futures = [await buffer.submit({"_id": i}) for i in range(3)]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        await buffer.close()
+        return results
+
+    results = asyncio.run(run())
+
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], BulkWriteError)
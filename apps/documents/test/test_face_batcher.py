@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.services.face_batcher import FaceEmbeddingBatcher
+
+
+class FakeRecognizer:
+    def __init__(self, fail=False):
+        self.batch_sizes = []
+        self.fail = fail
+
+    def get_feat(self, imgs):
+        self.batch_sizes.append(len(imgs))
+        if self.fail:
+            raise RuntimeError("onnx failed")
+        # embedding = mean pixel value, so every caller can check its own result
+        return np.array([[img.mean(), 1.0] for img in imgs], dtype=np.float32)
+
+
+def crop(value):
+    return np.full((112, 112, 3), value, dtype=np.uint8)
+
+
+def test_concurrent_crops_are_embedded_in_one_batch():
+    recognizer = FakeRecognizer()
+    batcher = FaceEmbeddingBatcher(recognizer, max_batch=8, max_wait_ms=200)
+
+    futures = [batcher.submit(crop(v)) for v in range(4)]
+    results = [f.result(timeout=2) for f in futures]
+    batcher.close()
+
+    assert recognizer.batch_sizes == [4]
+    assert [r[0] for r in results] == [0, 1, 2, 3]
+    assert results[0].shape == (2,)
+
+
+def test_full_batch_does_not_wait_for_the_window():
+    recognizer = FakeRecognizer()
+    batcher = FaceEmbeddingBatcher(recognizer, max_batch=2, max_wait_ms=10_000)
+
+    futures = [batcher.submit(crop(v)) for v in range(5)]
+    for f in futures[:4]:
+        f.result(timeout=2)
+    batcher.close()
+
+    assert recognizer.batch_sizes[:2] == [2, 2]
+    assert futures[4].result(timeout=2)[0] == 4
+
+
+def test_requests_from_several_threads_get_their_own_embedding():
+    recognizer = FakeRecognizer()
+    batcher = FaceEmbeddingBatcher(recognizer, max_batch=16, max_wait_ms=5)
+    results = {}
+
+    def request(value):
+        results[value] = batcher.embed(crop(value))[0]
+
+    threads = [threading.Thread(target=request, args=(v,)) for v in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {v: v for v in range(20)}
+    assert sum(recognizer.batch_sizes) == 20
+
+
+def test_recognizer_error_reaches_every_request():
+    batcher = FaceEmbeddingBatcher(FakeRecognizer(fail=True), max_batch=4, max_wait_ms=50)
+
+    futures = [batcher.submit(crop(v)) for v in range(2)]
+    for f in futures:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=2)
+    batcher.close()
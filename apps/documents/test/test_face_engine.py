@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.services.face_engine import FaceEngine, FaceEngineConfig, quantized_name
+
+
+def test_quantized_mode_loads_the_int8_files(monkeypatch):
+    monkeypatch.setenv("FACE_QUANTIZED", "1")
+    config = FaceEngineConfig.from_env()
+
+    assert quantized_name("det_10g.onnx") == "det_10g.int8.onnx"
+    assert (config.det_file, config.rec_file) == ("det_10g.int8.onnx", "w600k_r50.int8.onnx")
+
+
+def test_quantized_embeddings_are_a_different_model():
+    float_config = FaceEngineConfig()
+    int8_config = FaceEngineConfig(quantized=True)
+
+    assert float_config.rec_file == "w600k_r50.onnx"
+    assert float_config.recognition_model != int8_config.recognition_model
+
+
+class StubSession:
+    """
+    onnxruntime session with the input and output shapes of the real model,
+    outputs come from a function of the input blob
+    """
+
+    def __init__(self, input_shape, outputs, run):
+        self.input_shape = input_shape
+        self.outputs = outputs
+        self._run = run
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input.1", shape=self.input_shape)]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name=name, shape=shape) for name, shape in self.outputs]
+
+    def set_providers(self, providers):
+        pass
+
+    def run(self, output_names, feed):
+        blob = feed["input.1"]
+        self.batch_sizes.append(blob.shape[0])
+        return self._run(blob)
+
+
+STRIDES = (8, 16, 32)
+ANCHORS = 2
+# one face centred at (320, 320) of a 640 px input, found at stride 32
+FACE_CENTER = (10, 10)
+FACE_BOX = (256, 256, 384, 384)
+FACE_SCORE = 0.9
+# eyes, nose and mouth corners relative to the centre, in pixels
+FACE_KPS = [(-24, -16), (24, -16), (0, 8), (-20, 32), (20, 32)]
+EMBEDDING_SIZE = 512
+
+
+def detector_session():
+    def run(blob):
+        height, width = blob.shape[2:]
+        scores, boxes, kpss = [], [], []
+
+        for stride in STRIDES:
+            anchors = (height // stride) * (width // stride) * ANCHORS
+            score = np.zeros((anchors, 1), np.float32)
+            box = np.zeros((anchors, 4), np.float32)
+            kps = np.zeros((anchors, 10), np.float32)
+
+            if stride == 32:
+                x, y = FACE_CENTER
+                idx = (y * (width // stride) + x) * ANCHORS
+                cx, cy = x * stride, y * stride
+                score[idx] = FACE_SCORE
+                x1, y1, x2, y2 = FACE_BOX
+                box[idx] = np.array([cx - x1, cy - y1, x2 - cx, y2 - cy]) / stride
+                kps[idx] = np.array(FACE_KPS).flatten() / stride
+
+            scores.append(score)
+            boxes.append(box)
+            kpss.append(kps)
+
+        return scores + boxes + kpss
+
+    outputs = [(f"score_{s}", ["?", 1]) for s in STRIDES] \
+        + [(f"bbox_{s}", ["?", 4]) for s in STRIDES] \
+        + [(f"kps_{s}", ["?", 10]) for s in STRIDES]
+    return StubSession([1, 3, "?", "?"], outputs, run)
+
+
+def recognizer_session():
+    def run(blob):
+        return [np.ones((blob.shape[0], EMBEDDING_SIZE), np.float32)]
+
+    return StubSession(["None", 3, 112, 112], [("683", [1, EMBEDDING_SIZE])], run)
+
+
+@pytest.fixture
+def stub_models(tmp_path, monkeypatch):
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("insightface")
+
+    config = FaceEngineConfig()
+    (tmp_path / config.det_file).write_bytes(b"")
+    # ArcFaceONNX reads the graph to pick its input normalization
+    graph = onnx.helper.make_graph(
+        [onnx.helper.make_node("Identity", ["input.1"], ["683"], name="Identity_0")], "rec",
+        [onnx.helper.make_tensor_value_info("input.1", onnx.TensorProto.FLOAT, [None, 3, 112, 112])],
+        [onnx.helper.make_tensor_value_info("683", onnx.TensorProto.FLOAT, [None, EMBEDDING_SIZE])],
+    )
+    onnx.save(onnx.helper.make_model(graph), str(tmp_path / config.rec_file))
+
+    sessions = {config.det_file: detector_session(), config.rec_file: recognizer_session()}
+    monkeypatch.setattr(FaceEngine, "_model_dir", lambda self: tmp_path)
+    monkeypatch.setattr(FaceEngine, "_session", lambda self, model_file: sessions[model_file.name])
+    return sessions
+
+
+@pytest.mark.parametrize("batch_max_size", [1, 4])
+def test_engine_decodes_boxes_and_embeddings_of_the_sessions(stub_models, batch_max_size):
+    engine = FaceEngine(FaceEngineConfig(batch_max_size=batch_max_size, ctx_id=-1))
+    img = np.zeros((640, 640, 3), np.uint8)
+
+    faces = engine.get(img)
+
+    assert len(faces) == 1
+    assert faces[0].bbox == pytest.approx(FACE_BOX)
+    assert float(faces[0].det_score) == pytest.approx(FACE_SCORE)
+    assert faces[0].kps.shape == (5, 2)
+    assert faces[0].embedding.shape == (EMBEDDING_SIZE,)
+    assert faces[0].normed_embedding == pytest.approx(np.full(EMBEDDING_SIZE, EMBEDDING_SIZE ** -0.5))
+    assert stub_models[engine.config.rec_file].batch_sizes == [1]
+
+    if engine.batcher is not None:
+        engine.batcher.close()
+
+
+def test_boxes_are_scaled_back_to_the_image(stub_models):
+    engine = FaceEngine(FaceEngineConfig(batch_max_size=1, ctx_id=-1))
+    # half size image: the detector sees it resized to 640
+    faces = engine.detect(np.zeros((320, 320, 3), np.uint8))
+
+    assert faces[0].bbox == pytest.approx([v / 2 for v in FACE_BOX])
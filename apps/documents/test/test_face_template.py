@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet
+
+from src.services.biometric_processor import BiometricError, FaceDetection
+from src.services.face_template import FaceTemplateCodec
+
+
+MODEL = "buffalo_l/w600k_r50.onnx"
+
+
+def face():
+    embedding = np.linspace(-1, 1, 512).astype(np.float32)
+    return FaceDetection(bbox=(10, 20, 110, 140), confidence=0.87, embedding=embedding)
+
+
+def test_template_round_trip():
+    codec = FaceTemplateCodec(MODEL, key="")
+    template = codec.encode(face())
+
+    assert template["encrypted"] is False
+    restored = codec.decode(template)
+
+    np.testing.assert_array_equal(restored.embedding, face().embedding)
+    assert restored.bbox == (10, 20, 110, 140)
+    assert restored.confidence == pytest.approx(0.87)
+    assert restored.image is None
+
+
+def test_encrypted_template_needs_the_key():
+    key = Fernet.generate_key().decode()
+    template = FaceTemplateCodec(MODEL, key=key).encode(face())
+
+    assert template["encrypted"] is True
+    assert template["embedding"] != face().embedding.tobytes()
+
+    restored = FaceTemplateCodec(MODEL, key=key).decode(template)
+    np.testing.assert_array_equal(restored.embedding, face().embedding)
+
+    with pytest.raises(BiometricError, match="no key"):
+        FaceTemplateCodec(MODEL, key="").decode(template)
+
+    with pytest.raises(BiometricError, match="decrypted"):
+        FaceTemplateCodec(MODEL, key=Fernet.generate_key().decode()).decode(template)
+
+
+def test_template_of_another_model_is_rejected():
+    template = FaceTemplateCodec("antelopev2/glintr100.onnx", key="").encode(face())
+
+    with pytest.raises(BiometricError, match="another model"):
+        FaceTemplateCodec(MODEL, key="").decode(template)
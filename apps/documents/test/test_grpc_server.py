@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+import grpc
+import pytest
+
+# the generated stubs import each other as top level modules (see main.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "generated"))
+
+import grpc_server  # noqa: E402
+from generated import documents_pb2  # noqa: E402
+from src.document_repo import DocumentsRepository, parse_timestamp  # noqa: E402
+from .helpers.fake_mongo import FakeCollection  # noqa: E402
+from .test_document_repo import document  # noqa: E402
+
+
+class Aborted(Exception):
+    pass
+
+
+class FakeContext:
+
+    def __init__(self):
+        self.code = None
+
+    async def abort(self, code, details):
+        self.code = code
+        raise Aborted(details)
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    repo = DocumentsRepository(collection=FakeCollection())
+    for hour in range(6):
+        asyncio.run(repo.create(document(validated_at=datetime(2024, 1, 1, hour))))
+
+    monkeypatch.setattr(grpc_server, "DocumentsRepository", lambda: repo)
+    return repo
+
+
+def list_documents(context=None, **fields):
+    server = grpc_server.DocumentGrpcServer()
+    request = documents_pb2.ListDocumentsRequest(**fields)
+
+    async def run():
+        return [doc async for doc in server.ListDocuments(request, context or FakeContext())]
+
+    return asyncio.run(run())
+
+
+def test_timestamps_are_read_as_utc():
+    utc = datetime(2024, 1, 1, 2, tzinfo=timezone.utc)
+
+    assert parse_timestamp("2024-01-01T02:00:00Z") == utc
+    assert parse_timestamp("2024-01-01T02:00:00.000Z") == utc
+    assert parse_timestamp("2024-01-01T02:00:00") == utc
+    assert parse_timestamp("2024-01-01T04:00:00+02:00") == utc
+    assert parse_timestamp("2024-01-01T04:00:00+02:00").tzinfo == timezone.utc
+
+
+def test_range_accepts_the_z_suffix_and_offsets(repo):
+    docs = list_documents(validated_from="2024-01-01T02:00:00Z", validated_to="2024-01-01T06:00:00+02:00")
+
+    # 02:00 UTC inclusive to 04:00 UTC exclusive
+    assert [doc.validated_at for doc in docs] == [
+        "2024-01-01T03:00:00+00:00",
+        "2024-01-01T02:00:00+00:00",
+    ]
+
+
+@pytest.mark.parametrize("field", ["validated_from", "validated_to"])
+def test_malformed_timestamp_is_an_invalid_argument(repo, field):
+    context = FakeContext()
+
+    with pytest.raises(Aborted, match="Invalid timestamp"):
+        list_documents(context, **{field: "yesterday"})
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+
+
+class ReadyService:
+
+    async def verify_selfie(self, user_id, document_id, selfie_bytes):
+        return {"is_match": True, "score": 0.9}
+
+
+def test_requests_are_unavailable_until_the_pipeline_is_warm(monkeypatch):
+    built = []
+    monkeypatch.setattr(grpc_server, "DocumentService", lambda: built.append(1) or ReadyService())
+    server = grpc_server.DocumentGrpcServer()
+    request = documents_pb2.SelfieVerificationRequest(user_id="u", document_id="d", selfie=b"x")
+    context = FakeContext()
+
+    with pytest.raises(Aborted, match="warming up"):
+        asyncio.run(server.VerifySelfie(request, context))
+    assert context.code == grpc.StatusCode.UNAVAILABLE
+    assert built == []
+
+    asyncio.run(server.warm_up())
+    first = asyncio.run(server.VerifySelfie(request, FakeContext()))
+    asyncio.run(server.VerifySelfie(request, FakeContext()))
+
+    assert first.is_match
+    assert built == [1]
@@ -0,0 +1,65 @@
+import asyncio
+
+from src import mongo_client
+from src.mongo_client import MongoConnection
+
+
+class FakeClient:
+    """Fails the first failures pings, then answers"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.pings = 0
+        self.admin = self
+
+    async def command(self, name):
+        self.pings += 1
+        if self.pings <= self.failures:
+            raise ConnectionError("connection refused")
+        return {"ok": 1}
+
+    def __getitem__(self, name):
+        return {"name": name}
+
+    async def close(self):
+        pass
+
+
+def test_client_is_created_on_first_use():
+    created = []
+    connection = MongoConnection(client_factory=lambda url: created.append(url) or FakeClient(0))
+
+    assert created == [] and connection.status == "idle"
+    assert connection.db == {"name": "documents_db"}
+    assert len(created) == 1
+
+
+def test_readiness_check_retries_in_the_background(monkeypatch):
+    monkeypatch.setattr(mongo_client, "MONGO_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(mongo_client, "MONGO_HEALTH_INTERVAL", 10)
+    client = FakeClient(failures=2)
+    connection = MongoConnection(client_factory=lambda url: client)
+    ready_calls = []
+
+    async def on_ready():
+        ready_calls.append(connection.status)
+
+    async def wait_for_status(status):
+        for _ in range(100):
+            if connection.status == status:
+                break
+            await asyncio.sleep(0.01)
+        return connection.health()
+
+    async def run():
+        connection.start_readiness_check(on_ready)
+        statuses = [await wait_for_status("unavailable"), await wait_for_status("ready")]
+        await connection.close()
+        return statuses
+
+    before, after = asyncio.run(run())
+
+    assert before == {"status": "unavailable", "error": "connection refused"}
+    assert after == {"status": "ready", "error": ""}
+    assert ready_calls == ["ready"]
+    assert client.pings == 3
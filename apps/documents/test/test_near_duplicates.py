@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from src.document_repo import DocumentsRepository
+from src.services.metrics import metrics
+from src.services.near_duplicates import NearDuplicateIndex, near_duplicates
+from .helpers.fake_mongo import FakeCollection
+from .test_document_repo import document
+
+
+FRONT = "f0" * 32
+BACK = "0123456789abcdef" * 4
+PHOTO = "0f0f0f0f0f0f0f0f"
+
+
+def near(hex_hash, bits):
+    return f"{int(hex_hash, 16) ^ ((1 << bits) - 1):0{len(hex_hash)}x}"
+
+
+def stored(index, user_id="user-1", phash=(FRONT, BACK), doc_type_id="1", selfie_hash=None,
+           validated_at=None, is_valid=True, photo_phash=PHOTO):
+    doc = {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "doc_type_id": doc_type_id,
+        "is_valid": is_valid,
+        "selfie_hash": selfie_hash,
+        "validated_at": validated_at or datetime.utcnow(),
+        "phash": list(phash),
+        "photo_phash": photo_phash,
+    }
+    index.add(doc)
+    return str(doc["_id"])
+
+
+def test_every_page_must_be_close():
+    index = NearDuplicateIndex(max_distance=8)
+    document_id = stored(index)
+
+    assert [m["document_id"] for m in index.find([near(FRONT, 3), near(BACK, 5)])] == [document_id]
+    assert index.find([near(FRONT, 3), near(BACK, 12)]) == []
+    assert index.find([FRONT]) == []
+    assert index.find([FRONT, BACK], doc_type_id="2") == []
+
+
+def test_whole_page_hashes_of_earlier_versions_are_ignored():
+    index = NearDuplicateIndex()
+    stored(index, phash=("f0f0f0f0f0f0f0f0", "0123456789abcdef"))
+
+    assert len(index) == 0
+
+
+def test_matches_are_sorted_by_their_worst_page():
+    index = NearDuplicateIndex(max_distance=8)
+    far = stored(index, phash=(near(FRONT, 1), near(BACK, 7)))
+    close = stored(index, phash=(near(FRONT, 2), near(BACK, 2)))
+
+    matches = index.find([FRONT, BACK])
+
+    assert [(m["document_id"], m["distance"]) for m in matches] == [(close, 2), (far, 7)]
+
+
+def test_only_a_close_recent_upload_of_the_same_user_selfie_and_photo_is_reused():
+    index = NearDuplicateIndex(max_distance=8, reuse_distance=4, ttl_seconds=3600, photo_reuse_distance=4)
+    mine = stored(index, selfie_hash="selfie")
+    stored(index, user_id="user-2", selfie_hash="selfie")
+
+    def reused(phash=(FRONT, BACK), user_id="user-1", selfie_hash="selfie", photo_phash=PHOTO):
+        match = index.reusable(index.find(list(phash)), user_id, selfie_hash, photo_phash)
+        return match and match["document_id"]
+
+    assert reused() == mine
+    assert reused(photo_phash=near(PHOTO, 3)) == mine
+    assert reused(phash=(near(FRONT, 6), BACK)) is None
+    assert reused(selfie_hash=None) is None
+    assert reused(user_id="user-3") is None
+    # same card, someone else in the photo field
+    assert reused(photo_phash=near(PHOTO, 6)) is None
+    assert reused(photo_phash=None) is None
+
+    old = NearDuplicateIndex(max_distance=8, reuse_distance=4, ttl_seconds=3600)
+    stored(old, validated_at=datetime.utcnow() - timedelta(hours=2))
+    assert old.reusable(old.find([FRONT, BACK]), "user-1", None, PHOTO) is None
+
+
+def test_rejected_verdicts_are_never_reused():
+    index = NearDuplicateIndex(ttl_seconds=3600)
+    stored(index, is_valid=False)
+    stored(index, photo_phash=None)
+
+    assert index.reusable(index.find([FRONT, BACK]), "user-1", None, PHOTO) is None
+
+
+def test_same_card_of_other_users_is_flagged(capsys):
+    index = NearDuplicateIndex()
+    stored(index, user_id="user-1")
+    other = stored(index, user_id="user-2", phash=(near(FRONT, 2), BACK))
+    flagged_before = metrics.counter("near_duplicate_cross_user_matches")
+
+    assert index.other_users(index.find([FRONT, BACK]), "user-1") == [other]
+    assert metrics.counter("near_duplicate_cross_user_matches") == flagged_before + 1
+    # neither users nor documents are logged
+    assert other not in capsys.readouterr().out
+
+
+def saved(repo, days_ago=0, **fields):
+    validated_at = datetime.utcnow() - timedelta(days=days_ago)
+    return asyncio.run(repo.create(document(validated_at=validated_at, **fields)))
+
+
+def test_index_loads_recent_hashed_documents():
+    repo = DocumentsRepository(collection=FakeCollection())
+    recent = saved(repo, phash=[FRONT, BACK])
+    saved(repo)  # no page hashes
+    saved(repo, days_ago=40, phash=[near(FRONT, 2), BACK])
+
+    index = NearDuplicateIndex(window_days=30)
+    loaded = asyncio.run(index.load(repo))
+
+    assert loaded == 1
+    assert [m["document_id"] for m in index.find([FRONT, BACK])] == [recent]
+    # only the fields the index keeps are read
+    assert "metadata" not in index.find([FRONT, BACK])[0]
+
+
+def test_load_keeps_the_newest_documents_up_to_the_cap():
+    repo = DocumentsRepository(collection=FakeCollection())
+    oldest = saved(repo, days_ago=3, phash=[FRONT, BACK])
+    newer = [saved(repo, days_ago=days, phash=[near(FRONT, days), BACK]) for days in (2, 1)]
+
+    index = NearDuplicateIndex(max_docs=2)
+    asyncio.run(index.load(repo))
+
+    assert len(index) == 2
+    assert {m["document_id"] for m in index.find([FRONT, BACK])} == set(newer)
+    assert oldest not in index.document_ids
+
+
+def test_sync_adds_documents_of_other_replicas_once():
+    repo = DocumentsRepository(collection=FakeCollection())
+    index = NearDuplicateIndex()
+    asyncio.run(index.load(repo))
+
+    # saved by this replica, then by another one
+    mine = saved(repo, phash=[FRONT, BACK])
+    index.add(repo.collection.docs[-1])
+    other = saved(repo, phash=[near(FRONT, 1), BACK])
+
+    assert asyncio.run(index.sync(repo)) == 1
+    assert asyncio.run(index.sync(repo)) == 0
+    assert {m["document_id"] for m in index.find([FRONT, BACK])} == {mine, other}
+
+
+def test_rebuild_evicts_documents_out_of_the_window():
+    repo = DocumentsRepository(collection=FakeCollection())
+    index = NearDuplicateIndex(window_days=30)
+    saved(repo, phash=[FRONT, BACK])
+    asyncio.run(index.load(repo))
+
+    repo.collection.docs[0]["validated_at"] -= timedelta(days=31)
+    asyncio.run(index.load(repo))
+
+    assert len(index) == 0
+    assert index.find([FRONT, BACK]) == []
+
+
+def test_background_sync_loads_then_follows_the_collection():
+    repo = DocumentsRepository(collection=FakeCollection())
+    index = NearDuplicateIndex()
+
+    async def run():
+        index.start_sync(repo, sync_seconds=0.01, rebuild_seconds=3600)
+        await asyncio.sleep(0.02)
+        saved_id = await repo.create(document(validated_at=datetime.utcnow(), phash=[FRONT, BACK]))
+        await asyncio.sleep(0.05)
+        await index.close()
+        return saved_id
+
+    document_id = asyncio.run(run())
+
+    assert document_id in index.document_ids
+    assert index._task is None
+
+
+def test_process_document_reuses_and_flags_the_same_card(monkeypatch, stub_service):
+    monkeypatch.setattr(near_duplicates, "hashes", NearDuplicateIndex().hashes)
+    monkeypatch.setattr(near_duplicates, "document_ids", set())
+    # every upload is a new photo of the same card
+    service = stub_service(fake_analysis=True, cache_results=False, phashes=[near(FRONT, 1), BACK],
+                           photo_phash=PHOTO)
+
+    def submit(user_id, photo):
+        return asyncio.run(service.process_document(user_id, "1", [photo]))
+
+    first = submit("user-1", b"photo 1")
+    again = submit("user-1", b"photo 2")
+    other = submit("user-2", b"photo 3")
+
+    assert service.analyzed == 2
+    assert again == {"success": True, "is_valid": True, "document_id": first["document_id"], "duplicate": True}
+
+    saved = {str(doc["_id"]): doc for doc in service.repo.collection.docs}
+    assert saved[first["document_id"]]["phash"] == [near(FRONT, 1), BACK]
+    assert saved[first["document_id"]]["photo_phash"] == PHOTO
+    assert saved[first["document_id"]]["cross_user_duplicates"] is None
+    assert saved[other["document_id"]]["cross_user_duplicates"] == [first["document_id"]]
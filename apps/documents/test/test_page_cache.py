@@ -0,0 +1,51 @@
+from src.services.page_cache import page_cache, page_text_cache
+from .helpers.stub_service import LICENCIA
+
+
+def texts(analysis):
+    return [
+        {field: data["text"] for field, data in page["assignated_groups"].items() if isinstance(data, dict)}
+        for page in analysis["enriched_results"]["pages"]
+    ]
+
+
+def test_only_the_replaced_page_is_recomputed(stub_service, tesseract_calls):
+    service = stub_service()
+
+    first = service.analyze_document(LICENCIA, [b"front", b"back"])
+    assert service.processed == [b"front", b"back"]
+    first_calls = list(tesseract_calls)
+    back_calls = [shape for shape in first_calls if shape[0] == 100]
+
+    second = service.analyze_document(LICENCIA, [b"front", b"back v2"])
+    assert service.processed == [b"front", b"back", b"back v2"]
+    # only the back side crops went through tesseract again
+    assert back_calls and tesseract_calls[len(first_calls):] == back_calls
+
+    assert texts(second)[0] == texts(first)[0]
+    assert texts(second)[1] != texts(first)[1]
+
+
+def test_identical_resubmission_reads_nothing(stub_service, tesseract_calls):
+    service = stub_service()
+
+    first = service.analyze_document(LICENCIA, [b"front", b"back"])
+    calls = len(tesseract_calls)
+    second = service.analyze_document(LICENCIA, [b"front", b"back"])
+
+    assert len(service.processed) == 2
+    assert len(tesseract_calls) == calls
+    assert texts(second) == texts(first)
+    assert second["structural_results"]["combined_validation"] == first["structural_results"]["combined_validation"]
+
+
+def test_page_text_depends_on_its_position(stub_service, tesseract_calls):
+    service = stub_service()
+
+    service.analyze_document(LICENCIA, [b"front", b"back"])
+    service.analyze_document(LICENCIA, [b"back", b"front"])
+
+    # stages are reused, but each page is now read with the other template
+    assert len(service.processed) == 2
+    assert len(page_cache.memory) == 2
+    assert len(page_text_cache.memory) == 4
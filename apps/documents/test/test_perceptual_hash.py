@@ -0,0 +1,111 @@
+import random
+from itertools import combinations
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.services.near_duplicates import PHASH_KEY_DISTANCE, PHASH_MAX_DISTANCE, PHASH_REUSE_DISTANCE
+from src.services.perceptual_hash import (
+    MultiIndexHash, card_key, card_phash, card_phash_hex, hamming, phash, phash_hex
+)
+from .helpers.image_variants import (
+    CARD_TEXT_FIELDS, add_gaussian_noise, blur, darken, rotate, scale, synthetic_card, warp_perspective
+)
+
+
+def rephotographed(img, seed=0):
+    np.random.seed(seed)
+    pil = Image.fromarray(img)
+    jpeg = cv2.imdecode(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 60])[1], cv2.IMREAD_COLOR)
+
+    return {
+        "darker": np.asarray(darken(pil, 0.8)),
+        "noise": np.asarray(add_gaussian_noise(pil, sigma=10)),
+        "blur": np.asarray(blur(pil, 7)),
+        "rotate": np.asarray(rotate(pil, 2)),
+        "scale": np.asarray(scale(pil, 1.03)),
+        "warp": np.asarray(warp_perspective(pil, 15)),
+        "jpeg": jpeg,
+    }
+
+
+def card_hash(img):
+    return card_phash(img, CARD_TEXT_FIELDS)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_rephotographed_card_stays_close(seed):
+    card = synthetic_card(seed=seed, template_seed=7)
+    reference = card_hash(card)
+
+    for name, variant in rephotographed(card, seed).items():
+        assert hamming(reference, card_hash(variant)) <= PHASH_MAX_DISTANCE, name
+        # found by the index key search
+        assert hamming(card_key(reference), card_key(card_hash(variant))) <= PHASH_KEY_DISTANCE, name
+
+
+def test_other_cards_are_far():
+    reference = card_hash(synthetic_card(seed=1))
+
+    for seed in range(2, 12):
+        assert hamming(reference, card_hash(synthetic_card(seed=seed))) > PHASH_MAX_DISTANCE
+
+
+def test_other_cards_of_one_template_are_far():
+    # same template and colors, only the text and the face change
+    hashes = [card_hash(synthetic_card(seed=seed, template_seed=7)) for seed in range(20)]
+
+    for a, b in combinations(hashes, 2):
+        assert hamming(a, b) > max(PHASH_MAX_DISTANCE, PHASH_REUSE_DISTANCE)
+
+
+def test_card_hash_ignores_the_template_outside_the_fields():
+    card = synthetic_card(seed=1, template_seed=7)
+    other_header = card.copy()
+    other_header[:120] = (10, 200, 10)
+
+    assert card_hash(other_header) == card_hash(card)
+    assert phash(other_header) != phash(card)
+
+
+def test_hex_forms():
+    assert len(phash_hex(synthetic_card())) == 16
+    assert phash_hex(synthetic_card()) == f"{phash(synthetic_card()):016x}"
+    assert len(card_phash_hex(synthetic_card(), CARD_TEXT_FIELDS)) == 64
+    assert card_key(int(card_phash_hex(synthetic_card(), []), 16)) < 1 << 64
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def test_index_finds_exactly_what_a_scan_finds():
+    rng = random.Random(0)
+    index = MultiIndexHash(max_distance=8)
+
+    stored = [rng.getrandbits(64) for _ in range(2000)]
+    # near neighbours of the first queries, up to the max distance
+    stored += [flip_bits(stored[i], i % 9, rng) for i in range(200)]
+    for i, value in enumerate(stored):
+        index.add(value, i)
+
+    for query in stored[:50] + [rng.getrandbits(64) for _ in range(50)]:
+        expected = sorted(
+            (hamming(query, value), i) for i, value in enumerate(stored)
+            if hamming(query, value) <= 8
+        )
+        assert sorted(index.search(query)) == expected
+
+
+def test_search_radius_is_capped_by_the_index():
+    index = MultiIndexHash(max_distance=4)
+    index.add(0, "zero")
+    index.add(0b111111, "six bits")
+
+    assert index.search(0, max_distance=2) == [(0, "zero")]
+    assert index.search(0, max_distance=10) == [(0, "zero")]
+    assert len(index) == 2
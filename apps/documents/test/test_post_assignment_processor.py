@@ -0,0 +1,199 @@
+import cv2
+import numpy as np
+import pytest
+from src.services import post_asignment_processor
+from src.services.metrics import metrics
+from src.services.ocr_mosaic import OcrMosaic
+from src.services.ocr_profiles import DEFAULT_PROFILE, OCR_PRESETS, compile_ocr_profiles
+from src.services.post_asignment_processor import PostAssignmentProcessor
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    """
+    Replace tesseract with a fake that answers with the crop size
+    """
+    calls = []
+
+    def image_to_string(img, config=""):
+        calls.append(config)
+        return f"{img.shape[0]}x{img.shape[1]}"
+
+    monkeypatch.setattr(
+        post_asignment_processor.pytesseract, "image_to_string", image_to_string
+    )
+    post_asignment_processor.ocr_cache.memory.clear()
+    return calls
+
+
+def make_page(assignments):
+    return {
+        "assignments": assignments,
+        "assignated_groups": {
+            field: ((0, 0, 1, 1) if groups else None)
+            for field, groups in assignments.items()
+        }
+    }
+
+
+def test_parallel_ocr_keeps_reading_order(fake_tesseract):
+    processor = PostAssignmentProcessor(use_text_prefilter=False)
+    img = np.full((100, 200, 3), 255, np.uint8)
+
+    lower = {"group_id": 1, "norm_bbox": (0.1, 0.5, 0.3, 0.6)}
+    upper = {"group_id": 2, "norm_bbox": (0.1, 0.1, 0.3, 0.3)}
+    page = make_page({"nombres": [lower, upper], "photo_face": [upper]})
+
+    results = processor.add_ocr_to_page_results([img], [page])
+
+    assert results[0]["assignated_groups"]["nombres"]["text"] == "20x40 10x40"
+    # photo fields are never recognized
+    assert results[0]["assignated_groups"]["photo_face"] == (0, 0, 1, 1)
+    assert len(fake_tesseract) == 2
+
+
+def test_mosaic_maps_words_back_to_crops():
+    mosaic = OcrMosaic()
+    crops = [np.zeros((20, 50), np.uint8), np.zeros((30, 80), np.uint8)]
+
+    image, spans = mosaic.build(crops)
+    assert image.shape[1] == 80 + 2 * mosaic.PADDING_PX
+    assert spans[0][1] <= spans[1][0]
+
+    first_y = spans[0][0] + mosaic.PADDING_PX
+    second_y = spans[1][0] + mosaic.PADDING_PX
+    data = {
+        "text": ["ABC", "123", "", "456"],
+        "top": [first_y, second_y, 0, second_y],
+        "height": [20, 15, 0, 15],
+        "block_num": [1, 2, 0, 2],
+        "par_num": [1, 1, 0, 1],
+        "line_num": [1, 1, 0, 1],
+    }
+
+    assert mosaic.assign_words(data, spans) == ["ABC", "123 456"]
+
+
+def test_layout_profiles_are_compiled_per_field():
+    template = {"nuip": {}, "photo_face": {}, "nombres": {}, "sexo": {}}
+    specs = {"nuip": "digits", "sexo": {"profile": "line", "whitelist": "MF", "upscale": 2.0}}
+
+    profiles = compile_ocr_profiles(template, specs)
+
+    assert profiles["nuip"] == OCR_PRESETS["digits"]
+    assert profiles["photo_face"].skip
+    assert profiles["nombres"] == DEFAULT_PROFILE
+    assert profiles["sexo"].config == "--psm 7 -c tessedit_char_whitelist=MF"
+    assert profiles["sexo"].upscale == 2.0
+
+    with pytest.raises(ValueError):
+        compile_ocr_profiles(template, {"nuip": {"lang": "spa"}})
+
+
+def test_field_profiles_drive_ocr_config(fake_tesseract):
+    processor = PostAssignmentProcessor(use_text_prefilter=False)
+    img = np.full((100, 200, 3), 255, np.uint8)
+    group = {"group_id": 1, "norm_bbox": (0.1, 0.1, 0.3, 0.3)}
+    page = make_page({"nuip": [group], "nombres": [group], "codigo": [group]})
+    profiles = compile_ocr_profiles(page["assignments"], {"nuip": "digits", "codigo": "skip"})
+
+    processor.add_ocr_to_page_results([img], [page], ocr_profiles=[profiles])
+
+    assert sorted(fake_tesseract) == sorted([
+        OCR_PRESETS["digits"].config,
+        DEFAULT_PROFILE.config,
+    ])
+
+
+def test_mosaic_groups_crops_by_full_profile_config(monkeypatch):
+    processor = PostAssignmentProcessor(use_text_prefilter=False)
+    post_asignment_processor.ocr_cache.memory.clear()
+    configs = []
+
+    def recognize(crops, config):
+        configs.append((config, len(crops)))
+        return ["X"] * len(crops)
+
+    monkeypatch.setattr(processor.mosaic, "recognize", recognize)
+    img = np.full((100, 200, 3), 255, np.uint8)
+    page = make_page({
+        field: [{"group_id": i, "norm_bbox": (0.1, 0.1 * i, 0.3, 0.1 * i + 0.05)}]
+        for i, field in enumerate(["nombres", "apellidos", "lugar", "fecha"], start=1)
+    })
+    profiles = compile_ocr_profiles(page["assignments"], {
+        "nombres": {"psm": 4}, "apellidos": {"psm": 4}, "lugar": "line", "fecha": "date"
+    })
+
+    processor.add_ocr_to_page_results([img], [page], ocr_mode="mosaic", ocr_profiles=[profiles])
+
+    # block psms are kept, single line psms are read as a block
+    assert sorted(configs) == sorted([
+        ("--psm 4 -c tessedit_char_whitelist=" + DEFAULT_PROFILE.whitelist, 2),
+        (DEFAULT_PROFILE.config, 1),
+        (OCR_PRESETS["date"].mosaic_config, 1),
+    ])
+    assert OCR_PRESETS["date"].mosaic_config.startswith("--psm 6 ")
+
+
+def test_shared_group_is_recognized_once(fake_tesseract):
+    processor = PostAssignmentProcessor(use_text_prefilter=False)
+    img = np.full((100, 200, 3), 255, np.uint8)
+    shared = {"group_id": 7, "norm_bbox": (0.1, 0.1, 0.3, 0.3)}
+    other = {"group_id": 8, "norm_bbox": (0.1, 0.5, 0.3, 0.6)}
+    page = make_page({"nombres": [shared], "apellidos": [shared, other]})
+    saved_before = metrics.counter("ocr_calls_saved", doc_type="test")
+
+    results = processor.add_ocr_to_page_results([img], [page], document_type_id="test")
+
+    assert len(fake_tesseract) == 2
+    assert results[0]["assignated_groups"]["nombres"]["text"] == "20x40"
+    assert results[0]["assignated_groups"]["apellidos"]["text"] == "20x40 10x40"
+    assert metrics.counter("ocr_calls_saved", doc_type="test") == saved_before + 1
+
+
+def test_identical_crops_hit_the_ocr_cache(fake_tesseract):
+    processor = PostAssignmentProcessor(use_text_prefilter=False)
+    img = np.full((100, 200, 3), 255, np.uint8)
+    group = {"group_id": 1, "norm_bbox": (0.1, 0.1, 0.3, 0.3)}
+
+    first = processor.extract_text_from_groups(img, [group], img.shape)
+    second = processor.extract_text_from_groups(img.copy(), [group], img.shape)
+
+    assert first == second == "20x40"
+    assert len(fake_tesseract) == 1
+
+
+def test_text_prefilter_skips_blank_crops_and_tightens_text(fake_tesseract):
+    processor = PostAssignmentProcessor()
+    img = np.full((100, 200, 3), 255, np.uint8)
+    # two glyph-like blobs in the middle of the second crop
+    img[60:70, 50:56] = 0
+    img[60:70, 60:66] = 0
+
+    blank = {"group_id": 1, "norm_bbox": (0.0, 0.0, 0.5, 0.4)}
+    text = {"group_id": 2, "norm_bbox": (0.0, 0.5, 0.5, 0.9)}
+    page = make_page({"nombres": [blank], "apellidos": [text]})
+
+    results = processor.add_ocr_to_page_results([img], [page])
+
+    assert len(fake_tesseract) == 1
+    assert results[0]["assignated_groups"]["nombres"]["text"] == ""
+    # 10x16 text box plus the padding on every side
+    pad = processor.text_detector.TIGHT_PADDING_PX
+    assert results[0]["assignated_groups"]["apellidos"]["text"] == f"{10 + 2 * pad}x{16 + 2 * pad}"
+
+
+def test_text_prefilter_applies_the_profile_upscale(fake_tesseract):
+    processor = PostAssignmentProcessor()
+    img = np.full((23, 28, 3), 255, np.uint8)
+    cv2.putText(img, "O+", (3, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    group = {"group_id": 1, "norm_bbox": (0.0, 0.0, 1.0, 1.0)}
+    page = make_page({"tipo_sangre": [group]})
+    profiles = compile_ocr_profiles(
+        page["assignments"], {"tipo_sangre": {"profile": "line", "whitelist": "ABO+-", "upscale": 2.0}}
+    )
+
+    results = processor.add_ocr_to_page_results([img], [page], ocr_profiles=[profiles])
+
+    assert len(fake_tesseract) == 1
+    assert results[0]["assignated_groups"]["tipo_sangre"]["text"] != ""
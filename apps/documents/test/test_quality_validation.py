@@ -1,6 +1,10 @@
+import cv2
+import numpy as np
 import pytest
-from src.services.quality_validation import LowQualityError, ValidationService
-from .helpers.image_variants import (load_base_image, darken, brighten, blur, low_contrast, resize_small)
+from src.services.metrics import metrics
+from src.services.quality_validation import LowQualityError, SelfieQualityError, ValidationService
+from .helpers.image_variants import (load_base_image, darken, brighten, blur, low_contrast, resize_small,
+                                     synthetic_selfie)
 
 
 def test_valid_image_passes():
@@ -57,3 +61,25 @@ def test_multiple_images_one_invalid():
 
     with pytest.raises(LowQualityError):
         service.quality_validation([base, bad])
+
+
+def test_valid_selfie_passes():
+    service = ValidationService()
+
+    assert service.selfie_validation(synthetic_selfie()) is True
+
+
+@pytest.mark.parametrize("variant, reason", [
+    (lambda img: cv2.resize(img, (90, 120)), "size"),
+    (lambda img: (img * 0.25).astype(np.uint8), "dark"),
+    (lambda img: (img.mean() + (img - img.mean()) * 0.15).astype(np.uint8), "contrast"),
+    (lambda img: cv2.GaussianBlur(img, (15, 15), 0), "blur"),
+])
+def test_bad_selfie_is_rejected(variant, reason):
+    service = ValidationService()
+    metrics.reset()
+
+    with pytest.raises(SelfieQualityError):
+        service.selfie_validation(variant(synthetic_selfie()))
+
+    assert metrics.counter("selfie_gate", result="rejected", reason=reason) == 1
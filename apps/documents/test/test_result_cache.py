@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from src.document_impl import DocumentService
+from src.services.biometric_processor import BiometricError
+from src.services.near_duplicates import near_duplicates
+from src.services.normalization import NormalizationError
+from src.services.result_cache import dumps, loads, result_cache, result_cache_key
+
+
+FILES = [b"front", b"back"]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    result_cache.memory.clear()
+    near_duplicates.clear()
+    yield
+    result_cache.memory.clear()
+    near_duplicates.clear()
+
+
+def submit(service, user_id="user-1", doc_type_id=1, files=FILES):
+    return asyncio.run(service.process_document(user_id, doc_type_id, files))
+
+
+def test_resubmission_is_served_from_the_cache(stub_service):
+    service = stub_service(fake_analysis=True)
+
+    first = submit(service, user_id="user-1")
+    second = submit(service, user_id="user-2")
+
+    assert service.analyzed == 1
+    assert first["is_valid"] is second["is_valid"] is True
+    # every submission still gets its own document
+    assert first["document_id"] != second["document_id"]
+    assert len(service.repo.collection.docs) == 2
+
+
+def test_other_bytes_or_type_miss_the_cache(stub_service):
+    service = stub_service(fake_analysis=True)
+
+    submit(service)
+    submit(service, files=[b"front", b"new back"])
+    submit(service, doc_type_id=2)
+
+    assert service.analyzed == 3
+
+
+def test_input_errors_are_cached_and_biometric_errors_are_not(stub_service):
+    service = stub_service(fake_analysis=True, error=NormalizationError("no document edges"))
+    submit(service)
+    result = submit(service)
+
+    assert service.analyzed == 1
+    assert result == {
+        "success": False,
+        "error_code": "NORMALIZATION_ERROR",
+        "error_message": "no document edges",
+    }
+
+    result_cache.memory.clear()
+    service = stub_service(fake_analysis=True, error=BiometricError("model not loaded"))
+    submit(service)
+    submit(service)
+
+    assert service.analyzed == 2
+
+
+def test_layout_edit_changes_the_key(layouts, stub_service):
+    service = stub_service(fake_analysis=True)
+    key = service.result_cache_key(1, "files", None)
+
+    layouts.layouts[1]["fingerprint"], original = "edited", layouts.layouts[1]["fingerprint"]
+    try:
+        assert service.result_cache_key(1, "files", None) != key
+    finally:
+        layouts.layouts[1]["fingerprint"] = original
+
+    assert service.result_cache_key(99, "files", None) is None
+
+
+def test_string_type_id_shares_the_int_cache_entry(stub_service):
+    service = stub_service(fake_analysis=True)
+
+    submit(service, doc_type_id=1)
+    result = submit(service, doc_type_id="1")
+
+    assert service.analyzed == 1
+    assert result["success"] is True
+    assert service.repo.collection.docs[-1]["doc_type_id"] == "1"
+
+
+@pytest.mark.parametrize("doc_type_id", ["cedula", "", None, 99, "99"])
+def test_invalid_type_id_is_rejected_before_the_pipeline(stub_service, doc_type_id):
+    service = stub_service(fake_analysis=True)
+
+    result = submit(service, doc_type_id=doc_type_id)
+
+    assert result["success"] is False
+    assert result["error_code"] == "TECHNICAL_VALIDATION_ERROR"
+    assert service.analyzed == 0
+    assert service.repo.collection.docs == []
+
+
+def test_score_weights_change_the_pipeline_version(monkeypatch):
+    version = DocumentService.pipeline_version()
+
+    monkeypatch.setattr(DocumentService, "SCORE_WEIGHTS", {"structural": 0.6, "logic": 0.2, "biometric": 0.2})
+
+    assert DocumentService.pipeline_version() != version
+
+
+def test_key_covers_every_part():
+    key = result_cache_key("files", "selfie", 1, "layout", "pipeline")
+
+    assert key == result_cache_key("files", "selfie", "1", "layout", "pipeline")
+    assert key != result_cache_key("files", None, 1, "layout", "pipeline")
+    assert key != result_cache_key("files", "selfie", 1, "layout", "pipeline2")
+
+
+def test_remote_encoding_keeps_template_bytes():
+    result = {"is_valid": True, "metadata": {"pages": []}, "face_template": {"embedding": b"\x00\x01"}}
+
+    assert loads(dumps(result)) == result
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.document_impl import PipelineAborted
+from src.services.quality_validation import SelfieQualityError
+from .helpers.stub_service import LICENCIA
+
+
+PAGE_STAGE_SECONDS = 0.3
+
+
+def test_rejected_selfie_answers_before_the_document_pipeline(stub_service, tesseract_calls):
+    # page stages take a while, the selfie is rejected right away
+    service = stub_service(page_seconds=PAGE_STAGE_SECONDS, cache_results=False,
+                           selfie_error=SelfieQualityError("Selfie too dark"))
+
+    async def submit():
+        start = time.perf_counter()
+        result = await service.process_document("user-1", LICENCIA, [b"front", b"back"], b"selfie")
+        return result, time.perf_counter() - start
+
+    # asyncio.run returns once the page stage thread is done
+    result, elapsed = asyncio.run(submit())
+
+    assert result["error_code"] == "SELFIE_QUALITY_ERROR"
+    assert elapsed < PAGE_STAGE_SECONDS
+
+    # the page stage finished on its thread, but OCR never started
+    assert service.pages_loaded.is_set()
+    assert service.analyzed == 0
+    assert tesseract_calls == []
+
+
+def test_aborted_analysis_stops_before_ocr(stub_service, tesseract_calls):
+    service = stub_service()
+    abort = threading.Event()
+    abort.set()
+
+    with pytest.raises(PipelineAborted):
+        service.analyze_document(LICENCIA, [b"front", b"back"], abort=abort)
+
+    assert tesseract_calls == []
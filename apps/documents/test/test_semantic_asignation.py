@@ -0,0 +1,19 @@
+from src.services.semantic_asignation import SemanticAsignation
+
+
+def test_photo_field_regions_only_include_face_photos():
+    semantic = SemanticAsignation()
+    template = semantic.layouts[1]["templates"][0]["template"]
+    face = template["photo_face"]
+
+    results = {
+        "pages": [
+            {"page": 0, "assignated_groups": {"photo_face": None}},
+            {"page": 1, "assignated_groups": {}},
+        ]
+    }
+
+    regions = semantic.photo_field_regions(1, results)
+
+    # microphoto and mariposa fields never hold the holder's face, back side has no photo
+    assert regions == [(0, (face["x1"], face["y1"], face["x2"], face["y2"]))]
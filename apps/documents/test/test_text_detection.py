@@ -0,0 +1,147 @@
+import cv2
+import numpy as np
+import pytest
+from src.services.text_detection import TextDetector
+
+
+def reference_lines(components, y_threshold=10):
+    """Original quadratic grouping, kept as the expected behaviour"""
+    components = sorted(components, key=lambda c: c["centroid"][1])
+    lines = []
+
+    for comp in components:
+        for line in lines:
+            avg_y = np.mean([c["centroid"][1] for c in line])
+            if abs(comp["centroid"][1] - avg_y) < y_threshold:
+                line.append(comp)
+                break
+        else:
+            lines.append([comp])
+
+    return lines
+
+
+def reference_words(line, gap_threshold=15):
+    line = sorted(line, key=lambda c: c["bbox"][0])
+    words = [[line[0]]]
+
+    for prev, curr in zip(line, line[1:]):
+        if curr["bbox"][0] - prev["bbox"][2] < gap_threshold:
+            words[-1].append(curr)
+        else:
+            words.append([curr])
+
+    return [
+        (
+            min(c["bbox"][0] for c in word),
+            min(c["bbox"][1] for c in word),
+            max(c["bbox"][2] for c in word),
+            max(c["bbox"][3] for c in word),
+        )
+        for word in words
+    ]
+
+
+def random_components(n, seed):
+    rng = np.random.default_rng(seed)
+    components = []
+
+    for _ in range(n):
+        x, y = rng.integers(0, 2000), rng.integers(0, 1000)
+        w, h = rng.integers(3, 20), rng.integers(5, 25)
+        components.append({
+            "bbox": (x, y, x + w, y + h),
+            "centroid": np.array([x + w / 2, y + h / 2]),
+        })
+
+    return components
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_sweep_grouping_matches_reference(seed):
+    components = random_components(1500, seed)
+
+    expected = reference_lines(components)
+    actual = TextDetector.group_components_into_lines(components)
+
+    assert [[id(c) for c in line] for line in actual] == \
+        [[id(c) for c in line] for line in expected]
+
+    for line, expected_line in zip(actual, expected):
+        words = [w["bbox"] for w in TextDetector.group_line_into_words(line)]
+        assert words == reference_words(expected_line)
+
+
+def test_detect_text_in_region_finds_lines_and_words():
+    img = np.full((120, 300, 3), 255, np.uint8)
+    cv2.putText(img, "ABC  DEF", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    cv2.putText(img, "123", (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+
+    lines = TextDetector().detect_text_in_region(img, (0, 0, 300, 120))["lines"]
+
+    assert len(lines) == 2
+    assert len(lines[0]["words"]) == 2
+    assert len(lines[1]["words"]) == 1
+    assert lines[0]["bbox"][3] < lines[1]["bbox"][1]
+
+
+def field_crop(text, height, width, font_scale, thickness=2):
+    img = np.full((height, width, 3), 255, np.uint8)
+    cv2.putText(img, text, (4, height - height // 5), cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale, (0, 0, 0), thickness)
+    return img
+
+
+def test_noise_only_crop_is_skipped():
+    rng = np.random.default_rng(0)
+    img = np.full((60, 400, 3), 235, np.uint8)
+    for _ in range(60):
+        center = (int(rng.integers(0, 400)), int(rng.integers(0, 60)))
+        cv2.circle(img, center, int(rng.integers(2, 5)), (90, 90, 90), -1)
+
+    detector = TextDetector()
+    lines = detector.detect_text_in_region(img, (0, 0, 400, 60))["lines"]
+
+    # the specks do group in lines, but never in a run of aligned glyphs
+    assert sum(line["num_components"] for line in lines) >= TextDetector.MIN_TEXT_COMPONENTS
+    assert detector.find_text_bbox(img) is None
+
+
+def test_large_font_field_is_not_skipped():
+    img = field_crop("PEREZ", 240, 800, font_scale=6, thickness=10)
+    detector = TextDetector()
+
+    # most glyphs are above the area bound of small crops
+    fixed = detector.detect_text_in_region(img, (0, 0, 800, 240))["lines"]
+    assert max(line["num_aligned"] for line in fixed) < 5
+
+    scaled = detector.detect_text_in_region(img, (0, 0, 800, 240), detector.crop_area_bounds(240))["lines"]
+    assert max(line["num_aligned"] for line in scaled) == 5
+
+    x1, y1, x2, y2 = detector.find_text_bbox(img)
+    assert x2 - x1 > 400 and y2 - y1 > 100
+
+
+@pytest.mark.parametrize("text,height,width", [
+    ("1.234.567", 40, 220),
+    ("juan pablo", 40, 220),
+    ("M", 30, 40),
+    ("O+", 36, 60),
+])
+def test_short_and_long_values_are_kept(text, height, width):
+    img = field_crop(text, height, width, font_scale=0.7)
+
+    assert TextDetector().find_text_bbox(img) is not None
+
+
+def test_tiny_two_glyph_crop_is_read_at_the_profile_size():
+    # tight blood type crop, thin strokes do not survive noise removal at 23x28
+    img = np.full((23, 28, 3), 255, np.uint8)
+    cv2.putText(img, "O+", (3, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    detector = TextDetector()
+
+    assert detector.find_text_bbox(img) is None
+
+    x1, y1, x2, y2 = detector.find_text_bbox(img, upscale=2.0)
+    assert 0 <= x1 < x2 <= 28 and 0 <= y1 < y2 <= 23
+    assert x2 - x1 >= 15
@@ -0,0 +1,155 @@
+"""
+Offline int8 quantization of the face models for CPU nodes.
+
+Usage (from apps/documents):
+    python -m tools.quantize_face_models <calibration_dir> [--method static|dynamic] [--limit 200]
+
+calibration_dir holds document photos and selfies (jpg/png) similar to
+production traffic. Static quantization calibrates the activations on them
+(QDQ, per channel int8); dynamic quantization only converts the weights
+and ignores the images.
+
+Writes det_10g.int8.onnx and w600k_r50.int8.onnx next to the float32 files,
+FACE_QUANTIZED=1 makes the face engine load them.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Iterator, List
+
+import cv2
+import numpy as np
+
+from src.services.face_engine import FaceEngine, FaceEngineConfig, quantized_name
+
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+def load_images(calibration_dir: Path, limit: int) -> List[np.ndarray]:
+    images = []
+
+    for path in sorted(calibration_dir.rglob("*")):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+
+        img = cv2.imread(str(path))
+        if img is not None:
+            images.append(img)
+
+        if len(images) >= limit:
+            break
+
+    return images
+
+
+def detector_blob(detector, img: np.ndarray, size: int) -> np.ndarray:
+    """
+    Same letterboxed input RetinaFace.detect feeds the network
+    """
+    im_ratio = img.shape[0] / img.shape[1]
+    if im_ratio > 1:
+        new_h, new_w = size, int(size / im_ratio)
+    else:
+        new_h, new_w = int(size * im_ratio), size
+
+    det_img = np.zeros((size, size, 3), dtype=np.uint8)
+    det_img[:new_h, :new_w] = cv2.resize(img, (new_w, new_h))
+
+    return cv2.dnn.blobFromImage(
+        det_img, 1.0 / detector.input_std, (size, size),
+        (detector.input_mean,) * 3, swapRB=True
+    )
+
+
+def recognizer_blobs(engine: FaceEngine, images: List[np.ndarray]) -> Iterator[np.ndarray]:
+    """
+    Aligned crops of the faces the float32 detector finds
+    """
+    recognizer = engine.recognizer
+
+    for img in images:
+        for face in engine.detect(img):
+            yield cv2.dnn.blobFromImage(
+                engine.align(img, face), 1.0 / recognizer.input_std, recognizer.input_size,
+                (recognizer.input_mean,) * 3, swapRB=True
+            )
+
+
+class BlobReader:
+    """
+    onnxruntime CalibrationDataReader over precomputed input blobs
+    """
+
+    def __init__(self, input_name: str, blobs: List[np.ndarray]):
+        self._feeds = iter([{input_name: blob} for blob in blobs])
+
+    def get_next(self):
+        return next(self._feeds, None)
+
+
+def quantize(model_file: Path, method: str, reader=None):
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    output = model_file.with_name(quantized_name(model_file.name))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # shape inference + graph optimization, recommended before quantizing
+        prepared = Path(tmp) / model_file.name
+        quant_pre_process(str(model_file), str(prepared), skip_symbolic_shape=True)
+
+        if method == "dynamic":
+            quantize_dynamic(str(prepared), str(output), weight_type=QuantType.QUInt8)
+        else:
+            quantize_static(
+                str(prepared), str(output), reader,
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True
+            )
+
+    size_mb = output.stat().st_size / 2 ** 20
+    print(f"{model_file.name} -> {output.name} ({size_mb:.1f} MB, was {model_file.stat().st_size / 2 ** 20:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("calibration_dir", type=Path)
+    parser.add_argument("--method", choices=("static", "dynamic"), default="static")
+    parser.add_argument("--limit", type=int, default=200, help="max calibration images")
+    args = parser.parse_args()
+
+    config = FaceEngineConfig.from_env()
+    engine = FaceEngine(FaceEngineConfig(
+        model_pack=config.model_pack,
+        det_model=config.det_model,
+        rec_model=config.rec_model,
+        det_size=config.det_size,
+        ctx_id=-1,
+        batch_max_size=1
+    ))
+    model_dir = engine._model_dir()
+
+    det_reader = rec_reader = None
+    if args.method == "static":
+        images = load_images(args.calibration_dir, args.limit)
+        if not images:
+            raise SystemExit(f"No calibration images in {args.calibration_dir}")
+
+        det_blobs = [detector_blob(engine.detector, img, config.det_size) for img in images]
+        rec_blobs = list(recognizer_blobs(engine, images))
+        if not rec_blobs:
+            raise SystemExit("No faces found in the calibration images")
+
+        print(f"calibration: {len(det_blobs)} images, {len(rec_blobs)} faces")
+        det_reader = BlobReader(engine.detector.input_name, det_blobs)
+        rec_reader = BlobReader(engine.recognizer.input_name, rec_blobs)
+
+    quantize(model_dir / config.det_model, args.method, det_reader)
+    quantize(model_dir / config.rec_model, args.method, rec_reader)
+
+
+if __name__ == "__main__":
+    main()
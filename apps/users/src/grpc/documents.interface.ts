@@ -9,5 +9,42 @@ export interface DocumentServiceGrpc {
     is_valid: boolean;
     error_code: string;
     error_message: string;
+    document_id: string;
+  }>;
+
+  VerifySelfie(data: {
+    user_id: string;
+    document_id: string;
+    selfie: Buffer;
+  }): Observable<{
+    is_match: boolean;
+    score: number;
+    error_code: string;
+    error_message: string;
+  }>;
+
+  ListDocuments(data: {
+    user_id?: string;
+    doc_type_id?: string;
+    is_valid?: boolean;
+    validated_from?: string;
+    validated_to?: string;
+    limit?: number;
+    page_token?: string;
+  }): Observable<{
+    document_id: string;
+    user_id: string;
+    doc_type_id: string;
+    is_valid: boolean;
+    validated_at: string;
+    file_hash: string;
+    page_token: string;
+  }>;
+
+  Health(data: {}): Observable<{
+    serving: boolean;
+    pipeline_ready: boolean;
+    mongo_status: string;
+    mongo_error: string;
   }>;
 }
\ No newline at end of file